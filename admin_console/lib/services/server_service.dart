@@ -1,6 +1,8 @@
 /**
  * 작성의도: Shelf 라이브러리를 이용한 로컬 서버 및 웹소켓 통신을 담당하는 서비스 파일입니다.
  * 기능 원리: HTTP API 핸들러, 웹소켓 브로드캐스팅, 정적 파일(이미지) 서빙 로직을 포함하며 서버의 생명주기를 관리합니다.
+ *           스니퍼 주문 이벤트는 127.0.0.1 TCP 이벤트 스트림(NDJSON, seq/ACK)으로 받고, 스니퍼 표준 출력은 사람이 읽는 로그로만 씁니다.
+ *           스트림의 STATS 줄(seq 없음)은 스니퍼 메트릭 최신값으로 보관합니다.
  */
 
 import 'dart:async';
@@ -20,6 +22,14 @@ class ServerService {
   Process? _snifferProcess;
   final Set<WebSocketChannel> _wsChannels = {};
 
+  // 스니퍼 이벤트 스트림: 세션(스니퍼 실행)별로 처리한 마지막 seq (재연결 시 RESUME 으로 알려 중복/누락 방지)
+  ServerSocket? _eventServer;
+  final Map<String, int> _streamSeq = {};
+
+  // 스니퍼가 주기적으로 보내는 메트릭 최신값 ({"sniffer_packets_total": 123, ...})
+  Map<String, dynamic> snifferStats = {};
+  void Function(Map<String, dynamic> stats)? onSnifferStats;
+
   // 실행 파일 기준 경로 계산
   String get _executableDir => p.dirname(Platform.resolvedExecutable);
 
@@ -256,7 +266,8 @@ class ServerService {
 
     _server = await shelf_io.serve(handler, '0.0.0.0', port);
 
-    // MySQL 스니퍼 자동 실행
+    // 스니퍼 이벤트 스트림 대기 후 MySQL 스니퍼 자동 실행
+    await _startEventStream();
     _startSniffer();
 
     return _server!;
@@ -268,11 +279,15 @@ class ServerService {
       // 수신된 Raw Body 전체를 [DEBUG] 레벨로 로깅하여 데이터 형식 검증
       onLog?.call("[DEBUG] Raw Sniffer Body Received: $body");
 
-      final data = jsonDecode(body);
-      onLog?.call("[INFO] Parsed Sniffer Data Type: ${data['type']}");
+      // 스니퍼는 여러 이벤트를 JSON 배열 하나로 묶어 보냄 (단일 객체도 허용)
+      final decoded = jsonDecode(body);
+      final List<dynamic> events = decoded is List ? decoded : [decoded];
+      for (final data in events) {
+        _handleSnifferEvent(data as Map<String, dynamic>);
+      }
 
       return Response.ok(
-        jsonEncode({"status": "success"}),
+        jsonEncode({"status": "success", "received": events.length}),
         headers: {'content-type': 'application/json'},
       );
     } catch (e, stack) {
@@ -281,6 +296,100 @@ class ServerService {
     }
   }
 
+  // HTTP(api/external_order)와 이벤트 스트림이 공통으로 쓰는 주문 이벤트 처리
+  void _handleSnifferEvent(Map<String, dynamic> data) {
+    onLog?.call("[INFO] Parsed Sniffer Data Type: ${data['type']}");
+  }
+
+  Future<void> _startEventStream() async {
+    try {
+      _eventServer = await ServerSocket.bind(InternetAddress.loopbackIPv4, 0);
+      _eventServer!.listen(_handleEventStream);
+      _log("INFO", "스니퍼 이벤트 스트림 대기: 127.0.0.1:${_eventServer!.port}");
+    } catch (e) {
+      // 스트림을 열지 못하면 스니퍼는 기존처럼 api/external_order 로 POST
+      _eventServer = null;
+      _log("ERROR", "이벤트 스트림 시작 실패 (HTTP 전송 사용): $e");
+    }
+  }
+
+  void _handleEventStream(Socket socket) {
+    socket.setOption(SocketOption.tcpNoDelay, true);
+    String? session;
+    int lastSeq = 0;
+    bool ackScheduled = false;
+
+    // 한 번의 읽기에서 처리한 줄들을 누적 ACK 하나로 확인
+    void sendAck() {
+      ackScheduled = false;
+      try {
+        socket.write('${jsonEncode({"type": "ACK", "seq": lastSeq})}\n');
+      } catch (e) {
+        // 이미 끊긴 연결: 스니퍼가 다시 연결해 RESUME 으로 이어 받음
+      }
+    }
+
+    utf8.decoder
+        .bind(socket)
+        .transform(const LineSplitter())
+        .listen(
+          (line) {
+            try {
+              final message = jsonDecode(line) as Map<String, dynamic>;
+              if (session == null) {
+                if (message['type'] != 'HELLO') {
+                  throw "첫 메시지가 HELLO 가 아닙니다: $line";
+                }
+                session = message['session'] as String;
+                lastSeq = _streamSeq[session!] ?? 0;
+                socket.write(
+                  '${jsonEncode({"type": "RESUME", "seq": lastSeq})}\n',
+                );
+                _log(
+                  "INFO",
+                  "스니퍼 이벤트 스트림 연결: 세션 $session (resume seq $lastSeq)",
+                );
+                return;
+              }
+              // 통계 줄은 seq/ACK 없이 최신값만 반영
+              if (message['type'] == 'STATS') {
+                snifferStats = Map<String, dynamic>.from(message['stats'] as Map);
+                onSnifferStats?.call(snifferStats);
+                return;
+              }
+              final seq = message['seq'] as int;
+              // 재연결 후 다시 온 줄(이미 처리한 seq)은 건너뛰고 ACK 만 다시 보냄
+              if (seq > lastSeq) {
+                _handleSnifferEvent(
+                  message['event'] as Map<String, dynamic>,
+                );
+                lastSeq = seq;
+                _streamSeq[session!] = seq;
+              }
+              if (!ackScheduled) {
+                ackScheduled = true;
+                Timer.run(sendAck);
+              }
+            } catch (e) {
+              _log(
+                "ERROR",
+                "이벤트 스트림 메시지 처리 에러 (세션 $session): $e",
+              );
+              socket.destroy();
+            }
+          },
+          onDone: () {
+            _log("INFO", "스니퍼 이벤트 스트림 해제: 세션 $session (seq $lastSeq)");
+            socket.destroy();
+          },
+          onError: (e) {
+            _log("ERROR", "이벤트 스트림 에러 (세션 $session): $e");
+            socket.destroy();
+          },
+          cancelOnError: true,
+        );
+  }
+
   // 내부 로그 헬퍼 추가
   void _log(String level, String message) {
     final timestamp = DateTime.now().toString().substring(0, 19);
@@ -301,9 +410,13 @@ class ServerService {
       _log("INFO", "MySQL 스니퍼 실행 시도...");
 
       // 2. 프로세스 실행 (runInShell: false 권장)
+      // 이벤트 스트림이 열려 있으면 주문은 소켓으로 받고 표준 출력은 로그로만 사용
+      final streamArgs = _eventServer != null
+          ? ['--stream', '127.0.0.1:${_eventServer!.port}']
+          : <String>[];
       _snifferProcess = await Process.start(
         pythonPath,
-        ['-u', scriptPath, adapterGuid], // -u 옵션 유지
+        ['-u', scriptPath, adapterGuid, ...streamArgs], // -u 옵션 유지
         runInShell: false, // 쉘을 거치지 않고 직접 실행
         workingDirectory: _executableDir, // 작업 디렉토리 명시
       );
@@ -363,6 +476,8 @@ class ServerService {
     onLog?.call("서버 종료 시퀀스 시작...");
     try {
       await stopSniffer();
+      await _eventServer?.close();
+      _eventServer = null;
       await _server?.close(force: true);
       _server = null;
       _wsChannels.clear();
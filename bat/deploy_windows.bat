@@ -53,8 +53,9 @@ if exist "%PYTHON_SOURCE_RUNTIME%" (
 
 :: 4. Copy Sniffer Scripts
 echo [4/5] Copying sniffer scripts...
-copy "%PYTHON_SOURCE%\main.py" "%ASSETS_DIR%\"
+copy "%PYTHON_SOURCE%\*.py" "%ASSETS_DIR%\"
 copy "%PYTHON_SOURCE%\requirements.txt" "%ASSETS_DIR%\"
+copy "%PYTHON_SOURCE%\order_rules.json" "%ASSETS_DIR%\"
 
 :: 5. Final Packaging (Inno Setup)
 echo [5/5] Generating final installer (Allben_Setup_v2.0.exe)...
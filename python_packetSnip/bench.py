@@ -0,0 +1,705 @@
+"""
+작성의도: 스니퍼 파이프라인 단계별 처리량을 재현 가능하게 측정하는 벤치마크 스크립트입니다.
+기능 원리: 실제 POS 트래픽과 같은 모양의 MySQL 세그먼트를 합성해 각 단계를 반복 실행하고 초당 처리량을 출력합니다.
+사용법: python bench.py capture|delivery|execute|fingerprint|jsonl|literals|resultsets|rows|rules|spool [--packets N]
+        python bench.py live [--seconds S]   (Linux lo 실측: tpacket vs raw, root 필요)
+        python bench.py sessions [--hours H]  (영업일 동안 연결 교체 시 세션/Statement 메모리 추이)
+        python bench.py pcap --out synthetic.pcap [--packets N]   (재생용 합성 캡처 생성)
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import rawcap
+
+MYSQL_PORT = 3306
+CLIENT = (bytes([127, 0, 0, 1]), 50000)
+SERVER = (bytes([127, 0, 0, 1]), MYSQL_PORT)
+
+ORDER_INSERT = ("INSERT INTO tb_order (order_no, store_id, pos_no, order_time, menu_cnt, "
+                "discount, tax, total_price, pay_type, seat_no) VALUES (?,?,?,?,?,?,?,?,?,?)")
+
+
+def mysql_frame(seq_id, body):
+    """MySQL 패킷 헤더(3바이트 길이 + seq) 를 붙인 프레임"""
+    return struct.pack('<I', len(body))[:3] + bytes([seq_id & 0xFF]) + body
+
+
+def lenenc_str(value):
+    raw = value.encode('utf-8') if isinstance(value, str) else value
+    if len(raw) < 251:
+        return bytes([len(raw)]) + raw
+    return b'\xfc' + struct.pack('<H', len(raw)) + raw
+
+
+def tcp_frame(src, dst, seq, payload, flags=0x18):
+    """Ethernet + IPv4 + TCP 프레임 (체크섬은 캡처 경로에서 검증하지 않으므로 0)"""
+    tcp = struct.pack('!HHIIBBHHH', src[1], dst[1], seq & 0xFFFFFFFF, 0, 5 << 4, flags, 65535, 0, 0)
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp) + len(payload), 0, 0x4000, 64, 6, 0, src[0], dst[0])
+    return b'\x00' * 12 + b'\x08\x00' + ip + tcp + payload
+
+
+ORDER_TYPES = [0xfd, 0x03, 0x03, 0xfd, 0x03, 0x03, 0x03, 0x03, 0x01, 0xfd]
+
+
+def order_execute(stmt_id, order_no, bound=True):
+    """tb_order INSERT 에 대한 COM_STMT_EXECUTE 본문 (10개 파라미터). bound=False 면 타입을 생략 (직전 EXECUTE 의 타입 재사용)"""
+    values = (lenenc_str(f"A{order_no:08d}") + struct.pack('<i', 1) + struct.pack('<i', 2) +
+              lenenc_str("2026-02-03 12:00:00") + struct.pack('<i', 3) + struct.pack('<i', 0) +
+              struct.pack('<i', 1500) + struct.pack('<i', 16500) + struct.pack('<b', 1) +
+              lenenc_str(f"T{order_no % 30:02d}"))
+    if not bound:
+        return b'\x17' + struct.pack('<IBI', stmt_id, 0, 1) + b'\x00\x00' + b'\x00' + values
+    return (b'\x17' + struct.pack('<IBI', stmt_id, 0, 1) + b'\x00\x00' + b'\x01' +
+            b''.join(struct.pack('<H', t) for t in ORDER_TYPES) + values)
+
+
+# MySQL 8 기본 협상: PROTOCOL_41 | SECURE_CONNECTION | MULTI_RESULTS | PLUGIN_AUTH | DEPRECATE_EOF
+CLIENT_CAPS = 0x0200 | 0x8000 | 0x20000 | 0x80000 | 0x1000000
+
+
+def handshake(client_caps=CLIENT_CAPS):
+    """서버 greeting, 클라이언트 Handshake Response, 인증 OK 본문"""
+    greeting = (b'\x0a' + b'8.0.36\x00' + struct.pack('<I', 1) + b'\x11' * 8 + b'\x00' +
+                struct.pack('<HBHHB', 0xffff, 255, 0x0002, 0xffff, 21) + b'\x00' * 10 + b'\x22' * 12 + b'\x00' +
+                b'caching_sha2_password\x00')
+    response = (struct.pack('<IIB', client_caps, 1 << 24, 255) + b'\x00' * 23 + b'pos\x00' +
+                b'\x20' + b'\x33' * 32 + b'caching_sha2_password\x00')
+    return greeting, response, b'\x00\x00\x00\x02\x00\x00\x00'
+
+
+def select_resultset(rows, cols=6, deprecate_eof=True):
+    """COM_QUERY 에 대한 텍스트 결과셋 (컬럼 정의 + [EOF] + 행 + EOF 또는 DEPRECATE_EOF 의 0xFE OK)"""
+    frames = [mysql_frame(1, bytes([cols]))]
+    seq = 2
+    for i in range(cols):
+        coldef = (lenenc_str("def") + lenenc_str("pos") + lenenc_str("tb_menu") + lenenc_str("tb_menu") +
+                  lenenc_str(f"col{i}") + lenenc_str(f"col{i}") + b'\x0c' + struct.pack('<HIBHB', 33, 255, 0xfd, 0, 0) + b'\x00\x00')
+        frames.append(mysql_frame(seq, coldef)); seq += 1
+    if not deprecate_eof:
+        frames.append(mysql_frame(seq, b'\xfe\x00\x00\x02\x00')); seq += 1
+    for r in range(rows):
+        row = b''.join(lenenc_str(f"v{r}_{c}") for c in range(cols))
+        frames.append(mysql_frame(seq, row)); seq += 1
+    frames.append(mysql_frame(seq, b'\xfe\x00\x00\x02\x00\x00\x00' if deprecate_eof else b'\xfe\x00\x00\x02\x00'))
+    return b''.join(frames)
+
+
+def synthetic_segments(count, client=CLIENT, mss=1460):
+    """
+    (src, dst, seq, payload) 튜플 목록을 생성합니다.
+    핸드셰이크(MySQL 8, DEPRECATE_EOF) 후 PREPARE/EXECUTE 주문 트래픽과 메뉴 폴링 SELECT 가 섞인 한 연결의 대화를 반복합니다.
+    """
+    segments = []
+    c_seq, s_seq = 1000, 5000
+
+    def send(src, dst, data):
+        nonlocal c_seq, s_seq
+        for i in range(0, len(data), mss):
+            chunk = data[i:i + mss]
+            if src is client:
+                segments.append((src, dst, c_seq, chunk)); c_seq += len(chunk)
+            else:
+                segments.append((src, dst, s_seq, chunk)); s_seq += len(chunk)
+
+    greeting, response, auth_ok = handshake()
+    send(SERVER, client, mysql_frame(0, greeting))
+    send(client, SERVER, mysql_frame(1, response))
+    send(SERVER, client, mysql_frame(2, auth_ok))
+    send(client, SERVER, mysql_frame(0, b'\x16' + ORDER_INSERT.encode()))
+    send(SERVER, client, mysql_frame(1, b'\x00' + struct.pack('<IHHxH', 1, 0, 10, 0)))
+    order_no = 0
+    while len(segments) < count:
+        order_no += 1
+        send(client, SERVER, mysql_frame(0, order_execute(1, order_no)))
+        send(SERVER, client, mysql_frame(1, b'\x00\x01\x00\x02\x00\x00\x00'))
+        send(client, SERVER, mysql_frame(0, b'\x03SELECT * FROM tb_menu WHERE use_yn = 1'))
+        send(SERVER, client, select_resultset(20))
+    return segments[:count]
+
+
+def synthetic_frames(count):
+    return [tcp_frame(src, dst, seq, payload) for src, dst, seq, payload in synthetic_segments(count)]
+
+
+def _report(name, count, elapsed, unit="pkt"):
+    print(f"  {name:<28} {count / elapsed:>12,.0f} {unit}/s  ({elapsed * 1e6 / count:.2f} us/{unit})")
+
+
+def _best_of(fn, repeat=3):
+    """노이즈를 줄이기 위해 여러 번 실행해 가장 빠른 시간을 사용"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_capture(args):
+    """캡처 엔진별 패킷 해석 비용: raw(struct 헤더 해석) vs scapy(디섹션 + bytes(payload))"""
+    frames = synthetic_frames(args.packets)
+    print(f"[*] capture decode: {len(frames)} frames")
+
+    decode_frame = rawcap.decode_frame
+    start = time.perf_counter()
+    for frame in frames:
+        seg = decode_frame(frame, rawcap.DLT_EN10MB, MYSQL_PORT)
+        if seg is not None:
+            seg[6]
+    _report("raw (struct + memoryview)", len(frames), time.perf_counter() - start)
+
+    try:
+        from scapy.all import Ether, IP, TCP
+    except ImportError:
+        print("  scapy                        (not installed)")
+        return
+    start = time.perf_counter()
+    for frame in frames:
+        pkt = Ether(frame)
+        if pkt.haslayer(TCP) and pkt.haslayer(IP):
+            bytes(pkt[TCP].payload)
+    _report("scapy (dissect + bytes)", len(frames), time.perf_counter() - start)
+
+
+def binary_row(i):
+    """COM_STMT_EXECUTE 결과셋의 바이너리 행 (LONG, LONGLONG, DOUBLE, VAR_STRING x3)"""
+    return (b'\x00' + b'\x00' + struct.pack('<iqd', i, i * 1000, i * 0.5) +
+            lenenc_str(f"menu-{i}") + lenenc_str("kitchen") + lenenc_str("2026-02-03 12:00:00"))
+
+
+ROW_TYPES = [0x03, 0x08, 0x05, 0xfd, 0xfd, 0xfd]
+
+
+def bench_rows(args):
+    """결과셋 행 디코딩: parse_binary_row / parse_text_resultset_row 의 행당 비용"""
+    import scapy_main
+    rows = args.packets
+    binary = [binary_row(i) for i in range(rows)]
+    text = [b''.join(lenenc_str(f"v{i}_{c}") for c in range(6)) for i in range(rows)]
+    print(f"[*] row decode: {rows} rows x 6 columns")
+
+    parse_binary_row = scapy_main.parse_binary_row
+    _report("binary rows", rows, _best_of(lambda: [parse_binary_row(row, 6, ROW_TYPES) for row in binary]), "row")
+
+    parse_text_resultset_row = scapy_main.parse_text_resultset_row
+    _report("text rows", rows, _best_of(lambda: [parse_text_resultset_row(row, 0, 6) for row in text]), "row")
+
+
+def bench_execute(args):
+    """주문 INSERT EXECUTE 파라미터 디코딩: 매번 타입을 다시 읽고 값마다 디스패치하는 경로 vs Statement 별 캐시된 디코더 플랜"""
+    import scapy_main
+    count = args.packets
+    bound = [memoryview(order_execute(1, i)) for i in range(count)]
+    unbound = [memoryview(order_execute(1, i, bound=False)) for i in range(count)]
+    print(f"[*] execute decode: {count} EXECUTE packets x 10 params")
+
+    parse_binary_values = scapy_main.parse_binary_values
+    _report("per-value (types in packet)", count, _best_of(lambda: [parse_binary_values(p, 10, 10, []) for p in bound]), "exec")
+
+    parse_execute_params = scapy_main.parse_execute_params
+    stmt_info = {"num_params": 10, "param_types": None, "plans": {}}
+    _report("plan (types in packet)", count, _best_of(lambda: [parse_execute_params(p, stmt_info) for p in bound]), "exec")
+    _report("plan (types reused)", count, _best_of(lambda: [parse_execute_params(p, stmt_info) for p in unbound]), "exec")
+    assert parse_execute_params(bound[7], stmt_info) == parse_binary_values(bound[7], 10, 10, [])
+
+    from order_record import build_order
+    from order_rules import DEFAULT_RULES, RuleSet
+    plan, _ = RuleSet(DEFAULT_RULES).by_table["tb_order"].compile(ORDER_INSERT)
+    _report("plan + order record", count, _best_of(lambda: [build_order(plan, parse_execute_params(p, stmt_info)) for p in unbound]), "exec")
+
+
+def bench_resultsets(args):
+    """메뉴 폴링 결과셋(20행 x 6컬럼) 한 번의 파싱 비용: 구독(행 디코딩 + 이벤트) vs 미구독(프레임 길이로 건너뜀)"""
+    import scapy_main
+    scapy_main.event_sink = _NullSink()
+    count = args.packets // 20 or 1
+    query = mysql_frame(0, b'\x03SELECT * FROM tb_menu WHERE use_yn = 1')
+    result = select_resultset(20)
+    server = ("127.0.0.1", MYSQL_PORT)
+    parse = scapy_main.parse_mysql_payload
+    print(f"[*] result set bypass: {count} result sets x 20 rows")
+
+    def run(client):
+        for _ in range(count):
+            parse(query, client, server, True)
+            parse(result, server, client, False)
+
+    scapy_main.set_subscriptions(["tb_menu"])
+    _report("subscribed (decode + event)", count, _best_of(lambda: run(("10.0.0.1", 1))), "set")
+    scapy_main.set_subscriptions([])
+    _report("not subscribed (skip)", count, _best_of(lambda: run(("10.0.0.2", 2))), "set")
+
+
+def bench_fingerprint(args):
+    """COM_QUERY 분류 비용: 처음 보는 텍스트(정규화 + 다이제스트) vs 같은 텍스트 반복(캐시 dict 조회)"""
+    from sql_fingerprint import Fingerprinter
+    count = args.packets
+    queries = [f"SELECT menu_id, menu_nm, price FROM tb_menu WHERE store_id = {i} AND use_yn = 'Y'" for i in range(count)]
+    print(f"[*] fingerprint: {count} queries (literal-only variants)")
+
+    def run(fp, texts):
+        for q in texts:
+            fp(q)
+
+    _report("miss (normalize + digest)", count, _best_of(lambda: run(Fingerprinter(count, 16), queries)), "query")
+    cached = Fingerprinter(count, 16)
+    run(cached, queries)
+    _report("hit (same text)", count, _best_of(lambda: run(cached, queries)), "query")
+    print(f"[*] distinct digests: {len(cached.by_digest)}")
+
+
+def suborder_literal_insert(rows, start=0):
+    """prepared statement 없이 COM_QUERY 로 보내는 다중 행 tb_suborder INSERT 텍스트"""
+    values = ",".join(f"('A{i:08d}', {i}, 'M{i % 40:03d}', '김치찌개 \\'특\\'', {i % 3 + 1}, {8000 + i}.50, NULL, 'T{i % 20:02d}')"
+                      for i in range(start, start + rows))
+    return "INSERT INTO tb_suborder (order_no, sub_no, menu_id, menu_nm, qty, price, memo, seat_no) VALUES " + values
+
+
+def bench_literals(args):
+    """
+    리터럴 다중 행 INSERT(500행 x 8컬럼): 전체 정규화(기존 COM_QUERY 분류, 값 없음),
+    전체 정규화 + 토큰 스캔(빠른 경로가 없을 때 값까지 얻는 느린 경로) vs 항목 정규식 한 번으로 지문 + 값 추출
+    """
+    from sql_fingerprint import normalize
+    from sql_literals import LiteralParser, _ITEM, _scan_values_slow
+    rows = 500
+    count = max(args.packets // 1000, 5)
+    queries = [suborder_literal_insert(rows, i * rows) for i in range(count)]
+    print(f"[*] literal INSERT: {count} statements x {rows} rows ({len(queries[0]):,} bytes each)")
+    start = queries[0].index("VALUES (") + 8
+    _report("normalize only (old path)", count, _best_of(lambda: [normalize(q) for q in queries]), "stmt")
+    _report("normalize + token scan", count,
+            _best_of(lambda: [(normalize(q), _scan_values_slow(q, start - 1)) for q in queries]), "stmt")
+    _report("item regex findall only", count, _best_of(lambda: [_ITEM.findall(q, start) for q in queries]), "stmt")
+    parser = LiteralParser()
+    _report("fingerprint + all values", count, _best_of(lambda: [parser(q) for q in queries]), "stmt")
+    parsed = parser(queries[0])
+    assert parsed.fp.normalized == normalize(queries[0]) and len(parsed.rows) == rows
+    print(f"[*] {parsed.fp.digest} {parsed.fp.normalized}")
+    print(f"[*] row 1: {parsed.rows[1]}")
+
+    from order_record import build_order
+    from order_rules import DEFAULT_RULES, RuleSet
+    plan, _ = RuleSet(DEFAULT_RULES).by_table["tb_suborder"].compile_columns(parsed.columns)
+    _report("+ order records", count, _best_of(lambda: [[build_order(plan, r) for r in parser(q).rows] for q in queries]), "stmt")
+
+
+def bench_spool(args):
+    """주문 스풀: 몰아서 들어올 때 처리량(그룹 커밋당 주문 수) / 주문이 띄엄띄엄 올 때 append → fsync 확정까지 지연"""
+    import queue
+    import shutil
+    import tempfile
+    from order_spool import OrderSpool
+    event = {"type": "tb_order", "order_no": "20240101-0001", "seat_no": "T12", "total_price": 42000,
+             "items": [{"menu_cd": f"M{i:03d}", "qty": 1, "price": 8000} for i in range(4)], "commit": "commit"}
+    directory = tempfile.mkdtemp(prefix="spool-bench-")
+    try:
+        count = args.packets
+        target = queue.Queue()
+        spool = OrderSpool(directory, target, log=lambda level, message: None)
+        spool.open()
+        t0 = time.perf_counter()
+        for _ in range(count):
+            spool.append(event)
+        spool.close()
+        elapsed = time.perf_counter() - t0
+        stats = spool.stats()
+        _report("burst append → durable", count, elapsed, "order")
+        print(f"[*] {stats['fsyncs']:,} fsyncs ({count / stats['fsyncs']:.0f} orders/fsync, avg {stats['sync_ms']:.2f} ms)")
+
+        paced = min(count, 500)
+        # 앞 측정의 확인 안 된 주문이 다시 재생되지 않도록 새 디렉터리
+        target = queue.Queue()
+        spool = OrderSpool(os.path.join(directory, "paced"), target, log=lambda level, message: None)
+        spool.open()
+        latencies = []
+        for _ in range(paced):
+            spool.append(event)
+            enqueued, _, _ = target.get()
+            latencies.append(time.monotonic() - enqueued)
+            time.sleep(0.002)
+        spool.close()
+        latencies.sort()
+        print(f"[*] paced ({paced} orders, 2 ms apart) append → durable: p50={latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _delivery_servers():
+    """로컬 수신 서버 두 개: HTTP POST(api/external_order 와 같은 응답) / 이벤트 스트림(HELLO → RESUME, 줄마다 누적 ACK)"""
+    import json
+    import socket
+    import socketserver
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class PostHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            body = b'{"status":"success"}'
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    class StreamHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            json.loads(self.rfile.readline())
+            self.wfile.write(b'{"type":"RESUME","seq":0}\n')
+            for line in self.rfile:
+                seq = json.loads(line)["seq"]
+                self.wfile.write(b'{"type":"ACK","seq":%d}\n' % seq)
+
+    class StreamServer(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), PostHandler)
+    stream_server = StreamServer(("127.0.0.1", 0), StreamHandler)
+    for server in (http_server, stream_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return http_server.server_port, stream_server.server_address[1]
+
+
+def bench_delivery(args):
+    """주문 전송: 주문마다 새 연결 POST(기존 send_worker) vs 묶음 keep-alive POST vs 이벤트 스트림 — 처리량과 2 ms 간격 주문의 전달 지연"""
+    import http.client
+    import json
+    import queue
+    from order_delivery import HttpDelivery, StreamDelivery
+    http_port, stream_port = _delivery_servers()
+    event = {"type": "tb_order", "order_no": "20240101-0001", "seat_no": "T12", "total_price": 42000,
+             "items": [{"menu_cd": f"M{i:03d}", "qty": 1, "price": 8000} for i in range(4)], "commit": "commit"}
+    quiet = lambda level, message: None
+    count = min(args.packets, 5000)
+
+    def post_each(n):
+        for _ in range(n):
+            conn = http.client.HTTPConnection("127.0.0.1", http_port)
+            conn.request("POST", "/api/external_order", json.dumps(event), {"Content-Type": "application/json"})
+            conn.getresponse().read()
+            conn.close()
+    print(f"[*] delivery: {count} orders (burst), 300 orders 2 ms apart (latency)")
+    _report("POST per order, new connection", count, _best_of(lambda: post_each(count), repeat=1), "order")
+
+    def run(make, n, pace):
+        source = queue.Queue()
+        delivery = make(source)
+        delivery.start()
+        t0 = time.perf_counter()
+        for _ in range(n):
+            source.put((time.monotonic(), event, None))
+            if pace:
+                time.sleep(pace)
+        source.put(None)
+        delivery.join()
+        return time.perf_counter() - t0, delivery.stats()
+
+    transports = (
+        ("batched keep-alive POST", lambda q: HttpDelivery(f"http://127.0.0.1:{http_port}/api/external_order", q, log=quiet)),
+        ("event stream (NDJSON)", lambda q: StreamDelivery("127.0.0.1", stream_port, q, log=quiet)),
+    )
+    for name, make in transports:
+        elapsed, _ = run(make, count, 0)
+        _report(name, count, elapsed, "order")
+    for name, make in transports:
+        _, stats = run(make, 300, 0.002)
+        print(f"[*] {name:<30} paced latency p50={stats['p50']:.2f} ms, p99={stats['p99']:.2f} ms, writes/requests={stats['requests']}")
+
+
+def bench_jsonl(args):
+    """JSONL 로그 기록: 이벤트마다 open/append/close(기존 logging_worker) vs 스트림별 열린 핸들 + 묶음 writelines(jsonl_writer)"""
+    import json
+    import shutil
+    import tempfile
+    from jsonl_writer import JsonlWriter
+    count = args.packets
+    streams = ("sql_history", "data_results", "order_tracking")
+    events = [(streams[i % 3], {"ts": "2024-01-01 12:00:00.000000", "src": "127.0.0.1:50000", "dst": "127.0.0.1:3306",
+                                "tx_id": "c0ffee", "summary": f"[SQL] insert into tb_order values ({i}, 'T12', 42000)"})
+              for i in range(count)]
+    directory = tempfile.mkdtemp(prefix="jsonl-bench-")
+    print(f"[*] JSONL log writer: {count} events over {len(streams)} streams")
+    try:
+        def open_append_close():
+            for stream, data in events:
+                with open(os.path.join(directory, stream + ".jsonl"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+        def batched(batch_size=1000):
+            writer = JsonlWriter(os.path.join(directory, "segments"))
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            for start in range(0, count, batch_size):
+                lines = {}
+                for stream, data in events[start:start + batch_size]:
+                    lines.setdefault(stream, []).append(encode(data) + "\n")
+                for stream, stream_lines in lines.items():
+                    writer.write(stream, stream_lines)
+                writer.maybe_flush()
+            writer.close()
+            return writer.stats()
+
+        _report("open/append/close per event", count, _best_of(open_append_close, repeat=1), "event")
+        _report("open handles + batched writelines", count, _best_of(batched, repeat=1), "event")
+        print(f"[*] {batched()}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_stamps(args):
+    """이벤트 시각/트랜잭션 ID: datetime.now().strftime + uuid4 (기존 log_event/reset) vs 초 단위 캐시 포맷터 + 카운터(event_time)"""
+    import uuid
+    from datetime import datetime
+    from event_time import TimestampFormatter, TxIds
+    count = args.packets
+    # 1 ms 간격 캡처 시각 (같은 초 안의 이벤트가 캐시된 앞부분을 재사용)
+    times = [1700000000.0 + i * 0.001 for i in range(count)]
+    print(f"[*] Event timestamps/transaction ids: {count} events")
+
+    def wall_clock():
+        for _ in times:
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    def cached(formatter=TimestampFormatter()):
+        for ts in times:
+            formatter(ts)
+
+    def uuid_ids():
+        for _ in times:
+            str(uuid.uuid4())[:8]
+
+    def counter_ids(ids=TxIds()):
+        for _ in times:
+            ids()
+
+    _report("datetime.now().strftime", count, _best_of(wall_clock), "event")
+    _report("cached second prefix", count, _best_of(cached), "event")
+    _report("uuid4()[:8]", count, _best_of(uuid_ids), "event")
+    _report("pid + counter", count, _best_of(counter_ids), "event")
+
+
+def bench_metrics(args):
+    """메트릭 갱신 비용: 캡처 경로의 카운터 .value += 1 / 지역 정수 덧셈 / 히스토그램 observe, 그리고 /metrics 응답 한 번 생성"""
+    from metrics import MetricsRegistry
+    count = args.packets
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_packets_total", "packets")
+    histogram = registry.histogram("bench_latency_seconds", "latency")
+    for i in range(50):
+        registry.counter("bench_events_total", "events", {"type": f"T{i}"}).inc(i)
+    print(f"[*] Metrics: {count} updates")
+
+    def local_int():
+        n = 0
+        for _ in range(count):
+            n += 1
+
+    def counter_inc():
+        for _ in range(count):
+            counter.value += 1
+
+    def histogram_observe():
+        observe = histogram.observe
+        for i in range(count):
+            observe((i % 1000) * 0.0001)
+
+    _report("local int += 1", count, _best_of(local_int), "update")
+    _report("counter.value += 1", count, _best_of(counter_inc), "update")
+    _report("histogram.observe", count, _best_of(histogram_observe), "update")
+    _report("render /metrics", 100, _best_of(lambda: [registry.render() for _ in range(100)]), "scrape")
+
+
+def bench_rules(args):
+    """주문 규칙 매칭 비용: 규칙 수(기본 2개 vs 테이블/지문 규칙 수천 개)와 무관하게 dict 조회만 하는지 확인"""
+    from order_rules import DEFAULT_RULES, RuleSet
+    from sql_fingerprint import fingerprint
+    count = args.packets
+    fp = fingerprint(ORDER_INSERT)
+    print(f"[*] rule match: {count} lookups")
+    for extra in (0, 1000, 10000):
+        rules = list(DEFAULT_RULES["rules"])
+        rules += [{"table": f"tb_store{i}_order"} for i in range(extra // 2)]
+        rules += [{"digest": f"{i:016x}"} for i in range(extra // 2)]
+        match = RuleSet({"rules": rules}).match
+        _report(f"{len(rules)} rules", count, _best_of(lambda: [match(fp) for _ in range(count)]), "match")
+
+
+def bench_pcap(args):
+    """재생(--replay) 벤치마크용 합성 pcap 파일 생성 (linktype: Ethernet, 1ms 간격)"""
+    out = args.out or "synthetic.pcap"
+    with open(out, "wb") as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for i, frame in enumerate(synthetic_frames(args.packets)):
+            f.write(struct.pack('<IIII', 1770000000 + i // 1000, (i % 1000) * 1000, len(frame), len(frame)))
+            f.write(frame)
+    print(f"[*] wrote {args.packets} frames to {out}")
+
+
+def _generate_lo_traffic(seconds, stop):
+    """127.0.0.1:MYSQL_PORT 로 주문 EXECUTE 프레임을 세그먼트 하나씩(TCP_NODELAY) 계속 전송"""
+    import socket
+    import threading
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", MYSQL_PORT))
+    server.listen(1)
+
+    def drain():
+        conn, _ = server.accept()
+        while conn.recv(1 << 20):
+            pass
+        conn.close()
+
+    threading.Thread(target=drain, daemon=True).start()
+    client = socket.create_connection(("127.0.0.1", MYSQL_PORT))
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    frames = [mysql_frame(0, order_execute(1, i)) for i in range(1000)]
+    sent = 0
+    deadline = time.perf_counter() + seconds
+    while not stop.is_set() and time.perf_counter() < deadline:
+        client.send(frames[sent % 1000])
+        sent += 1
+    client.close()
+    server.close()
+    return sent
+
+
+def bench_live(args):
+    """lo 인터페이스 실측: 캡처 소스별 초당 수신·해석 패킷 수와 커널 드롭"""
+    import threading
+    try:
+        import tpacket
+    except ImportError as e:
+        print(f"[ERROR] tpacket unavailable: {e}")
+        return
+    sources = [("tpacket (TPACKET_V3 ring)", lambda: tpacket.TpacketSource("lo", MYSQL_PORT))]
+    try:
+        import scapy.all  # noqa: F401  (LiveSource 는 scapy 소켓을 빌려 씀)
+        sources.append(("raw (scapy L2listen)", lambda: rawcap.LiveSource("lo", f"tcp port {MYSQL_PORT}")))
+    except ImportError:
+        print("  raw (scapy L2listen)         (scapy not installed)")
+    print(f"[*] live capture on lo: {args.seconds:.0f} s per source")
+
+    decode_frame = rawcap.decode_frame
+    for name, open_source in sources:
+        source = open_source()
+        stop = threading.Event()
+        result = {}
+        gen = threading.Thread(target=lambda: result.update(sent=_generate_lo_traffic(args.seconds, stop)))
+        gen.start()
+        count = 0
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        for _ts, frame in source:
+            if decode_frame(frame, source.linktype, MYSQL_PORT) is not None:
+                count += 1
+            if time.perf_counter() >= deadline:
+                break
+        elapsed = time.perf_counter() - start
+        stop.set()
+        gen.join()
+        stats = source.stats() if hasattr(source, "stats") else None
+        source.close()
+        _report(name, max(count, 1), elapsed)
+        print(f"      send() calls: {result.get('sent', 0):,}, captured: {count:,}"
+              + (f", kernel drops: {stats['drops']:,}" if stats else ""))
+        time.sleep(0.5)  # TIME_WAIT 포트 정리 대기
+
+
+class _NullSink:
+    """이벤트 출력/기록 없이 파서 비용만 측정하기 위한 event_sink"""
+    def put(self, item):
+        pass
+
+
+def bench_sessions(args):
+    """
+    커넥션 풀 교체 시뮬레이션: 2초마다 새 연결이 PREPARE 후 주문 EXECUTE 5건을 보내고,
+    1/3 은 COM_QUIT, 1/3 은 FIN, 1/3 은 말없이 사라짐(유휴 만료 대상). 시뮬레이션 시각 1시간마다 상태 수와 메모리를 출력.
+    """
+    import tracemalloc
+    import scapy_main
+    scapy_main.event_sink = _NullSink()
+    registry = scapy_main.registry
+    now = [0.0]
+    registry.clock = lambda: now[0]
+    parse = scapy_main.parse_mysql_payload
+    server = ("127.0.0.1", MYSQL_PORT)
+    prepare = mysql_frame(0, b'\x16' + ORDER_INSERT.encode())
+    prepare_ok = mysql_frame(1, b'\x00' + struct.pack('<IHHxH', 1, 0, 10, 0))
+    executes = [mysql_frame(0, order_execute(1, i)) for i in range(5)]
+    ok = mysql_frame(1, b'\x00\x01\x00\x02\x00\x00\x00')
+    quit_ = mysql_frame(0, b'\x01')
+
+    tracemalloc.start()
+    print(f"[*] session churn: {args.hours:.0f} h, new connection every 2 s")
+    print(f"  {'hour':>4} {'live conns':>10} {'statements':>10} {'expired':>8} {'evicted':>8} {'traced KB':>10}")
+    port = 0
+    end = args.hours * 3600
+    next_report = 0.0
+    while now[0] <= end:
+        if now[0] >= next_report:
+            stats = registry.stats()
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"  {now[0] / 3600:>4.0f} {stats['connections']:>10,} {stats['statements']:>10,} "
+                  f"{stats['expired']:>8,} {stats['evicted_connections']:>8,} {current / 1024:>10,.0f}")
+            next_report += 3600
+        port = port % 60000 + 1
+        client = ("10.0.0.%d" % (port % 250 + 1), 1024 + port)
+        parse(prepare, client, server, True)
+        parse(prepare_ok, server, client, False)
+        for frame in executes:
+            parse(frame, client, server, True)
+            parse(ok, server, client, False)
+        if port % 3 == 0:
+            parse(quit_, client, server, True)
+        elif port % 3 == 1:
+            scapy_main.close_connection(client[0], client[1], server[0], server[1], True)
+        now[0] += 2.0
+    tracemalloc.stop()
+
+
+BENCHMARKS = {
+    "capture": bench_capture,
+    "delivery": bench_delivery,
+    "execute": bench_execute,
+    "fingerprint": bench_fingerprint,
+    "jsonl": bench_jsonl,
+    "stamps": bench_stamps,
+    "metrics": bench_metrics,
+    "literals": bench_literals,
+    "live": bench_live,
+    "pcap": bench_pcap,
+    "resultsets": bench_resultsets,
+    "rows": bench_rows,
+    "rules": bench_rules,
+    "sessions": bench_sessions,
+    "spool": bench_spool,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MySQL Sniffer pipeline benchmarks")
+    parser.add_argument("bench", choices=sorted(BENCHMARKS))
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--out", help="pcap: 출력 파일 경로")
+    parser.add_argument("--seconds", type=float, default=5.0, help="live: 소스별 측정 시간")
+    parser.add_argument("--hours", type=float, default=14.0, help="sessions: 시뮬레이션할 영업 시간")
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.bench](args)
+
+
+if __name__ == "__main__":
+    main()
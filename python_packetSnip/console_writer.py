@@ -0,0 +1,158 @@
+"""
+작성의도: 캡처 스레드가 이벤트마다 print(+flush) 하다가 터미널이나 관리자 콘솔 파이프가 밀리면 캡처까지 멈추던 문제를 막습니다.
+기능 원리: write() 는 줄을 상한 있는 deque 에 넣기만 하고(가득 차면 가장 오래된 줄을 버림) 출력은 전용 스레드가 모아서 한 번에 씁니다.
+          이벤트 종류별 출력 수준(show: 한 줄씩, summary: 개수만, off: 무시)을 두고, summary 로 감춘 줄과 밀려서 버린 줄은
+          SUMMARY_INTERVAL 마다 "[*] Console: 412 DATA rows suppressed" 한 줄로 요약합니다.
+"""
+import atexit
+import collections
+import os
+import sys
+import threading
+import time
+
+# [설정] 출력 대기 줄 상한 (넘으면 가장 오래된 줄부터 버림) / 요약 출력 주기(초)
+CONSOLE_BUFFER = 10000
+SUMMARY_INTERVAL = 1.0
+LEVELS = ("show", "summary", "off")
+
+
+def parse_levels(specs):
+    """["DATA=show", "SQL=summary"] → {"DATA": "show", "SQL": "summary"} (잘못된 항목은 ValueError)"""
+    levels = {}
+    for spec in specs or ():
+        kind, _, level = spec.partition('=')
+        if level not in LEVELS:
+            raise ValueError(f"console level must be one of {', '.join(LEVELS)}: {spec}")
+        levels[kind.upper()] = level
+    return levels
+
+
+class ConsoleWriter:
+    """
+    종류(kind)별 수준에 따라 줄을 비동기로 출력. 출력 스레드는 프로세스마다 첫 write 때 시작되고 종료 시 남은 줄을 씁니다.
+    units 는 요약 문구의 단위 ({"DATA": "rows"} → "412 DATA rows suppressed")입니다.
+    """
+    def __init__(self, stream=None, capacity=CONSOLE_BUFFER, levels=None, units=None, interval=SUMMARY_INTERVAL):
+        self.stream = stream
+        self.capacity = capacity
+        self.levels = dict(levels or {})
+        self.units = dict(units or {})
+        self.interval = interval
+        self.lines = collections.deque(maxlen=capacity)
+        self.wakeup = threading.Event()
+        self.idle = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+        self.closing = False
+        self.summarize = False
+        # 누적 카운터 (캡처 스레드만 올리고 출력 스레드는 이전 값과의 차이만 읽음)
+        self.suppressed = {}
+        self.reported = {}
+        self.dropped = 0
+        self.dropped_reported = 0
+        self.written = 0
+
+    def shows(self, kind):
+        return self.levels.get(kind, "show") == "show"
+
+    def set_levels(self, levels):
+        self.levels.update(levels)
+
+    def write(self, kind, line):
+        """줄 하나를 출력 대기열에 넣음 (막히지 않음). 수준이 show 가 아니면 개수만 셈"""
+        if self.levels.get(kind, "show") != "show":
+            self.suppress(kind)
+            return
+        if self.pid != os.getpid():
+            self._start()
+        if len(self.lines) >= self.capacity:
+            self.dropped += 1
+        self.lines.append(line)
+        self.idle.clear()
+        self.wakeup.set()
+
+    def suppress(self, kind, count=1):
+        """show 가 아닌 종류의 줄을 만들지 않고 개수만 기록 (shows() 로 먼저 확인한 호출자용)"""
+        if self.levels.get(kind, "show") == "summary":
+            if self.pid != os.getpid():
+                self._start()
+            self.suppressed[kind] = self.suppressed.get(kind, 0) + count
+
+    def flush(self, timeout=2.0):
+        """대기 중인 줄을 다 쓸 때까지 기다림 (통계 출력 직전 등). 파이프가 막혀 있으면 timeout 후 돌아옴"""
+        if self.thread is None or self.pid != os.getpid():
+            return
+        # 감춘 줄 요약도 통계보다 먼저 나가도록 바로 출력
+        self.summarize = True
+        self.idle.clear()
+        self.wakeup.set()
+        self.idle.wait(timeout)
+
+    def close(self, timeout=2.0):
+        if self.thread is None or self.pid != os.getpid():
+            return
+        self.closing = True
+        self.wakeup.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _start(self):
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            # fork 로 만든 자식 프로세스면 부모의 대기 줄은 부모가 출력
+            self.lines.clear()
+            self.closing = False
+            self.thread = threading.Thread(target=self._run, name="console-writer", daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+        atexit.register(self.close)
+
+    def _run(self):
+        stream = self.stream or sys.stdout
+        next_summary = time.monotonic() + self.interval
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            chunk = []
+            pop = self.lines.popleft
+            try:
+                while True:
+                    chunk.append(pop())
+            except IndexError:
+                pass
+            if time.monotonic() >= next_summary or self.closing or self.summarize:
+                next_summary = time.monotonic() + self.interval
+                self.summarize = False
+                summary = self._summary()
+                if summary:
+                    chunk.append(summary)
+            if chunk:
+                try:
+                    stream.write('\n'.join(chunk) + '\n')
+                    stream.flush()
+                except (OSError, ValueError):
+                    # 파이프가 닫힘: 캡처는 계속하고 출력만 버림
+                    pass
+                self.written += len(chunk)
+            if not self.lines:
+                self.idle.set()
+            if self.closing and not self.lines:
+                break
+
+    def _summary(self):
+        """지난 요약 이후 감춘/버린 줄 수 (없으면 None)"""
+        parts = []
+        for kind, total in list(self.suppressed.items()):
+            count = total - self.reported.get(kind, 0)
+            if count:
+                self.reported[kind] = total
+                unit = self.units.get(kind)
+                parts.append(f"{count:,} {kind} {unit} suppressed" if unit else f"{count:,} {kind} suppressed")
+        dropped = self.dropped - self.dropped_reported
+        if dropped:
+            self.dropped_reported += dropped
+            parts.append(f"{dropped:,} lines dropped (output backlog)")
+        return f"[*] Console: {', '.join(parts)}" if parts else None
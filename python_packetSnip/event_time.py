@@ -0,0 +1,49 @@
+"""
+작성의도: 이벤트마다 datetime.now().strftime() 과 uuid.uuid4() 를 부르던 비용을 없애고, 이벤트 시각을 파서가 처리한 시각이 아닌
+          패킷 캡처 시각으로 찍어 재생/적체 상황에서도 지연 계산이 맞도록 합니다.
+기능 원리: TimestampFormatter 는 초 단위 앞부분("YYYY-MM-DD HH:MM:SS.")을 캐시하고 마이크로초 6자리만 붙입니다
+          (같은 초 안의 이벤트는 strftime 없이 문자열 연결 한 번). 트랜잭션 ID 는 프로세스 접두어 + 단조 증가 카운터입니다.
+"""
+import itertools
+import os
+import time
+
+
+class TimestampFormatter:
+    """epoch 초(float) → 'YYYY-MM-DD HH:MM:SS.ffffff' (sep='T' 면 ISO 8601, micros=False 면 초까지, 로컬 시간)"""
+    __slots__ = ("fmt", "micros", "cached")
+
+    def __init__(self, sep=' ', micros=True):
+        self.fmt = f"%Y-%m-%d{sep}%H:%M:%S" + ('.' if micros else '')
+        self.micros = micros
+        # (초, 앞부분) 한 쌍: 여러 스레드가 동시에 초를 넘겨도 초와 앞부분이 어긋나지 않도록 한 번에 읽고 씀
+        self.cached = (None, '')
+
+    def __call__(self, ts):
+        # 반올림 후 나눔 (0.001 이 0.000999 로 찍히는 부동소수 오차 방지)
+        second, micro = divmod(int(ts * 1000000 + 0.5), 1000000)
+        cached_second, prefix = self.cached
+        if second != cached_second:
+            prefix = time.strftime(self.fmt, time.localtime(second))
+            self.cached = (second, prefix)
+        if not self.micros:
+            return prefix
+        return prefix + '%06d' % micro
+
+
+class TxIds:
+    """프로세스마다 겹치지 않는 트랜잭션 ID: '<pid 16진수>-<카운터 16진수>' (샤딩 워커는 spawn 이므로 프로세스마다 새로 만들어짐)"""
+    __slots__ = ("prefix", "counter")
+
+    def __init__(self):
+        self.prefix = f"{os.getpid():x}-"
+        self.counter = itertools.count(1)
+
+    def __call__(self):
+        return self.prefix + '%x' % next(self.counter)
+
+
+# 모듈 공용 인스턴스 (캐시는 튜플 하나라 스레드 간에 공유해도 결과가 틀리지 않음: 최악의 경우 초 앞부분을 한 번 더 계산)
+format_timestamp = TimestampFormatter()
+format_isotime = TimestampFormatter('T')
+next_tx_id = TxIds()
@@ -0,0 +1,145 @@
+"""
+작성의도: 이벤트마다 open(..., "a") → 한 줄 쓰기 → close 하던 JSONL 로깅을, 스트림(SQL/DATA/ORDER)마다 열린 버퍼 파일 하나에
+          묶어 쓰는 방식으로 바꾸고, log/ 파일이 끝없이 커지지 않도록 크기/날짜 단위로 나눠 닫힌 조각은 압축합니다.
+기능 원리: write(stream, lines) 는 열린 핸들에 writelines 한 번으로 버퍼링하고, 쌓인 크기(FLUSH_BYTES)나 시간(FLUSH_INTERVAL)을 넘으면
+          flush 합니다. 파일은 log/<YYYY-MM-DD>/<stream>-<NNNN>.jsonl 이며 SEGMENT_BYTES 를 넘거나 날짜가 바뀌면 다음 번호로 교체되고,
+          닫힌 조각은 백그라운드 스레드가 .jsonl.gz 로 압축한 뒤 원본을 지웁니다.
+"""
+import gzip
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+# [설정] 조각 하나의 최대 크기(바이트) / flush 기준: 버퍼에 쌓인 크기(문자 수 기준), 마지막 flush 이후 시간(초)
+SEGMENT_BYTES = 64 * 1024 * 1024
+FLUSH_BYTES = 256 * 1024
+FLUSH_INTERVAL = 1.0
+# [설정] 닫힌 조각 gzip 압축 여부
+COMPRESS_CLOSED = True
+
+_FILE_BUFFER = 1024 * 1024
+
+
+def _today():
+    return time.strftime('%Y-%m-%d')
+
+
+class _Segment:
+    __slots__ = ("file", "path", "day", "index", "size")
+
+    def __init__(self, file, path, day, index, size):
+        self.file = file
+        self.path = path
+        self.day = day
+        self.index = index
+        self.size = size
+
+
+class JsonlWriter:
+    """
+    스트림 이름별 JSONL 조각 파일 관리자. lines 는 줄바꿈으로 끝나는 문자열 목록입니다.
+    한 스레드(로깅 워커)에서만 호출하며, 압축만 별도 스레드에서 수행합니다.
+    """
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, flush_bytes=FLUSH_BYTES, flush_interval=FLUSH_INTERVAL,
+                 compress=COMPRESS_CLOSED, today=_today):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.today = today
+        self.segments = {}
+        self.pending = 0
+        self.flushed_at = time.monotonic()
+        self.compressor = None
+        self.compress_queue = queue.Queue()
+        # 통계
+        self.lines = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.compressed = 0
+
+    @property
+    def dirty(self):
+        return self.pending > 0
+
+    def write(self, stream, lines, day=None):
+        day = day or self.today()
+        segment = self.segments.get(stream)
+        if segment is None or segment.day != day or segment.size >= self.segment_bytes:
+            segment = self._rotate(stream, segment, day)
+        segment.file.writelines(lines)
+        size = sum(map(len, lines))
+        segment.size += size
+        self.pending += size
+        self.lines += len(lines)
+
+    def maybe_flush(self):
+        """쌓인 크기나 경과 시간이 기준을 넘었으면 flush"""
+        if self.pending >= self.flush_bytes or (self.pending and time.monotonic() - self.flushed_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        for segment in self.segments.values():
+            segment.file.flush()
+        if self.pending:
+            self.flushes += 1
+        self.pending = 0
+        self.flushed_at = time.monotonic()
+
+    def close(self):
+        """모든 조각을 닫고 (압축을 켰으면) 압축 대기 중인 조각이 끝날 때까지 기다림"""
+        self.flush()
+        for segment in self.segments.values():
+            segment.file.close()
+        self.segments.clear()
+        if self.compressor is not None:
+            self.compress_queue.put(None)
+            self.compressor.join()
+            self.compressor = None
+
+    def stats(self):
+        return {"lines": self.lines, "flushes": self.flushes, "rotations": self.rotations, "compressed": self.compressed,
+                "open": len(self.segments)}
+
+    def _rotate(self, stream, segment, day):
+        if segment is not None:
+            segment.file.close()
+            self.rotations += 1
+            if self.compress:
+                self._compress_later(segment.path)
+        folder = os.path.join(self.directory, day)
+        os.makedirs(folder, exist_ok=True)
+        if segment is not None and segment.day == day:
+            index = segment.index + 1
+        else:
+            # 같은 날 다시 시작한 경우 기존 조각(압축본 포함) 다음 번호부터
+            pattern = re.compile(re.escape(stream) + r"-(\d+)\.jsonl(?:\.gz)?$")
+            numbers = [int(m.group(1)) for m in map(pattern.match, os.listdir(folder)) if m]
+            index = max(numbers, default=0) + 1
+        path = os.path.join(folder, f"{stream}-{index:04d}.jsonl")
+        file = open(path, "a", encoding="utf-8", buffering=_FILE_BUFFER)
+        segment = self.segments[stream] = _Segment(file, path, day, index, 0)
+        return segment
+
+    def _compress_later(self, path):
+        if self.compressor is None:
+            self.compressor = threading.Thread(target=self._compress_worker, name="jsonl-compress", daemon=True)
+            self.compressor.start()
+        self.compress_queue.put(path)
+
+    def _compress_worker(self):
+        while True:
+            path = self.compress_queue.get()
+            if path is None:
+                break
+            try:
+                with open(path, 'rb') as src, gzip.open(path + ".gz", 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, _FILE_BUFFER)
+                os.remove(path)
+                self.compressed += 1
+            except OSError as e:
+                print(f"[LOG ERROR] compress {path}: {e}")
@@ -1,33 +1,86 @@
+import os
 import sys
 import json
+import argparse
 import threading
 import queue
+import re
 import time
 import traceback
 from datetime import datetime
 
+# 임베디드 파이썬(_pth)은 스크립트 폴더를 sys.path 에 넣지 않으므로 같은 폴더의 모듈을 위해 추가
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sql_fingerprint import fingerprint
+from sql_literals import parse_literals
+from order_record import build_order
+from order_rules import RuleFile
+from order_assembly import OrderAssembler
+from order_dedup import DedupWindow, order_key
+from order_delivery import HttpDelivery, StreamDelivery
+from order_spool import OrderSpool
+from event_time import TimestampFormatter, format_isotime
+import metrics
+from order_trace import OrderTracer
+
 try:
     import pyshark
-    import requests
 except ImportError:
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [ERROR] 필수 패키지(pyshark, requests)가 설치되어 있지 않습니다.")
-    print("설치 방법: pip install pyshark requests")
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [ERROR] 필수 패키지(pyshark)가 설치되어 있지 않습니다.")
+    print("설치 방법: pip install pyshark")
     sys.exit(1)
 
 # [설정] Dart 서버 엔드포인트
 SERVER_URL = "http://localhost:8080/api/external_order"
 MYSQL_PORT = 3306
+# [설정] 주문 규칙 파일 (테이블/지문 → 이벤트 type, 필드 매핑). 라이브 캡처 중 수정하면 자동으로 다시 읽음
+ORDER_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "order_rules.json")
+order_rules = RuleFile(ORDER_RULES_FILE)
+# [설정] 전송 전 주문을 보관하는 디스크 스풀. 서버가 받기 전에 종료되면 다음 실행 때 다시 보냄
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
 
 # State Management: Prepared Statement ID 추적
-# PREPARE 단계에서 쿼리문을 저장하고, EXECUTE 단계에서 ID로 대조하기 위함
+# Statement ID 는 서버의 PREPARE 응답(PREPARE_OK)이 연결마다 따로 발급하므로, 요청의 쿼리는 응답이 올 때까지 연결별로 보류(pending_prepares)하고
+# 응답을 보면 {(클라이언트 ip, port): {stmt_id: [query, fp, 규칙, 컬럼 → 파라미터 위치 플랜]}} 에 저장해 EXECUTE 단계에서 ID로 대조
+pending_prepares = {}
 prepared_statements = {}
 
-# 비동기 전송을 위한 큐 설정
+# 트랜잭션 추적: pyshark 경로는 서버 응답(OK status)을 보지 않으므로 클라이언트의 BEGIN/COMMIT/ROLLBACK/SET autocommit 문으로 판단
+# open_transactions: BEGIN/START TRANSACTION 이후 COMMIT/ROLLBACK 전인 연결, manual_commit: SET autocommit=0 인 연결
+open_transactions = set()
+manual_commit = set()
+_AUTOCOMMIT = re.compile(r'autocommit\s*=\s*(\w+)', re.IGNORECASE)
+
+# 비동기 전송을 위한 큐 설정: 항목은 (넣은 시각, 주문, 스풀 순번), None 은 종료 신호
 data_queue = queue.Queue()
+orders_detected = 0
+# 지금 처리 중인 패킷의 캡처 시각(epoch 초). 레코드와 함께 조립기 meta 에 실어, 주문 timestamp 는 처리한 시각이 아닌 첫 레코드의 이 값
+capture_now = [0.0]
+# 그 패킷을 tshark 에서 받은 시각(epoch 초) / 캡처 시각이 벽시계 기준인지 (라이브 캡처만, 재생 파일 시각은 지연 계산에서 제외)
+received_now = [0.0]
+capture_live = False
+
+# [캡처 설정] 라이브/오프라인 공통 - TCP 재조합 및 바이너리 분석 최적화
+# PREPARE/EXECUTE + PREPARE 응답(Statement ID) + 트랜잭션 제어/리터럴 INSERT COM_QUERY + 연결 종료(FIN/RST)만 tshark 에서 통과
+CAPTURE_OPTIONS = dict(
+    display_filter=(f'tcp.port == {MYSQL_PORT} && (mysql.command == 22 || mysql.command == 23 || mysql.num_params || '
+                    '(mysql.command == 3 && mysql.query matches "(?i)^ *(begin|start|commit|rollback|set +autocommit|insert|replace)") || '
+                    'tcp.flags.fin == 1 || tcp.flags.reset == 1)'),
+    use_json=True,
+    include_raw=False,
+    decode_as={f'tcp.port=={MYSQL_PORT}': 'mysql'},
+    override_prefs={
+        'tcp.desegment_tcp_streams': 'TRUE',
+        'mysql.desegment_buffers': 'TRUE'
+    }
+)
+
+# 로그 줄 시각(초 단위, 같은 초 안에서는 strftime 없이 캐시 재사용)
+format_logtime = TimestampFormatter(micros=False)
 
 def log(level, message):
     """표준화된 로그 출력 함수"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    timestamp = format_logtime(time.time())
     print(f"[{timestamp}] [{level}] {message}")
     sys.stdout.flush()
 
@@ -47,54 +100,220 @@ def find_loopback_adapter():
         log("ERROR", f"Adapter search failed: {e}\n{traceback.format_exc()}")
     return r'\Device\NPF_Loopback'
 
-def send_worker():
-    """큐에서 데이터를 가져와 서버로 전송하는 워커 스레드"""
-    log("INFO", "Send worker thread started.")
+# 주문은 스풀에 fsync 로 확정된 뒤 전송 큐로 넘어가고, 서버가 받으면 스풀에서 지움 (order_spool.py 참고)
+spool = OrderSpool(SPOOL_DIR, data_queue, log=log)
+# 큐의 주문을 keep-alive 연결로 묶어 POST 하고 서버가 돌아올 때까지 백오프 재시도 (order_delivery.py 참고)
+delivery = HttpDelivery(SERVER_URL, data_queue, log=log, on_ack=spool.ack, retries=None)
+
+# [메트릭] 캡처 경로 카운터는 .value += n 한 번으로 갱신 (metrics.py 참고). 다른 곳에 이미 있는 값은 조회 때 콜백으로 읽음
+packets_seen = metrics.registry.counter("sniffer_packets_total", "Packets received from tshark")
+bytes_seen = metrics.registry.counter("sniffer_bytes_total", "Bytes of packets received from tshark")
+mysql_frames = metrics.registry.counter("sniffer_mysql_frames_total", "MySQL PDUs parsed")
+parse_errors = metrics.registry.counter("sniffer_parse_errors_total", "Packets dropped by an analysis exception")
+metrics.registry.counter("sniffer_orders_total", "Orders queued for delivery", fn=lambda: orders_detected)
+metrics.registry.counter("sniffer_orders_deduplicated_total", "Duplicate orders dropped by the dedup window",
+                         fn=lambda: dedup.hits)
+metrics.registry.gauge("sniffer_delivery_queue_depth", "Orders waiting for the delivery thread", fn=data_queue.qsize)
+metrics.registry.gauge("sniffer_spool_unacked", "Spooled orders the server has not acknowledged",
+                       fn=lambda: spool.stats()["unacked"])
+for _name in ("delivered", "retried", "dropped"):
+    metrics.registry.counter(f"sniffer_delivery_{_name}_total", f"Orders {_name} by the delivery channel",
+                             fn=lambda name=_name: getattr(delivery, name))
+
+# 주문 단계별 지연(캡처 → tshark → 파싱 → 큐 → 서버 확인) 집계와 예산 초과 주문 출력 (order_trace.py 참고)
+tracer = OrderTracer(log=log)
+
+def order_delivered(items):
+    """전송 채널이 서버 확인을 받은 주문들: ack 시각을 붙여 단계별 지연 기록"""
+    now = time.time()
+    for _, event, _ in items:
+        trace = event.get("trace")
+        if trace is not None:
+            trace["ack"] = now
+            tracer.record(trace, f"order_key={event.get('order_key')}")
+
+def drain_worker():
+    """[오프라인 재생] 서버로 보내지 않고 큐만 비우는 워커"""
     while True:
-        try:
-            data = data_queue.get()
-            if data is None: break
-            
-            try:
-                response = requests.post(SERVER_URL, json=data, timeout=0.5)
-                if response.status_code == 200:
-                    log("INFO", f"Data sent: {data.get('type')} (Seat: {data.get('seat_no')})")
-                else:
-                    log("ERROR", f"Server error {response.status_code}")
-            except requests.exceptions.RequestException as e:
-                log("ERROR", f"Network error: {e}")
-            
-            data_queue.task_done()
-        except Exception as e:
-            log("ERROR", f"Worker error: {e}")
+        data = data_queue.get()
+        data_queue.task_done()
+        if data is None: break
+
+def statement_order_plan(entry):
+    """
+    [query, fp, rule, plan] 의 주문 추출 플랜. 규칙 파일이 다시 로드되어 매칭 규칙이 바뀐 경우만 다시 컴파일
+    필수 필드를 매핑할 수 없으면 None: 빈 값뿐인 주문을 내보내지 않고 경고는 컴파일 때 한 번만 출력
+    """
+    query, fp, rule, plan = entry
+    current = order_rules.current.match(fp)
+    if current is not rule:
+        plan = None
+        if current is not None:
+            plan, missing = current.compile(query)
+            if missing:
+                log("WARNING", f"{current.type} statement skipped, no column for {', '.join(missing)}: {fp.normalized[:80]}")
+                plan = None
+        entry[2], entry[3] = current, plan
+    return plan
+
+def literal_order_plan(literals):
+    """
+    리터럴 INSERT 의 (규칙, 주문 필드 플랜). 지문 레코드의 literal_plan 자리에 보관하고 규칙이 바뀐 경우만 다시 컴파일
+    필수 필드를 컬럼 이름이나 규칙의 param 위치로 찾을 수 없으면(컬럼 목록 없는 INSERT 등) 플랜은 None 이며, 경고는 지문마다 한 번
+    """
+    fp = literals.fp
+    rule = order_rules.current.match(fp)
+    cached = fp.literal_plan
+    if cached is not None and cached[0] is rule:
+        return cached
+    plan = None
+    if rule is not None:
+        plan, missing = rule.compile_columns(literals.columns)
+        if missing:
+            log("WARNING", f"{rule.type} statement skipped, no column for {', '.join(missing)}: {fp.normalized[:80]}")
+            plan = None
+    fp.literal_plan = (rule, plan)
+    return fp.literal_plan
+
+def emit_order(order, meta, reason):
+    """조립이 끝난 주문 하나(헤더 필드 + items)를 전송 큐에 넣음. 창 안에서 이미 보낸 주문(재전송/POS 재시도)은 버림"""
+    global orders_detected
+    parsed = time.time()
+    key, stmt_id, captured, received = meta
+    idempotency_key = order_key(order["type"], order["order"], order_rules.current.key_fields(order["type"]),
+                                f"{key[0]}:{key[1]}", order["items"], order["sequence"])
+    if dedup.seen(idempotency_key):
+        log("INFO", f"Duplicate order dropped: {order['type']} key={idempotency_key} ({reason})")
+        return
+    order_data = dict(order["order"] or {})
+    order_data.update({
+        "type": order["type"],
+        "items": order["items"],
+        "commit": reason,
+        "stmt_id": stmt_id,
+        "order_key": idempotency_key,
+        "timestamp": format_isotime(captured or time.time())
+    })
+    # 단계 시각 (order_trace.py 참고): capture/frame 은 주문 첫 레코드의 것, 서버 확인(ack) 시각은 전송 채널이 받으면 order_delivered 에서 붙임
+    trace = order_data["trace"] = {"capture": captured} if capture_live else {}
+    trace["frame"] = received
+    trace["parse"] = parsed
+    trace["enqueue"] = time.time()
+    spool.append(order_data)
+    orders_detected += 1
+    log("INFO", f"Order Detected: {order['type']} Seat {order_data.get('seat_no')}, Price {order_data.get('total_price')}, Items {len(order['items'])} ({reason})")
+
+# 재전송/POS 재시도로 두 번 잡힌 주문을 전송 전에 버리는 시간 창 (order_dedup.py 참고)
+dedup = DedupWindow()
+# 연결별로 헤더/상세 INSERT 를 모아 COMMIT(또는 autocommit 주문 완료) 시 주문 하나당 전송 하나 (order_assembly.py 참고)
+assembler = OrderAssembler(emit_order)
+
+def log_dedup_stats():
+    stats = dedup.stats()
+    log("INFO", f"Order dedup: duplicates dropped={stats['hits']:,}, unique={stats['misses']:,}, "
+                f"keys={stats['keys']:,}, rotations={stats['rotations']:,}")
+
+def client_key(packet):
+    """(클라이언트 ip, port): MySQL 포트가 아닌 쪽"""
+    ip_layer = getattr(packet, 'ip', None) or getattr(packet, 'ipv6', None)
+    tcp = packet.tcp
+    if int(tcp.dstport) == MYSQL_PORT:
+        return (ip_layer.src, tcp.srcport)
+    return (ip_layer.dst, tcp.dstport)
+
+def track_transaction(key, query):
+    """트랜잭션 제어 문: BEGIN/START 로 열고, COMMIT 은 모인 주문을 내보내고, ROLLBACK 은 버림"""
+    kind = fingerprint(query).kind
+    if kind in ("begin", "start"):
+        open_transactions.add(key)
+    elif kind == "commit":
+        assembler.commit(key)
+        open_transactions.discard(key)
+    elif kind == "rollback":
+        if re.match(r'\s*rollback\s+(work\s+)?to\b', query, re.IGNORECASE):
+            return  # ROLLBACK TO SAVEPOINT: 트랜잭션은 계속
+        assembler.rollback(key)
+        open_transactions.discard(key)
+    elif kind == "set":
+        m = _AUTOCOMMIT.search(query)
+        if m:
+            if m.group(1).lower() in ("0", "off", "false"):
+                manual_commit.add(key)
+            else:
+                # autocommit 를 켜면 열린 트랜잭션은 커밋됨
+                manual_commit.discard(key)
+                open_transactions.discard(key)
+                assembler.commit(key)
+
+def close_connection(key):
+    assembler.close(key)
+    pending_prepares.pop(key, None)
+    prepared_statements.pop(key, None)
+    open_transactions.discard(key)
+    manual_commit.discard(key)
 
 def process_mysql_packet(packet):
     """
     [MySQL Protocol 기술 검증]
-    1. COM_STMT_PREPARE (22): 서버에 쿼리 템플릿을 등록하고 Statement ID를 발급받는 단계.
+    1. COM_STMT_PREPARE (22): 서버에 쿼리 템플릿을 등록하고 Statement ID를 발급받는 단계 (ID 는 서버의 PREPARE_OK 응답에 있음).
     2. COM_STMT_EXECUTE (23): 발급받은 ID와 바이너리로 바인딩된 파라미터들을 전송하는 단계.
     3. Binary Protocol Value: 파라미터는 Null Bitmap 이후 정해진 순서(Index)대로 데이터가 위치함.
     4. TCP Reassembly: 대용량 주문(분할 패킷) 처리를 위해 tcp.desegment_tcp_streams 활성화 필수.
     """
+    sniff_timestamp = getattr(packet, 'sniff_timestamp', None)
+    received_now[0] = time.time()
+    capture_now[0] = float(sniff_timestamp) if sniff_timestamp else received_now[0]
+    packets_seen.value += 1
+    bytes_seen.value += int(getattr(packet, 'length', 0))
     try:
         if not hasattr(packet, 'mysql'):
+            # FIN/RST: 조립 중인 autocommit 주문은 내보내고, 커밋되지 않은 트랜잭션은 버림
+            if hasattr(packet, 'tcp'):
+                close_connection(client_key(packet))
             return
 
         mysql_layer = packet.mysql
+        mysql_frames.value += 1
         command = getattr(mysql_layer, 'command', None)
 
-        # 1. Statement Prepare 캐싱 (Query 문맥 확보)
-        if command == '22' and hasattr(mysql_layer, 'query'):
-            query = mysql_layer.query.lower()
+        # 0. 트랜잭션 제어 (BEGIN/START TRANSACTION/COMMIT/ROLLBACK/SET autocommit) 와 prepared statement 를 쓰지 않는 리터럴 INSERT
+        if command == '3' and hasattr(mysql_layer, 'query'):
+            key = client_key(packet)
+            literals = parse_literals(mysql_layer.query)
+            if literals is None:
+                track_transaction(key, mysql_layer.query)
+            else:
+                rule, plan = literal_order_plan(literals)
+                if plan is not None:
+                    in_tx = key in open_transactions or key in manual_commit
+                    for row in literals.rows:
+                        assembler.add(key, rule.role, rule.type, build_order(plan, row), in_tx, (key, None, capture_now[0], received_now[0]))
+
+        # 1. Statement Prepare 캐싱 (Query 문맥 확보): 요청은 Statement ID 가 없으므로 응답까지 연결별로 보류
+        elif command == '22' and hasattr(mysql_layer, 'query'):
+            pending_prepares[client_key(packet)] = mysql_layer.query
+
+        # 1-1. PREPARE_OK 응답: 서버가 발급한 Statement ID 로 보류 중인 쿼리를 등록
+        elif command is None and hasattr(mysql_layer, 'num_params'):
+            key = client_key(packet)
+            query = pending_prepares.pop(key, None)
             stmt_id = getattr(mysql_layer, 'stmt_id', None)
-            if stmt_id and ('tb_order' in query or 'tb_suborder' in query):
-                prepared_statements[stmt_id] = query
-                log("DEBUG", f"Statement Cached: ID={stmt_id} | Query={query[:50]}...")
+            if query is not None and stmt_id:
+                fp = fingerprint(query)
+                statements = prepared_statements.setdefault(key, {})
+                # 규칙이 나중에 추가될 수 있으므로 INSERT/REPLACE 는 규칙과 무관하게 보관. 같은 ID 를 다시 받으면 이전 Statement 는 닫힌 것
+                if fp.kind in ("insert", "replace"):
+                    entry = statements[stmt_id] = [query, fp, None, None]
+                    if statement_order_plan(entry) is not None:
+                        log("DEBUG", f"Statement Cached: ID={stmt_id} | Digest={fp.digest} | Query={fp.normalized[:50]}...")
+                else:
+                    statements.pop(stmt_id, None)
 
         # 2. Statement Execute 분석 (실제 데이터 추출)
         elif command == '23':
             stmt_id = getattr(mysql_layer, 'stmt_id', None)
-            context = prepared_statements.get(stmt_id, "Unknown Context")
+            entry = prepared_statements.get(client_key(packet), {}).get(stmt_id)
+            context = entry[1].normalized if entry else "Unknown Context"
             
             log("DEBUG", f"Command 23 Detected (ID: {stmt_id} | Context: {context})")
 
@@ -106,48 +325,40 @@ def process_mysql_packet(packet):
                 elif hasattr(mysql_layer, 'string'):
                     params = [f.get_default_value() for f in mysql_layer.string.all_fields]
 
-                # 기획 인덱스 적용: Index 9 (좌석), Index 7 (총액)
-                if len(params) > 9:
-                    order_data = {
-                        "type": "tb_order" if 'tb_order' in context else "tb_suborder",
-                        "seat_no": params[9],
-                        "total_price": params[7],
-                        "stmt_id": stmt_id,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    data_queue.put(order_data)
-                    log("INFO", f"Order Detected: Seat {params[9]}, Price {params[7]}")
-                else:
-                    # 파라미터가 부족하더라도 감지 로그는 남김 (디버깅 용도)
-                    if stmt_id in prepared_statements:
-                        log("DEBUG", f"Execute found but params length {len(params)} insufficient for Index 9")
+                # PREPARE 된 INSERT 의 컬럼 이름으로 값 매핑 (PREPARE 를 보지 못한 Statement 는 위치를 알 수 없으므로 전송하지 않음)
+                plan = statement_order_plan(entry) if entry else None
+                if plan is not None and params:
+                    rule = entry[2]
+                    key = client_key(packet)
+                    in_tx = key in open_transactions or key in manual_commit
+                    assembler.add(key, rule.role, rule.type, build_order(plan, params), in_tx, (key, stmt_id, capture_now[0], received_now[0]))
+                elif entry is None:
+                    log("DEBUG", f"Execute ID {stmt_id} skipped: statement was not prepared in this capture")
 
             except (AttributeError, IndexError) as e:
                 log("DEBUG", f"Binary field skip (Incomplete Packet): {e}")
 
     except Exception as e:
+        parse_errors.value += 1
         log("ERROR", f"Packet analysis error: {e}")
 
 def start_sniffing(interface):
+    global capture_live
     log("INFO", f"MySQL Sniffer Engine v2.0 Started on {interface}")
     
-    worker_thread = threading.Thread(target=send_worker, daemon=True)
-    worker_thread.start()
+    capture_live = True
+    spool.open()
+    delivery.on_delivered = order_delivered
+    delivery.start()
+    if hasattr(delivery, "send_stats"):
+        # 관리자 콘솔 이벤트 스트림으로 주기 통계 이벤트 전송
+        metrics.start_publisher(metrics.registry, lambda registry: delivery.send_stats(registry.values()))
+    order_rules.watch()
+    assembler.start_flusher()
     
     capture = None
     try:
-        # [고도화 캡처 설정] - TCP 재조합 및 바이너리 분석 최적화
-        capture = pyshark.LiveCapture(
-            interface=interface,
-            display_filter=f'tcp.port == {MYSQL_PORT} && (mysql.command == 22 || mysql.command == 23)',
-            use_json=True,
-            include_raw=False,
-            decode_as={f'tcp.port=={MYSQL_PORT}': 'mysql'},
-            override_prefs={
-                'tcp.desegment_tcp_streams': 'TRUE',
-                'mysql.desegment_buffers': 'TRUE'
-            }
-        )
+        capture = pyshark.LiveCapture(interface=interface, **CAPTURE_OPTIONS)
         
         for packet in capture.sniff_continuously():
             process_mysql_packet(packet)
@@ -159,12 +370,114 @@ def start_sniffing(interface):
     finally:
         if capture:
             capture.close()
-        data_queue.put(None)
+        assembler.flush_all()
+        spool.close()
+        # 남은 묶음 전송을 잠시 기다림 (서버가 응답하지 않으면 재시도 중이라도 종료, 못 보낸 주문은 스풀에 남음)
+        delivery.join(timeout=5.0)
+        spool.checkpoint()
+        log_dedup_stats()
+        delivery.report()
+        spool.report()
+        tracer.report()
         log("INFO", "Sniffer Engine Offline.")
 
+def start_replay(paths, speed=0.0, send=False):
+    """
+    [오프라인 재생] pcap/pcapng 파일을 라이브 캡처와 같은 tshark 설정과 process_mysql_packet 으로 처리합니다.
+    tshark 가 파일을 직접 읽고 재조합하므로 파일 리더는 pyshark.FileCapture 를 사용합니다.
+    """
+    import replay
+
+    log("INFO", f"Replaying {len(paths)} capture file(s) (speed: {'max' if speed <= 0 else f'x{speed}'}, send: {send})")
+    if send:
+        spool.open()
+        delivery.on_delivered = order_delivered
+        delivery.start()
+    else:
+        # 보내지 않는 재생은 디스크 스풀을 건드리지 않음
+        spool.directory = None
+        worker_thread = threading.Thread(target=drain_worker, daemon=True)
+        worker_thread.start()
+
+    report = replay.ReplayReport(("tshark", "process", "send"))
+    stages = report.stages
+    pacer = replay.Pacer(speed) if speed > 0 else None
+    clock = time.perf_counter
+    try:
+        for path in paths:
+            capture = pyshark.FileCapture(path, **CAPTURE_OPTIONS)
+            try:
+                t_end = clock()
+                for packet in capture:
+                    if pacer: pacer.wait(float(packet.sniff_timestamp))
+                    t0 = clock()
+                    stages["tshark"] += t0 - t_end
+                    # display_filter 로 MySQL PDU(+ FIN/RST)만 올라오므로 MySQL 패킷 하나가 프레임 하나
+                    report.packets += 1
+                    report.frames += hasattr(packet, 'mysql')
+                    report.bytes += int(packet.length)
+                    process_mysql_packet(packet)
+                    t_end = clock()
+                    stages["process"] += t_end - t0
+            finally:
+                capture.close()
+    except KeyboardInterrupt:
+        log("INFO", "Replay stopping...")
+
+    t0 = clock()
+    assembler.flush_all()
+    spool.close()
+    if send:
+        delivery.join()
+        spool.checkpoint()
+    else:
+        worker_thread.join()
+    stages["send"] += clock() - t0
+    report.orders = orders_detected
+    report.print_summary()
+    log_dedup_stats()
+    if send:
+        delivery.report()
+        spool.report()
+        tracer.report()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MySQL Sniffer Engine (pyshark)")
+    parser.add_argument("interface", nargs="?", default=None, help="캡처 인터페이스 (기본: Loopback 자동 탐색)")
+    parser.add_argument("--replay", nargs="+", metavar="PCAP", help="라이브 캡처 대신 pcap/pcapng 파일 재생")
+    parser.add_argument("--speed", type=float, default=0.0, help="재생 배속 (0: 최대 속도, 1: 원래 속도)")
+    parser.add_argument("--send", action="store_true", help="재생 중 감지한 주문을 SERVER_URL 로 전송")
+    parser.add_argument("--stream", metavar="HOST:PORT", help="주문을 SERVER_URL POST 대신 관리자 콘솔의 이벤트 스트림(NDJSON 소켓)으로 전송")
+    parser.add_argument("--rules", metavar="JSON", help=f"주문 규칙 파일 (기본: {os.path.basename(ORDER_RULES_FILE)}, 수정 시 자동 반영)")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT, help=f"Prometheus 메트릭 포트 (127.0.0.1, 0: 끔, 기본: {metrics.METRICS_PORT})")
+    return parser.parse_args(argv)
+
+def start_metrics_server(port):
+    """127.0.0.1:port/metrics 제공. 포트를 열 수 없어도 캡처는 계속"""
+    if not port:
+        return None
+    try:
+        server = metrics.MetricsServer(metrics.registry, port).start()
+    except OSError as e:
+        log("WARNING", f"Metrics endpoint unavailable on port {port}: {e}")
+        return None
+    log("INFO", f"Metrics: http://127.0.0.1:{server.port}/metrics")
+    return server
+
 if __name__ == "__main__":
     try:
-        target_interface = sys.argv[1] if len(sys.argv) > 1 else find_loopback_adapter()
-        start_sniffing(target_interface)
+        args = parse_args()
+        if args.rules:
+            order_rules.path = args.rules
+        order_rules.check()
+        start_metrics_server(args.metrics_port)
+        if args.stream:
+            # 관리자 콘솔이 띄운 경우: 주문은 소켓 채널로, 표준 출력은 사람이 읽는 로그만
+            host, _, port = args.stream.rpartition(':')
+            delivery = StreamDelivery(host or "127.0.0.1", int(port), data_queue, log=log, on_ack=spool.ack)
+        if args.replay:
+            start_replay(args.replay, speed=args.speed, send=args.send)
+        else:
+            start_sniffing(args.interface or find_loopback_adapter())
     except Exception as e:
         log("ERROR", f"Critical Startup Failure: {e}")
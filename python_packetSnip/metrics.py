@@ -0,0 +1,288 @@
+"""
+작성의도: 스니퍼 상태(받은 패킷/바이트, MySQL 프레임, 삼킨 파싱 예외, 큐 적체, 커널 드롭)를 터미널 로그를 읽지 않고도 볼 수 있도록
+          카운터/게이지/히스토그램 레지스트리를 두고 127.0.0.1 HTTP 포트에서 Prometheus 텍스트 형식으로 제공합니다.
+기능 원리: 캡처 경로에서 카운터 갱신은 __slots__ 객체의 정수 덧셈(counter.value += 1) 한 번이며 잠금이 없습니다.
+          큐 길이나 커널 드롭처럼 다른 곳에 이미 있는 값은 fn 콜백으로 등록해 조회(scrape) 때만 읽습니다.
+          샤딩 모드의 워커/싱크 프로세스는 snapshot() 을 주기적으로 보내고, 캡처 프로세스가 merge() 로 받아 합산해 한 엔드포인트로 보여줍니다.
+"""
+import bisect
+import http.server
+import threading
+import time
+
+# [설정] 메트릭 HTTP 포트 (127.0.0.1 에서만 수신, 0 이면 끔) / 자식 프로세스 스냅샷·관리자 콘솔 통계 전송 주기(초)
+METRICS_PORT = 9464
+METRICS_INTERVAL = 5.0
+# [설정] 히스토그램 기본 구간(초)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def log_linear_buckets(lowest=0.0001, highest=60.0, steps=4):
+    """HDR 식 구간: lowest 부터 2배 구간마다 steps 개의 같은 폭 (구간 상한 기준 상대 오차 1/steps 이하)"""
+    bounds = [lowest]
+    base = lowest
+    while base < highest:
+        bounds.extend(round(base * (1 + i / steps), 9) for i in range(1, steps + 1))
+        base *= 2
+    return tuple(bounds)
+
+
+def bucket_quantile(buckets, counts, q):
+    """구간별 수에서 q 분위가 속한 구간의 상한 (관찰이 없으면 None, 마지막 구간을 넘으면 inf)"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound, count in zip(tuple(buckets) + (float('inf'),), counts):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float('inf')
+
+
+class Counter:
+    """단조 증가 값. 캡처 경로에서는 counter.value += n 으로 직접 올림"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    """현재 값. fn 이 있으면 조회 때마다 fn() 을 읽음 (큐 길이 등)"""
+    __slots__ = ("value", "fn")
+
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """구간별 관찰 수 (구간 경계 bisect 한 번 + 정수 덧셈)"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    이름(+라벨)별 메트릭 모음. 같은 이름/라벨로 다시 등록하면 기존 객체를 돌려줍니다.
+    snapshot() 은 프로세스 간에 넘길 수 있는 값 사본이고, merge(source, snapshot) 로 받은 값은 render() 때 로컬 값과 합산됩니다.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {name: [type, help, {label_key: metric}]}
+        self.families = {}
+        self.remote = {}
+
+    def counter(self, name, help, labels=None, fn=None):
+        """fn 이 있으면 이미 다른 곳에서 세는 누적값을 조회 때 읽는 카운터"""
+        metric = self._register(name, "counter", help, labels, Gauge if fn else Counter)
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def gauge(self, name, help, labels=None, fn=None):
+        metric = self._register(name, "gauge", help, labels, Gauge)
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def histogram(self, name, help, labels=None, buckets=DEFAULT_BUCKETS):
+        return self._register(name, "histogram", help, labels, lambda: Histogram(buckets))
+
+    def _register(self, name, kind, help, labels, factory):
+        key = _label_key(labels)
+        with self.lock:
+            family = self.families.setdefault(name, [kind, help, {}])
+            if family[0] != kind:
+                raise ValueError(f"metric {name} already registered as {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory()
+            return metric
+
+    def snapshot(self):
+        """{name: (type, help, {label_key: 값})}. 히스토그램 값은 (구간, 구간별 수, 합, 수)"""
+        with self.lock:
+            families = [(name, kind, help, list(metrics.items())) for name, (kind, help, metrics) in self.families.items()]
+        snapshot = {}
+        for name, kind, help, metrics in families:
+            values = {}
+            for key, metric in metrics:
+                if kind == "histogram":
+                    values[key] = (metric.buckets, list(metric.counts), metric.sum, metric.count)
+                else:
+                    values[key] = _read(metric)
+            snapshot[name] = (kind, help, values)
+        return snapshot
+
+    def merge(self, source, snapshot):
+        """다른 프로세스의 최신 스냅샷 (source 마다 마지막 것만 유지)"""
+        with self.lock:
+            self.remote[source] = snapshot
+
+    def collect(self):
+        """로컬 + 받은 스냅샷을 합산한 {name: (type, help, {label_key: 값})}"""
+        merged = self.snapshot()
+        with self.lock:
+            remotes = list(self.remote.values())
+        for snapshot in remotes:
+            for name, (kind, help, values) in snapshot.items():
+                family = merged.setdefault(name, (kind, help, {}))
+                if family[0] != kind:
+                    continue
+                for key, value in values.items():
+                    current = family[2].get(key)
+                    if current is None:
+                        family[2][key] = value
+                    elif kind == "histogram":
+                        if current[0] == value[0]:
+                            family[2][key] = (current[0], [a + b for a, b in zip(current[1], value[1])],
+                                              current[2] + value[2], current[3] + value[3])
+                    else:
+                        family[2][key] = current + value
+        return merged
+
+    def values(self):
+        """평평한 {'이름{라벨}': 값} (관리자 콘솔 통계 이벤트용, 히스토그램은 _count/_sum 과 구간 기준 _p50/_p99)"""
+        flat = {}
+        for name, (kind, _, values) in self.collect().items():
+            for key, value in values.items():
+                labels = _format_labels(key)
+                if kind == "histogram":
+                    flat[f"{name}_count{labels}"] = value[3]
+                    flat[f"{name}_sum{labels}"] = round(value[2], 6)
+                    for q in (0.50, 0.99):
+                        bound = bucket_quantile(value[0], value[1], q)
+                        # 마지막 구간을 넘은 값(inf)은 JSON 으로 보낼 수 없으므로 None
+                        flat[f"{name}_p{int(q * 100)}{labels}"] = None if bound == float('inf') else bound
+                else:
+                    flat[name + labels] = value
+        return flat
+
+    def render(self):
+        """Prometheus 텍스트 노출 형식 (0.0.4)"""
+        lines = []
+        for name, (kind, help, values) in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                if kind == "histogram":
+                    buckets, counts, total, count = value
+                    cumulative = 0
+                    for bound, n in zip(buckets + (float('inf'),), counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', _format_value(float(bound))),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(float(total))}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _read(metric):
+    fn = getattr(metric, "fn", None)
+    if fn is None:
+        return metric.value
+    try:
+        return fn()
+    except Exception:
+        # 조회 중 대상이 닫힘(종료 중인 소켓 등): 마지막 값 유지
+        return metric.value
+
+
+class MetricsServer:
+    """127.0.0.1:port 의 GET /metrics 에 registry.render() 를 응답하는 백그라운드 HTTP 서버"""
+    def __init__(self, registry, port=METRICS_PORT, host="127.0.0.1"):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", _CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        return self
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def start_publisher(registry, publish, interval=METRICS_INTERVAL):
+    """interval 마다 publish(registry) 를 부르는 백그라운드 스레드 (자식 프로세스 스냅샷 전송, 관리자 콘솔 통계 이벤트 등)"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                publish(registry)
+            except Exception as e:
+                print(f"[WARNING] Metrics publish failed: {e}", flush=True)
+    thread = threading.Thread(target=run, name="metrics-publisher", daemon=True)
+    thread.start()
+    return thread
+
+
+# 프로세스 공용 레지스트리
+registry = MetricsRegistry()
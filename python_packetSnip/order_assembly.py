@@ -0,0 +1,163 @@
+"""
+작성의도: 주문 헤더(tb_order)와 주문 상세(tb_suborder) INSERT 를 문장마다 따로 보내지 않고 트랜잭션 단위로 모아
+          주문 하나당 이벤트 하나로 내보내며, 롤백된 주문은 내보내지 않습니다.
+기능 원리: 연결별 버퍼에 추출한 레코드를 쌓아 두고, 트랜잭션 안의 레코드는 COMMIT 에 한 번에 내보내고 ROLLBACK 이면 버립니다.
+          autocommit 로 문장마다 커밋하는 POS 는 다음 헤더가 오거나 ASSEMBLY_TIMEOUT 동안 추가 레코드가 없으면 내보냅니다.
+          트랜잭션 시작/종료 판단(OK 패킷 status 플래그, BEGIN/COMMIT 쿼리)은 호출하는 스니퍼가 합니다.
+"""
+import threading
+import time
+
+# [설정] autocommit 주문: 마지막 레코드 이후 이 시간(초) 동안 같은 연결에 레코드가 없으면 주문 완료로 봄
+ASSEMBLY_TIMEOUT = 0.5
+# [설정] 연결 하나의 버퍼 상한 (비정상적으로 긴 트랜잭션/배치 보호, 넘으면 그때까지의 레코드를 내보냄)
+MAX_PENDING_RECORDS = 2000
+
+ROLE_HEADER = "header"
+ROLE_ITEM = "item"
+
+
+class PendingOrders:
+    """
+    연결 하나의 버퍼. groups 는 주문별 [type, 헤더 레코드 또는 None, 상세 레코드 목록, 첫 레코드의 meta],
+    sequence 는 연결 안에서 이 버퍼(트랜잭션 또는 autocommit 주문)의 순번
+    """
+    __slots__ = ("key", "in_tx", "sequence", "groups", "records", "deadline")
+
+    def __init__(self, key, in_tx, sequence=0):
+        self.key = key
+        self.in_tx = in_tx
+        self.sequence = sequence
+        self.groups = []
+        self.records = 0
+        self.deadline = None
+
+
+class OrderAssembler:
+    """
+    연결(key)별 주문 조립기. emit(order, meta, reason) 은 완성된 주문 하나마다 호출됩니다.
+    order = {"type", "order"(헤더 레코드 또는 None), "items"(상세 레코드 목록), "sequence"(연결 안의 트랜잭션 순번)},
+    reason = commit / autocommit / timeout / close / overflow.
+    파싱 스레드와 flusher 스레드가 함께 쓰므로 모든 변경은 lock 안에서 합니다.
+    """
+    def __init__(self, emit, timeout=ASSEMBLY_TIMEOUT, max_records=MAX_PENDING_RECORDS, clock=time.monotonic):
+        self.emit = emit
+        self.timeout = timeout
+        self.max_records = max_records
+        self.clock = clock
+        self.pending = {}
+        # 연결별 마지막 트랜잭션 순번 (연결이 끝나면 제거)
+        self.sequences = {}
+        self.lock = threading.Lock()
+        self.next_deadline = float('inf')
+        self._flusher = None
+        # 통계
+        self.orders = 0
+        self.records = 0
+        self.rolled_back = 0
+        self.discarded = 0
+        self.failed = 0
+
+    def add(self, key, role, rule_type, record, in_tx, meta=None):
+        """성공한 INSERT 의 레코드 추가. in_tx: 그 문장의 OK 패킷에 SERVER_STATUS_IN_TRANS 가 켜져 있었는지"""
+        with self.lock:
+            self.records += 1
+            buf = self.pending.get(key)
+            if buf is not None and not buf.in_tx and (in_tx or role == ROLE_HEADER):
+                # autocommit: 새 헤더(또는 트랜잭션 시작) 전까지 모인 레코드는 완성된 주문
+                self._emit_locked(buf, "autocommit")
+                buf = None
+            if buf is None:
+                sequence = self.sequences[key] = self.sequences.get(key, 0) + 1
+                buf = self.pending[key] = PendingOrders(key, in_tx, sequence)
+            groups = buf.groups
+            if role == ROLE_HEADER or not groups:
+                groups.append([rule_type, None, [], meta])
+            group = groups[-1]
+            if role == ROLE_HEADER:
+                group[1] = record
+            else:
+                group[2].append(record)
+            buf.records += 1
+            if buf.records >= self.max_records:
+                self._emit_locked(buf, "overflow")
+            elif not buf.in_tx:
+                buf.deadline = self.clock() + self.timeout
+                if buf.deadline < self.next_deadline:
+                    self.next_deadline = buf.deadline
+
+    def commit(self, key):
+        """트랜잭션 종료(COMMIT, 암묵적 커밋): 트랜잭션 버퍼를 내보냄. autocommit 버퍼는 건드리지 않음"""
+        with self.lock:
+            buf = self.pending.get(key)
+            if buf is not None and buf.in_tx:
+                self._emit_locked(buf, "commit")
+
+    def rollback(self, key):
+        """ROLLBACK: 트랜잭션 버퍼를 버림"""
+        with self.lock:
+            buf = self.pending.get(key)
+            if buf is not None and buf.in_tx:
+                del self.pending[key]
+                self.rolled_back += len(buf.groups)
+
+    def close(self, key):
+        """연결 종료: autocommit 버퍼는 내보내고, 커밋되지 않은 트랜잭션은 서버도 롤백하므로 버림"""
+        with self.lock:
+            self.sequences.pop(key, None)
+            buf = self.pending.get(key)
+            if buf is None:
+                return
+            if buf.in_tx:
+                del self.pending[key]
+                self.discarded += len(buf.groups)
+            else:
+                self._emit_locked(buf, "close")
+
+    def flush_expired(self, now=None):
+        """ASSEMBLY_TIMEOUT 이 지난 autocommit 버퍼를 내보냄"""
+        now = self.clock() if now is None else now
+        if now < self.next_deadline:
+            return
+        with self.lock:
+            next_deadline = float('inf')
+            for buf in list(self.pending.values()):
+                if buf.in_tx or buf.deadline is None:
+                    continue
+                if buf.deadline <= now:
+                    self._emit_locked(buf, "timeout")
+                elif buf.deadline < next_deadline:
+                    next_deadline = buf.deadline
+            self.next_deadline = next_deadline
+
+    def flush_all(self):
+        """종료 시: autocommit 버퍼는 모두 내보내고 열린 트랜잭션은 버림"""
+        for key in list(self.pending):
+            self.close(key)
+
+    def start_flusher(self, interval=None):
+        """라이브 캡처: 패킷이 끊겨도 마지막 autocommit 주문이 나가도록 주기적으로 flush_expired 호출"""
+        if self._flusher is not None:
+            return
+        interval = interval or self.timeout / 2
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush_expired()
+                except Exception as e:
+                    print(f"[ERROR] Order assembler flush: {e}")
+
+        self._flusher = threading.Thread(target=loop, name="order-assembler", daemon=True)
+        self._flusher.start()
+
+    def stats(self):
+        return {"orders": self.orders, "records": self.records, "pending": sum(b.records for b in self.pending.values()),
+                "rolled_back": self.rolled_back, "discarded": self.discarded, "failed": self.failed}
+
+    def _emit_locked(self, buf, reason):
+        del self.pending[buf.key]
+        for rule_type, header, items, meta in buf.groups:
+            self.orders += 1
+            self.emit({"type": rule_type, "order": header, "items": items, "sequence": buf.sequence}, meta, reason)
@@ -0,0 +1,73 @@
+"""
+작성의도: TCP 재전송이나 POS 의 재시도로 같은 주문 INSERT 가 두 번 잡혀도 주방에는 한 번만 나가도록 중복 주문을 싱크 앞에서 버립니다.
+기능 원리: 주문마다 안정적인 필드(규칙의 key, 기본 order_no) 또는 연결 + 트랜잭션 순번 + 주문 내용으로 8바이트(16진수 16자) 멱등 키를 만들고,
+          시간 창 단위로 교체되는 세대(set) 두 개에서 조회합니다. 세대당 키 수에도 상한이 있어
+          하루 주문 수와 무관하게 조회는 O(1), 메모리는 상한 이하로 고정됩니다.
+"""
+import hashlib
+import json
+import time
+
+# [설정] 중복으로 보는 시간 창(초): 키는 최소 DEDUP_WINDOW, 최대 2 x DEDUP_WINDOW 동안 기억
+DEDUP_WINDOW = 600.0
+# [설정] 세대당 키 상한 (넘으면 시간 창 전에 세대 교체) → 전체 키 수 ≤ 2 x MAX_KEYS_PER_GENERATION
+MAX_KEYS_PER_GENERATION = 50000
+
+
+def order_key(order_type, header, key_fields=(), connection=None, items=(), sequence=None):
+    """
+    멱등 키(16진수 문자열, ORDER 이벤트의 order_key).
+    key_fields 값이 모두 있으면 (type, 그 값들)로 — 헤더가 없는 주문은 상세 레코드마다의 값 —,
+    없으면 (type, 연결, 트랜잭션 순번(OrderAssembler 의 sequence), 헤더/상세 내용)으로 만듭니다.
+    같은 트랜잭션 안의 재전송은 잡고, 다른 단말이나 같은 단말의 다음 트랜잭션에서 온 같은 내용 주문은 구분합니다.
+    """
+    values = None
+    if key_fields:
+        records = [header] if header else list(items)
+        values = [[r.get(f) for f in key_fields] for r in records]
+        if not values or any(v is None for row in values for v in row):
+            values = None
+    if values is not None:
+        basis = [order_type, values]
+    else:
+        basis = [order_type, connection, sequence, header, items]
+    raw = json.dumps(basis, sort_keys=True, default=str, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+class DedupWindow:
+    """
+    회전하는 두 세대(current, previous)로 이뤄진 시간 창 집합.
+    seen(key) 는 창 안에서 처음 보는 키면 기록 후 False, 이미 본 키면 True.
+    """
+    def __init__(self, window=DEDUP_WINDOW, max_keys=MAX_KEYS_PER_GENERATION, clock=time.monotonic):
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self.current = set()
+        self.previous = set()
+        self.rotate_at = None
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def seen(self, key):
+        now = self.clock()
+        if self.rotate_at is None:
+            self.rotate_at = now + self.window
+        elif now >= self.rotate_at or len(self.current) >= self.max_keys:
+            # 창이 두 번 이상 지났으면 previous 도 이미 만료
+            self.previous = self.current if now < self.rotate_at + self.window else set()
+            self.current = set()
+            self.rotate_at = now + self.window
+            self.rotations += 1
+        if key in self.current or key in self.previous:
+            self.hits += 1
+            return True
+        self.current.add(key)
+        self.misses += 1
+        return False
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "keys": len(self.current) + len(self.previous),
+                "rotations": self.rotations}
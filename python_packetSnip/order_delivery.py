@@ -0,0 +1,398 @@
+"""
+작성의도: 주문마다 새 TCP 연결로 POST 하고 네트워크 오류면 주문을 그대로 잃던 전송을, 연결을 재사용하는 묶음 전송과 재시도로 바꿉니다.
+          관리자 콘솔이 띄운 스니퍼는 HTTP 대신 로컬 소켓 하나로 이벤트를 흘려보내는 스트림 채널(StreamDelivery)을 씁니다.
+기능 원리: [HttpDelivery] 전송 스레드(= 동시에 진행 중인 요청 수 상한)마다 keep-alive http.client 연결 하나를 유지하고,
+          큐에서 최대 BATCH_MAX 건 또는 BATCH_WAIT 초 동안 모인 이벤트를 JSON 배열 하나로 보냅니다.
+          연결 오류/5xx/408/429 는 지터를 준 지수 백오프로 재시도하고, 끝내 실패한 묶음은 dropped 로 집계합니다.
+          큐 항목은 (넣은 시각, 이벤트, 스풀 순번) 이며 전달 지연(넣은 시각 → 2xx 응답) 백분위를 함께 집계합니다.
+          서버가 받은 묶음의 순번은 on_ack 로 알려 스풀(order_spool.py)이 지울 수 있게 합니다.
+          [StreamDelivery] 오래 유지하는 TCP 연결 하나에 NDJSON 줄({"seq": n, "event": {...}})을 쓰고, 서버는 처리한 마지막 seq 를
+          {"type": "ACK", "seq": n} 으로 누적 확인합니다. 연결마다 HELLO(세션 id) → RESUME(서버가 받은 마지막 seq) 를 주고받아
+          끊긴 동안 확인받지 못한 줄만 다시 보냅니다. 주기 통계({"type": "STATS"})는 seq 없이 연결돼 있을 때만 보냅니다.
+"""
+import collections
+import http.client
+import itertools
+import json
+import os
+import queue
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+# [설정] 한 번에 보내는 최대 이벤트 수 / 첫 이벤트 이후 더 모으는 최대 시간(초)
+BATCH_MAX = 50
+BATCH_WAIT = 0.02
+# [설정] 동시에 진행 중인 요청 수 상한 (1 이면 큐 순서대로 전달)
+MAX_IN_FLIGHT = 1
+# [설정] 요청 타임아웃(초), 재시도 횟수(None 이면 서버가 돌아올 때까지), 백오프 기준/상한(초)
+REQUEST_TIMEOUT = 2.0
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 5.0
+# [설정] 지연 백분위 계산에 쓰는 최근 표본 수 / 주기 통계 출력 간격(초)
+LATENCY_SAMPLES = 10000
+STATS_INTERVAL = 60.0
+# [설정] 스트림 채널: 확인받지 않은 채 보낼 수 있는 최대 이벤트 수
+STREAM_WINDOW = 1000
+
+_RETRY_STATUS = (408, 429)
+
+
+def _print_log(level, message):
+    print(f"[{level}] {message}", flush=True)
+
+
+class _Delivery:
+    """전송 방식 공통: 큐에서 묶음 꺼내기, 전달 확인(on_ack) 처리, 통계. 하위 클래스가 _run 과 start 로그를 구현"""
+    def __init__(self, source, log=None, on_ack=None, batch_max=BATCH_MAX, batch_wait=BATCH_WAIT,
+                 backoff=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.source = source
+        self.log = log or _print_log
+        self.on_ack = on_ack
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.threads = []
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        # 서버가 받은 항목 목록을 받는 콜백 (주문 지연 추적 등, 없으면 None)
+        self.on_delivered = None
+        self.next_report = time.monotonic() + STATS_INTERVAL
+        # 통계 (이벤트 단위, requests/failures 는 요청(스트림은 쓰기/연결 실패) 단위)
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self.requests = 0
+        self.failures = 0
+
+    def _start_threads(self, count, name):
+        for i in range(count):
+            thread = threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def stats(self):
+        with self.lock:
+            samples = sorted(self.latencies)
+            stats = {"delivered": self.delivered, "retried": self.retried, "dropped": self.dropped,
+                     "requests": self.requests, "failures": self.failures}
+        for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            stats[name] = samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else None
+        return stats
+
+    def report(self):
+        stats = self.stats()
+        latency = "n/a" if stats["p50"] is None else f"p50={stats['p50']:.1f} p95={stats['p95']:.1f} p99={stats['p99']:.1f} ms"
+        self.log("INFO", f"Delivery: delivered={stats['delivered']:,}, retried={stats['retried']:,}, dropped={stats['dropped']:,}, "
+                         f"requests={stats['requests']:,}, latency {latency}")
+
+    def _delay(self, attempt):
+        """지터를 준 지수 백오프(초)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** min(attempt, 16))))
+
+    def _maybe_report(self):
+        if time.monotonic() >= self.next_report:
+            self.next_report = time.monotonic() + STATS_INTERVAL
+            self.report()
+
+    def _delivered(self, items):
+        """서버가 받은 항목: 지연 기록 후 스풀 순번 확인"""
+        now = time.monotonic()
+        with self.lock:
+            self.delivered += len(items)
+            self.latencies.extend(now - item[0] for item in items)
+        if self.on_delivered is not None:
+            self.on_delivered(items)
+        self._ack(items)
+
+    def _ack(self, items):
+        if self.on_ack is not None:
+            self.on_ack([item[2] for item in items])
+
+    def _next_batch(self):
+        """첫 항목은 기다리고, 이후 batch_wait 안에 들어온 항목을 batch_max 까지 모음. 종료 신호를 만나면 (묶음, True)"""
+        item = self.source.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_max:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.source.get(timeout=remaining) if remaining > 0 else self.source.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+
+class HttpDelivery(_Delivery):
+    """
+    source 큐의 (enqueued, event, offset) 를 묶어 url 로 POST. 큐의 None 은 종료 신호이며 남은 묶음을 보낸 뒤 스레드가 끝납니다.
+    서버가 받았거나 재시도 없이 거부한 묶음의 offset 목록은 on_ack 로 넘깁니다. stats() 는 delivered/retried/dropped 이벤트 수, 요청 수, 전달 지연 p50/p95/p99(ms)를 돌려줍니다.
+    """
+    def __init__(self, url, source, log=None, on_ack=None, batch_max=BATCH_MAX, batch_wait=BATCH_WAIT, in_flight=MAX_IN_FLIGHT,
+                 timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, backoff=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        super().__init__(source, log, on_ack, batch_max, batch_wait, backoff, backoff_max)
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"unsupported delivery URL: {url}")
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.in_flight = max(1, in_flight)
+        self.timeout = timeout
+        self.retries = retries
+
+    def start(self):
+        self._start_threads(self.in_flight, "delivery")
+        retries = "until delivered" if self.retries is None else self.retries
+        self.log("INFO", f"Delivery started: {self.url} (batch <= {self.batch_max} / {self.batch_wait * 1000:.0f} ms, "
+                         f"in-flight {self.in_flight}, retries {retries})")
+
+    def _run(self):
+        conn = None
+        while True:
+            batch, done = self._next_batch()
+            if batch:
+                conn = self._deliver(conn, batch)
+                for _ in batch:
+                    self.source.task_done()
+            self._maybe_report()
+            if done:
+                self.source.task_done()
+                # 다른 전송 스레드도 끝나도록 종료 신호를 다시 넣음
+                self.source.put(None)
+                break
+        if conn is not None:
+            conn.close()
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.timeout)
+        conn.connect()
+        # 작은 요청/응답이 지연 ACK 와 Nagle 때문에 수십 ms 씩 묶이지 않도록
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def _deliver(self, conn, batch):
+        """묶음 하나를 재시도하며 전송하고 (재사용할) 연결을 돌려줌"""
+        body = json.dumps([item[1] for item in batch], ensure_ascii=False, default=str).encode('utf-8')
+        headers = {"Content-Type": "application/json; charset=utf-8", "Connection": "keep-alive"}
+        attempts = itertools.count() if self.retries is None else range(self.retries + 1)
+        limit = "∞" if self.retries is None else self.retries + 1
+        for attempt in attempts:
+            if attempt:
+                with self.lock:
+                    self.retried += len(batch)
+                time.sleep(self._delay(attempt))
+            error = None
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.request("POST", self.path, body, headers)
+                response = conn.getresponse()
+                response.read()  # 응답 본문을 다 읽어야 연결을 재사용할 수 있음
+                if response.will_close:
+                    conn.close()
+                    conn = None
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                if conn is not None:
+                    conn.close()
+                conn = None
+                status, error = None, e
+            with self.lock:
+                self.requests += 1
+            if status is not None and 200 <= status < 300:
+                self._delivered(batch)
+                types = ', '.join(sorted({str(item[1].get('type')) for item in batch}))
+                self.log("INFO", f"Data sent: {len(batch)} event(s) ({types}){f' after {attempt} retries' if attempt else ''}")
+                return conn
+            with self.lock:
+                self.failures += 1
+            if status is not None and status < 500 and status not in _RETRY_STATUS:
+                self.log("ERROR", f"Server rejected {len(batch)} event(s): HTTP {status} (not retried)")
+                # 다시 보내도 거부되므로 스풀에서도 지움
+                self._ack(batch)
+                break
+            self.log("WARNING", f"Delivery attempt {attempt + 1}/{limit} failed: {error or f'HTTP {status}'}")
+        with self.lock:
+            self.dropped += len(batch)
+        self.log("ERROR", f"Dropped {len(batch)} event(s) after {attempt + 1} attempt(s)")
+        return conn
+
+
+class StreamDelivery(_Delivery):
+    """
+    source 큐의 (enqueued, event, offset) 를 host:port 스트림 채널로 보냄. 줄마다 seq 를 붙이고, 서버의 누적 ACK 로 확인된 항목만 on_ack 로 넘깁니다.
+    연결이 끊기면 백오프로 다시 연결하고 RESUME 이후 확인 안 된 줄을 순서대로 다시 보냅니다(retried). 큐의 None 을 받으면 모두 확인받은 뒤 끝납니다.
+    """
+    def __init__(self, host, port, source, log=None, on_ack=None, batch_max=BATCH_MAX, window=STREAM_WINDOW,
+                 timeout=REQUEST_TIMEOUT, backoff=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        # 이미 연결이 열려 있으므로 더 모으려고 기다리지 않음 (batch_wait=0): 큐에 쌓인 만큼만 한 번에 씀
+        super().__init__(source, log, on_ack, batch_max, 0.0, backoff, backoff_max)
+        self.host = host
+        self.port = port
+        self.window = window
+        self.timeout = timeout
+        self.session = os.urandom(8).hex()
+        self.cond = threading.Condition(self.lock)
+        # 보냈지만 확인받지 못한 (seq, item, line), seq 오름차순
+        self.unacked = collections.deque()
+        self.sock = None
+        # 이벤트 줄과 통계 줄이 한 소켓에 섞여 쓰이지 않도록
+        self.write_lock = threading.Lock()
+        self.reconnects = 0
+
+    def start(self):
+        self._start_threads(1, "stream")
+        self.log("INFO", f"Event stream started: {self.host}:{self.port} (session {self.session}, window {self.window})")
+
+    def send_stats(self, stats):
+        """통계 한 줄({"type": "STATS", "stats": {...}})을 보냄. seq/ACK/재전송 없이 연결돼 있을 때만 (끊겨 있으면 버리고 False)"""
+        sock = self.sock
+        if sock is None:
+            return False
+        line = json.dumps({"type": "STATS", "session": self.session, "stats": stats}, default=str).encode('utf-8') + b'\n'
+        try:
+            with self.write_lock:
+                sock.sendall(line)
+        except OSError:
+            # 끊긴 연결의 정리와 재연결은 전송/ACK 스레드가 담당
+            return False
+        return True
+
+    def _run(self):
+        seq = 0
+        done = False
+        while not done:
+            batch, done = self._next_batch()
+            lines = []
+            with self.cond:
+                # 확인 안 된 이벤트가 창을 넘으면 ACK 나 연결 끊김까지 대기
+                while len(self.unacked) >= self.window and self.sock is not None:
+                    self.cond.wait(self.timeout)
+                for item in batch:
+                    seq += 1
+                    line = b'{"seq":%d,"event":%s}\n' % (seq, json.dumps(item[1], ensure_ascii=False, default=str).encode('utf-8'))
+                    self.unacked.append((seq, item, line))
+                    lines.append(line)
+            if lines:
+                self._send(lines)
+            for _ in batch:
+                self.source.task_done()
+            self._maybe_report()
+        # 남은 이벤트를 모두 확인받을 때까지 (끊기면 다시 연결해 재전송)
+        with self.cond:
+            while self.unacked:
+                if self.sock is None:
+                    self.cond.release()
+                    try:
+                        self._send([])
+                    finally:
+                        self.cond.acquire()
+                else:
+                    self.cond.wait(self.timeout)
+            sock, self.sock = self.sock, None
+        if sock is not None:
+            sock.close()
+        self.source.task_done()
+
+    def _send(self, lines):
+        """연결이 없으면 다시 연결(RESUME 이후 확인 안 된 줄 전체 재전송)하고, 있으면 lines 를 한 번에 씀"""
+        attempt = 0
+        while True:
+            sock = self.sock
+            try:
+                if sock is None:
+                    self._connect(attempt)
+                else:
+                    with self.write_lock:
+                        sock.sendall(b''.join(lines))
+                with self.lock:
+                    self.requests += 1
+                return
+            except (OSError, ValueError) as e:
+                with self.lock:
+                    self.failures += 1
+                    if self.sock is sock:
+                        self.sock = None
+                if sock is not None:
+                    sock.close()
+                    self.log("WARNING", f"Event stream lost: {e}")
+                elif attempt == 0 or attempt % 10 == 0:
+                    self.log("WARNING", f"Event stream connect attempt {attempt + 1} failed: {e}")
+                attempt += 1
+
+    def _connect(self, attempt):
+        if attempt:
+            time.sleep(self._delay(attempt))
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(json.dumps({"type": "HELLO", "session": self.session, "version": 1}).encode('utf-8') + b'\n')
+            reader = sock.makefile('rb')
+            resume = json.loads(reader.readline() or b'null')
+            if not isinstance(resume, dict) or resume.get("type") != "RESUME":
+                raise ValueError(f"unexpected handshake reply: {resume!r}")
+            sock.settimeout(None)
+            self._acked_through(int(resume.get("seq", 0)))
+            with self.lock:
+                pending = [line for _, _, line in self.unacked]
+                self.retried += len(pending) if self.reconnects else 0
+                self.reconnects += 1
+                self.sock = sock
+            threading.Thread(target=self._read_acks, args=(sock, reader), name="stream-acks", daemon=True).start()
+            if pending:
+                with self.write_lock:
+                    sock.sendall(b''.join(pending))
+        except BaseException:
+            with self.lock:
+                if self.sock is sock:
+                    self.sock = None
+            sock.close()
+            raise
+        if self.reconnects > 1:
+            self.log("INFO", f"Event stream resumed at seq {resume.get('seq', 0)} ({len(pending)} event(s) resent)")
+
+    def _read_acks(self, sock, reader):
+        """연결 하나의 ACK 수신 스레드. 연결이 끊기면 sock 을 비워 전송 스레드가 다시 연결하게 함"""
+        reason = "closed by server"
+        try:
+            for line in reader:
+                message = json.loads(line)
+                if message.get("type") == "ACK":
+                    self._acked_through(int(message["seq"]))
+        except (OSError, ValueError) as e:
+            reason = str(e)
+        with self.cond:
+            # 전송 스레드가 먼저 비웠으면 정상 종료
+            lost = self.sock is sock
+            if lost:
+                self.sock = None
+            self.cond.notify_all()
+        sock.close()
+        if lost:
+            self.log("WARNING", f"Event stream lost: {reason}")
+
+    def _acked_through(self, seq):
+        items = []
+        with self.cond:
+            while self.unacked and self.unacked[0][0] <= seq:
+                items.append(self.unacked.popleft()[1])
+            self.cond.notify_all()
+        if items:
+            self._delivered(items)
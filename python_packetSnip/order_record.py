@@ -0,0 +1,126 @@
+"""
+작성의도: 주문 INSERT 의 파라미터 순서를 하드코딩(params[9] = 좌석, params[7] = 총액)하지 않고,
+          PREPARE 된 쿼리의 컬럼 목록으로 값을 찾아 스키마 변경/POS 버전 차이에도 올바른 주문 레코드를 만듭니다.
+기능 원리: PREPARE 시점에 INSERT INTO t (c1, c2, ...) VALUES (...) 를 한 번 파싱해 컬럼별 파라미터 위치와 변환 함수를
+          튜플(플랜)로 만들어 Statement 에 보관하고, EXECUTE 마다 플랜을 따라 인덱스로만 값을 꺼내 타입을 맞춥니다.
+          어떤 필드를 어떤 컬럼에서 찾을지는 주문 규칙(order_rules.py)이 정합니다.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+
+def _to_int(value):
+    if isinstance(value, int):
+        return value
+    return int(Decimal(str(value).strip()))
+
+
+def _to_number(value):
+    """금액: 정수면 int, 소수가 있으면 float (DECIMAL 은 문자열로 디코딩됨)"""
+    if isinstance(value, (int, float)):
+        return value
+    number = Decimal(str(value).strip())
+    return int(number) if number == number.to_integral_value() else float(number)
+
+
+def _to_str(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode('utf-8', 'ignore')
+    return str(value)
+
+
+# [설정] 규칙 파일의 "type" 이름 → 변환 함수
+CONVERTERS = {"int": _to_int, "number": _to_number, "str": _to_str}
+# 변환 함수별로 이미 맞는 타입 (바이너리 프로토콜로 디코딩된 값은 대부분 그대로 사용 → 함수 호출 생략)
+_NATIVE_TYPES = {_to_int: (int,), _to_number: (int, float), _to_str: (str,)}
+
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"", re.DOTALL)
+_INSERT_HEAD = re.compile(r'\binto\s+[`"\[]?[\w.$]+[`"\]]?\s*\(([^()]*)\)\s*values?\s*\(', re.IGNORECASE)
+
+
+def _split_tuple(text, start):
+    """text[start] 가 여는 괄호 다음 위치일 때, 최상위 콤마로 나눈 항목 목록 (닫는 괄호까지)"""
+    items = []
+    depth = 0
+    begin = start
+    for i in range(start, len(text)):
+        ch = text[i]
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            if depth == 0:
+                items.append(text[begin:i])
+                return items
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            items.append(text[begin:i])
+            begin = i + 1
+    return None
+
+
+def param_positions(query):
+    """
+    INSERT ... (columns) VALUES (...) 의 {컬럼명(소문자): 파라미터 위치}.
+    값이 ? 하나인 컬럼만 포함하며(NOW(), 상수 등은 제외), 앞선 항목 안의 ? 도 위치 계산에 반영합니다.
+    """
+    text = _STRINGS.sub("''", query)
+    m = _INSERT_HEAD.search(text)
+    if not m:
+        return {}
+    columns = [c.strip().strip('`"[]').rsplit('.', 1)[-1].lower() for c in m.group(1).split(',')]
+    items = _split_tuple(text, m.end())
+    if items is None or len(items) != len(columns):
+        return {}
+    positions = {}
+    index = 0
+    for column, item in zip(columns, items):
+        item = item.strip()
+        if item == '?':
+            positions[column] = index
+        index += item.count('?')
+    return positions
+
+
+def column_positions(columns):
+    """리터럴 INSERT 의 행 항목 순서 그대로 {컬럼명: 위치} (sql_literals.py 의 행은 컬럼마다 값 하나)"""
+    return {c.lower(): i for i, c in enumerate(columns)}
+
+
+def compile_order_plan(fields, positions, required=(), include_unmapped=True):
+    """
+    {컬럼명: 값 위치}(param_positions / column_positions) → (플랜, 빠진 필수 필드).
+    fields 는 (필드명, 컬럼 이름 후보, 변환 함수 또는 None, 고정 파라미터 위치 또는 None) 목록이며 고정 위치가 있으면 컬럼 이름보다 우선합니다.
+    플랜은 (필드명, 파라미터 위치 또는 None, 변환 함수 또는 None, 그대로 쓰는 타입) 튜플로,
+    지정한 필드가 먼저, include_unmapped 이면 나머지 컬럼이 INSERT 순서대로 뒤에 옵니다.
+    """
+    plan = []
+    used = set()
+    for field, candidates, convert, param in fields:
+        index = param
+        if index is None:
+            column = next((c for c in candidates if c in positions), None)
+            if column is not None:
+                used.add(column)
+                index = positions[column]
+        plan.append((field, index, convert, _NATIVE_TYPES.get(convert, ())))
+    if include_unmapped:
+        for column, index in sorted(positions.items(), key=lambda kv: kv[1]):
+            if column not in used:
+                plan.append((column, index, None, ()))
+    missing = tuple(f for f in required if not any(p[0] == f and p[1] is not None for p in plan))
+    return tuple(plan), missing
+
+
+def build_order(plan, params):
+    """EXECUTE 파라미터 → 주문 레코드 dict. 값이 없거나 변환에 실패한 필드는 None"""
+    record = {}
+    count = len(params)
+    for field, index, convert, native in plan:
+        value = params[index] if index is not None and index < count else None
+        if value is not None and convert is not None and type(value) not in native:
+            try:
+                value = convert(value)
+            except (TypeError, ValueError, InvalidOperation):
+                value = None
+        record[field] = value
+    return record
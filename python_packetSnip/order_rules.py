@@ -0,0 +1,188 @@
+"""
+작성의도: 매장/POS 버전마다 다른 주문 테이블 이름, 필드 매핑, 이벤트 type 이름을 코드 수정/재배포 없이 규칙 파일(JSON)로 바꿉니다.
+기능 원리: 규칙 파일을 읽을 때 한 번 컴파일해 다이제스트 → 규칙, 테이블 → 규칙 dict 를 만들고,
+          지문(sql_fingerprint) 하나에 대한 매칭은 규칙 수와 무관하게 dict 조회 몇 번으로 끝납니다.
+          감시 스레드가 파일 mtime 변화를 보면 새 규칙을 끝까지 컴파일한 뒤 참조 한 번으로 교체합니다 (실패하면 이전 규칙 유지).
+"""
+import json
+import os
+import threading
+import time
+
+from order_assembly import ROLE_HEADER, ROLE_ITEM
+from order_record import CONVERTERS, column_positions, compile_order_plan, param_positions
+
+# [설정] 규칙 파일 변경 확인 주기 (초)
+RELOAD_INTERVAL = 2.0
+# 기본 규칙의 유일한 원본: 이 모듈과 함께 배포되는 order_rules.json (--rules 로 준 파일이 없을 때도 이 규칙 사용)
+BUNDLED_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "order_rules.json")
+
+DEFAULT_KINDS = ("insert", "replace")
+
+
+def _compile_field(name, spec):
+    """필드 명세 → (필드명, 컬럼 후보, 변환 함수, 고정 파라미터 위치). "col" / ["col", ...] / {"columns", "param", "type"}"""
+    if isinstance(spec, str):
+        spec = {"columns": [spec]}
+    elif isinstance(spec, list):
+        spec = {"columns": spec}
+    elif not isinstance(spec, dict):
+        raise ValueError(f"field '{name}': expected string, list or object")
+    columns = spec.get("columns", [name])
+    if isinstance(columns, str):
+        columns = [columns]
+    type_name = spec.get("type")
+    if type_name is not None and type_name not in CONVERTERS:
+        raise ValueError(f"field '{name}': unknown type '{type_name}' (use {', '.join(CONVERTERS)})")
+    param = spec.get("param")
+    if param is not None and (not isinstance(param, int) or param < 0):
+        raise ValueError(f"field '{name}': param must be a non-negative integer")
+    return (name, tuple(c.lower() for c in columns), CONVERTERS.get(type_name), param)
+
+
+class OrderRule:
+    """컴파일된 규칙 하나. compile(query) 가 Statement 별, compile_columns(columns) 가 리터럴 INSERT 지문별 추출 플랜을 만듭니다."""
+    __slots__ = ("type", "table", "digest", "role", "kinds", "fields", "required", "include_unmapped", "key")
+
+    def __init__(self, spec):
+        self.table = spec.get("table")
+        self.digest = spec.get("digest")
+        if not self.table and not self.digest:
+            raise ValueError("rule needs 'table' or 'digest'")
+        self.table = self.table.lower() if self.table else None
+        self.type = spec.get("type") or self.table or self.digest
+        # header: 주문 하나를 시작하는 레코드(tb_order), item: 직전 헤더에 붙는 상세 레코드(tb_suborder)
+        self.role = spec.get("role", ROLE_HEADER)
+        if self.role not in (ROLE_HEADER, ROLE_ITEM):
+            raise ValueError(f"role must be '{ROLE_HEADER}' or '{ROLE_ITEM}'")
+        self.kinds = tuple(spec.get("kinds", DEFAULT_KINDS))
+        self.fields = tuple(_compile_field(name, field) for name, field in spec.get("fields", {}).items())
+        self.required = tuple(spec.get("required", ()))
+        self.include_unmapped = bool(spec.get("include_unmapped", True))
+        # 중복 주문 판별(멱등 키)에 쓰는 필드. 값이 모두 있으면 연결과 무관하게 같은 주문으로 봄 (order_dedup.py)
+        self.key = tuple(spec.get("key", ()))
+
+    def compile(self, query):
+        return compile_order_plan(self.fields, param_positions(query), self.required, self.include_unmapped)
+
+    def compile_columns(self, columns):
+        return compile_order_plan(self.fields, column_positions(columns), self.required, self.include_unmapped)
+
+    def __repr__(self):
+        return f"OrderRule({self.type}, table={self.table}, digest={self.digest})"
+
+
+class RuleSet:
+    """다이제스트/테이블 → 규칙 dispatch dict. 다이제스트 규칙이 테이블 규칙보다 우선합니다."""
+    def __init__(self, data, source="<builtin>"):
+        if not isinstance(data, dict) or not isinstance(data.get("rules"), list):
+            raise ValueError("expected an object with a 'rules' list")
+        self.source = source
+        self.rules = []
+        self.by_digest = {}
+        self.by_table = {}
+        self.by_type = {}
+        for i, spec in enumerate(data["rules"]):
+            if not isinstance(spec, dict):
+                raise ValueError(f"rule #{i}: expected an object")
+            try:
+                rule = OrderRule(spec)
+            except ValueError as e:
+                raise ValueError(f"rule #{i}: {e}") from None
+            index = self.by_digest if rule.digest else self.by_table
+            key = rule.digest or rule.table
+            if key in index:
+                raise ValueError(f"rule #{i}: duplicate rule for '{key}'")
+            index[key] = rule
+            self.by_type.setdefault(rule.type, rule)
+            self.rules.append(rule)
+
+    def key_fields(self, rule_type):
+        """이벤트 type 의 멱등 키 필드 (같은 type 규칙이 여럿이면 먼저 나온 규칙)"""
+        rule = self.by_type.get(rule_type)
+        return rule.key if rule is not None else ()
+
+    def match(self, fp):
+        """지문에 해당하는 규칙 또는 None (규칙 수와 무관하게 dict 조회만)"""
+        rule = self.by_digest.get(fp.digest)
+        if rule is None:
+            for table in fp.tables:
+                rule = self.by_table.get(table)
+                if rule is not None:
+                    break
+        if rule is not None and fp.kind not in rule.kinds:
+            return None
+        return rule
+
+
+def load_bundled_rules(path=BUNDLED_RULES_FILE):
+    """함께 배포된 규칙 파일 내용. 없거나 잘못됐으면 경고 후 규칙 없음 (주문 이벤트를 만들지 않음)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        RuleSet(data, path)
+        return data
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Bundled order rules unavailable: {path}: {e} (no order rules)")
+        return {"rules": []}
+
+
+DEFAULT_RULES = load_bundled_rules()
+
+
+class RuleFile:
+    """
+    규칙 파일 하나. current 는 항상 완전히 컴파일된 RuleSet 이며 다시 읽으면 참조 한 번으로 교체됩니다.
+    파일이 없으면 DEFAULT_RULES(함께 배포된 order_rules.json)를 사용하고, 잘못된 파일은 오류를 출력한 뒤 이전 규칙을 유지합니다.
+    on_reload(rule_set) 는 교체 직후 호출됩니다.
+    """
+    def __init__(self, path, on_reload=None):
+        self.path = path
+        self.on_reload = on_reload
+        self.current = RuleSet(DEFAULT_RULES, BUNDLED_RULES_FILE)
+        self.mtime = None
+        self.reloads = 0
+        self.errors = 0
+        self.watching = False
+
+    def check(self):
+        """파일이 바뀌었으면 다시 읽고 True"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            if self.mtime is None:
+                self.mtime = 0
+                print(f"[WARNING] Order rules file not found: {self.path} (using bundled rules)")
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                rule_set = RuleSet(json.load(f), self.path)
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"[ERROR] Order rules {self.path}: {e} (keeping previous rules)")
+            return False
+        self.current = rule_set
+        self.reloads += 1
+        print(f"[*] Order rules loaded: {self.path} ({len(rule_set.rules)} rules)")
+        if self.on_reload is not None:
+            self.on_reload(rule_set)
+        return True
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        """mtime 을 주기적으로 확인하는 데몬 스레드 시작 (캡처/파싱 스레드는 멈추지 않음)"""
+        if self.watching:
+            return
+        self.watching = True
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"[ERROR] Order rules watcher: {e}")
+
+        threading.Thread(target=loop, name="order-rules", daemon=True).start()
@@ -0,0 +1,262 @@
+"""
+작성의도: 주방 서버(SERVER_URL)가 재시작하는 동안이나 엔진이 죽었을 때 메모리 큐에만 있던 주문을 잃지 않도록,
+          주문 이벤트를 먼저 디스크 스풀에 기록하고 서버가 받은 뒤에야 지웁니다.
+기능 원리: 주문은 순번(offset)을 받고 세그먼트 파일(첫 순번.seg)에 [길이, CRC32, JSON] 레코드로 덧붙여집니다.
+          기록 스레드가 그동안 쌓인 주문을 한 번에 쓰고 fsync 한 번으로 확정(그룹 커밋)한 뒤에 전송 큐로 넘기므로,
+          전송되는 주문은 항상 디스크에 있습니다. 전송이 성공하면 ack(offset) 로 연속 확인 지점(ack 파일)을 올리고,
+          그 지점 이하만 담긴 세그먼트는 삭제합니다. 시작 시 확인 지점 이후 레코드를 순서대로 다시 큐에 넣습니다 (최소 한 번 전달).
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+# [설정] 세그먼트 하나의 최대 크기(바이트). 넘으면 새 세그먼트로 교체
+SEGMENT_BYTES = 4 * 1024 * 1024
+# [설정] 새 주문이 없을 때 확인 지점 기록/세그먼트 정리 주기(초)
+IDLE_INTERVAL = 1.0
+
+_RECORD = struct.Struct('<II')  # 본문 길이, CRC32
+_SEGMENT_SUFFIX = ".seg"
+_ACK_FILE = "ack"
+
+
+def _print_log(level, message):
+    print(f"[{level}] {message}", flush=True)
+
+
+class _Segment:
+    __slots__ = ("first", "last", "path", "size")
+
+    def __init__(self, first, path, last=None, size=0):
+        self.first = first
+        self.last = first - 1 if last is None else last
+        self.path = path
+        self.size = size
+
+
+def _read_segment(path):
+    """세그먼트의 (레코드 본문 목록, 유효한 끝 위치, 파일 크기). 잘린/손상된 레코드에서 멈춤"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    payloads = []
+    pos = 0
+    while pos + _RECORD.size <= len(data):
+        length, crc = _RECORD.unpack_from(data, pos)
+        end = pos + _RECORD.size + length
+        if end > len(data):
+            break
+        payload = data[pos + _RECORD.size:end]
+        if zlib.crc32(payload) != crc:
+            break
+        payloads.append(payload)
+        pos = end
+    return payloads, pos, len(data)
+
+
+class OrderSpool:
+    """
+    append(event) → 디스크 확정 후 target 큐에 (넣은 시각, event, offset) 전달, ack(offsets) → 확인 지점 이동과 세그먼트 정리.
+    directory 가 None 이면 디스크 없이 바로 큐로 넘깁니다 (전송하지 않는 오프라인 재생용). close() 는 남은 주문을 확정한 뒤 큐에 None 을 넣습니다.
+    """
+    def __init__(self, directory, target, log=None, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.target = target
+        self.log = log or _print_log
+        self.segment_bytes = segment_bytes
+        self.cond = threading.Condition()
+        self.pending = []
+        self.closing = False
+        self.thread = None
+        self.segments = []
+        self.file = None
+        self.next_offset = 1
+        # 확인 지점: 이 순번 이하는 모두 전달됨. acked 는 확인 지점보다 뒤에서 먼저 끝난 순번
+        self.watermark = 0
+        self.saved_watermark = 0
+        self.acked = set()
+        # 통계
+        self.appended = 0
+        self.replayed = 0
+        self.fsyncs = 0
+        self.sync_seconds = 0.0
+
+    def open(self):
+        """기존 세그먼트를 읽어 확인 안 된 주문을 큐에 다시 넣고 기록 스레드를 시작"""
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.watermark = self.saved_watermark = self._load_watermark()
+        self.next_offset = self.watermark + 1
+        now = time.monotonic()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(_SEGMENT_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                first = int(name[:-len(_SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            payloads, valid, size = _read_segment(path)
+            if valid < size:
+                # 기록 도중 종료된 꼬리: 확정되지 않은 레코드이므로 잘라냄
+                self.log("WARNING", f"Spool segment {name} truncated at {valid:,}/{size:,} bytes")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid)
+            segment = _Segment(first, path, first + len(payloads) - 1, valid)
+            for offset, payload in enumerate(payloads, first):
+                if offset > self.watermark:
+                    self.target.put((now, json.loads(payload), offset))
+                    self.replayed += 1
+            self.segments.append(segment)
+            self.next_offset = max(self.next_offset, segment.last + 1)
+        self._compact()
+        if self.replayed:
+            self.log("INFO", f"Spool: replaying {self.replayed:,} undelivered event(s) from {self.directory}")
+        self.thread = threading.Thread(target=self._run, name="spool-writer", daemon=True)
+        self.thread.start()
+
+    def append(self, event):
+        enqueued = time.monotonic()
+        if self.directory is None:
+            self.appended += 1
+            self.target.put((enqueued, event, None))
+            return
+        payload = json.dumps(event, ensure_ascii=False, default=str).encode('utf-8')
+        with self.cond:
+            self.pending.append((enqueued, event, payload))
+            self.cond.notify()
+
+    def ack(self, offsets):
+        """서버가 받은(또는 재시도해도 소용없어 거부된) 순번들"""
+        with self.cond:
+            for offset in offsets:
+                if offset is not None and offset > self.watermark:
+                    self.acked.add(offset)
+            while self.watermark + 1 in self.acked:
+                self.watermark += 1
+                self.acked.discard(self.watermark)
+
+    def close(self):
+        """남은 주문을 확정하고 큐에 종료 신호를 넣음. 그 뒤에 들어온 ack 는 checkpoint() 로 기록"""
+        if self.thread is None:
+            self.target.put(None)
+            return
+        with self.cond:
+            self.closing = True
+            self.cond.notify()
+        self.thread.join()
+        self.thread = None
+
+    def checkpoint(self):
+        """확인 지점을 ack 파일에 기록하고 전달이 끝난 세그먼트 삭제"""
+        if self.directory is None:
+            return
+        if self.saved_watermark != self.watermark:
+            self._save_watermark()
+        self._compact()
+
+    def stats(self):
+        with self.cond:
+            return {"appended": self.appended, "replayed": self.replayed, "fsyncs": self.fsyncs,
+                    "unacked": self.next_offset - 1 - self.watermark - len(self.acked), "segments": len(self.segments),
+                    "sync_ms": self.sync_seconds / self.fsyncs * 1000 if self.fsyncs else None}
+
+    def report(self):
+        if self.directory is None:
+            return
+        stats = self.stats()
+        sync = "n/a" if stats["sync_ms"] is None else f"{stats['sync_ms']:.2f} ms"
+        self.log("INFO", f"Spool: appended={stats['appended']:,}, replayed={stats['replayed']:,}, fsyncs={stats['fsyncs']:,} "
+                         f"(avg {sync}), unacked={stats['unacked']:,}, segments={stats['segments']}")
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.pending and not self.closing:
+                    self.cond.wait(IDLE_INTERVAL)
+                batch, self.pending = self.pending, []
+                closing = self.closing and not batch
+            if batch:
+                self._commit(batch)
+            self.checkpoint()
+            if closing:
+                break
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.target.put(None)
+
+    def _commit(self, batch):
+        """그룹 커밋: 쌓인 주문을 한 번에 쓰고 fsync 한 번 → 확정된 주문만 전송 큐로"""
+        t0 = time.perf_counter()
+        first = self.next_offset
+        chunks = []
+        for _, _, payload in batch:
+            chunks.append(_RECORD.pack(len(payload), zlib.crc32(payload)))
+            chunks.append(payload)
+        data = b''.join(chunks)
+        segment = self.segments[-1] if self.file is not None else None
+        if segment is None or segment.size >= self.segment_bytes:
+            segment = self._rotate(first)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        with self.cond:
+            segment.size += len(data)
+            segment.last = first + len(batch) - 1
+            self.next_offset = segment.last + 1
+            self.appended += len(batch)
+            self.fsyncs += 1
+            self.sync_seconds += time.perf_counter() - t0
+        for offset, (enqueued, event, _) in enumerate(batch, first):
+            self.target.put((enqueued, event, offset))
+
+    def _rotate(self, first):
+        if self.file is not None:
+            self.file.close()
+        path = os.path.join(self.directory, f"{first:016d}{_SEGMENT_SUFFIX}")
+        self.file = open(path, 'ab')
+        segment = _Segment(first, path)
+        with self.cond:
+            self.segments.append(segment)
+        return segment
+
+    def _compact(self):
+        """확인 지점 이하만 담긴 세그먼트 삭제 (기록 중인 세그먼트는 제외)"""
+        active = self.segments[-1] if self.file is not None else None
+        keep = []
+        for segment in self.segments:
+            if segment is not active and segment.last <= self.watermark:
+                try:
+                    os.remove(segment.path)
+                except OSError as e:
+                    self.log("WARNING", f"Spool segment cleanup failed: {e}")
+                    keep.append(segment)
+            else:
+                keep.append(segment)
+        with self.cond:
+            self.segments = keep
+
+    def _load_watermark(self):
+        try:
+            with open(os.path.join(self.directory, _ACK_FILE), encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            self.log("WARNING", f"Spool ack file unreadable, replaying all segments: {e}")
+            return 0
+
+    def _save_watermark(self):
+        """임시 파일에 쓰고 교체 (도중에 죽어도 이전 확인 지점이 남음 → 일부 재전송, 서버는 order_key 로 구분)"""
+        watermark = self.watermark
+        path = os.path.join(self.directory, _ACK_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(str(watermark))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self.saved_watermark = watermark
@@ -0,0 +1,116 @@
+"""
+작성의도: "주문은 1초 안에 주방 화면에 뜬다"는 약속을 측정하고, 지연 예산을 tshark/캡처, 파싱, 스풀/전송 중 어디서 쓰는지 찾습니다.
+기능 원리: 주문 이벤트는 trace 에 단계 시각(epoch 초)을 싣습니다.
+          - capture: 주문 첫 레코드 패킷의 캡처 시각 (라이브 캡처만)
+          - frame: 그 프레임이 파이썬에 도착한 시각
+          - parse: 주문 조립이 끝난 시각
+          - enqueue: 스풀/로그 큐에 넣은 시각
+          - ack: 서버(SERVER_URL 또는 이벤트 스트림)가 받은 시각
+          record() 가 인접 단계 간 지연을 단계별 HDR 식 히스토그램(metrics.py)에 넣고, 예산을 넘은 주문은 단계별로 가장 느린 몇 건을
+          식별자(tx_id 등)와 함께 보관합니다. TRACE_REPORT_INTERVAL 마다 그 사이 분위수와 예산 초과 주문을 한 번에 출력합니다.
+"""
+import heapq
+import threading
+import time
+
+import metrics
+from order_assembly import ASSEMBLY_TIMEOUT
+
+# 단계 이름, 시작 시각 키, 끝 시각 키
+STAGES = (
+    ("wire", "capture", "frame"),      # 캡처 → 프레임 도착 (main.py: tshark 디섹션, scapy_main: 캡처 소켓 + 재조립)
+    ("parse", "frame", "parse"),       # 첫 레코드 프레임 도착 → 주문 조립 완료 (COMMIT/ASSEMBLY_TIMEOUT 대기 포함)
+    ("enqueue", "parse", "enqueue"),   # 조립 완료 → 스풀/로그 큐 (샤딩 모드는 싱크 전달 포함)
+    ("delivery", "enqueue", "ack"),    # 큐 → 서버 확인 (스풀 fsync, 재시도, 네트워크 포함)
+    ("total", "capture", "ack"),
+)
+# [설정] 파싱/조립 자체에 허용하는 시간(초). autocommit 주문은 ASSEMBLY_TIMEOUT 동안 다음 레코드를 기다린 뒤에야 완성되므로
+# parse 예산은 그 대기 + 이 값 (대기만으로 모든 타임아웃 주문이 예산을 넘지 않도록)
+PARSE_ALLOWANCE = 0.2
+# [설정] 단계별 지연 예산(초). 넘은 주문은 주기 요약에 식별자와 함께 출력
+STAGE_BUDGETS = {"wire": 0.2, "parse": ASSEMBLY_TIMEOUT + PARSE_ALLOWANCE, "enqueue": 0.05, "delivery": 0.5, "total": 1.0}
+# [설정] 주기 요약 간격(초) / 단계별로 보관하는 가장 느린 주문 수
+TRACE_REPORT_INTERVAL = 60.0
+SLOWEST_KEPT = 3
+# 100 us ~ 100 s, 2배 구간마다 4칸 (분위수 상대 오차 25% 이하)
+LATENCY_BUCKETS = metrics.log_linear_buckets(0.0001, 60.0, 4)
+
+
+def _print_log(level, message):
+    print(f"[{level}] {message}", flush=True)
+
+
+def _ms(seconds):
+    if seconds is None:
+        return "n/a"
+    return ">100 s" if seconds == float('inf') else f"{seconds * 1000:,.1f}"
+
+
+class OrderTracer:
+    """주문 trace 의 단계별 지연 집계기. record() 는 여러 스레드(전송/ACK 수신)에서 불러도 됩니다"""
+    def __init__(self, registry=metrics.registry, log=None, budgets=STAGE_BUDGETS, interval=TRACE_REPORT_INTERVAL,
+                 kept=SLOWEST_KEPT):
+        self.log = log or _print_log
+        self.budgets = dict(budgets)
+        self.interval = interval
+        self.kept = kept
+        self.lock = threading.Lock()
+        self.histograms = {name: registry.histogram("sniffer_order_stage_seconds", "Order latency per pipeline stage",
+                                                    {"stage": name}, buckets=LATENCY_BUCKETS) for name, _, _ in STAGES}
+        self.over_budget = {name: registry.counter("sniffer_order_over_budget_total", "Orders over the stage latency budget",
+                                                   {"stage": name}) for name, _, _ in STAGES}
+        # 지난 요약 시점의 구간별 수 (요약은 그 사이 관찰만)
+        self.reported = {name: list(h.counts) for name, h in self.histograms.items()}
+        # 단계별 예산 초과 주문 중 가장 느린 kept 건: (지연, 순번, 식별자) 최소 힙
+        self.slowest = {name: [] for name, _, _ in STAGES}
+        self.sequence = 0
+        self.next_report = time.monotonic() + interval
+
+    def record(self, trace, ident=None):
+        """trace 의 시각들로 단계별 지연 기록 (없는 단계는 건너뜀). ident 는 예산 초과 시 함께 출력할 식별자 (예: "tx_id=1a2b-3f")"""
+        with self.lock:
+            for name, start, end in STAGES:
+                begin = trace.get(start)
+                finish = trace.get(end)
+                if begin is None or finish is None:
+                    continue
+                seconds = max(0.0, finish - begin)
+                self.histograms[name].observe(seconds)
+                budget = self.budgets.get(name)
+                if budget is not None and seconds > budget:
+                    self.over_budget[name].value += 1
+                    self.sequence += 1
+                    entry = (seconds, self.sequence, ident)
+                    heap = self.slowest[name]
+                    if len(heap) < self.kept:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+        if time.monotonic() >= self.next_report:
+            self.report()
+
+    def report(self):
+        """지난 요약 이후 단계별 p50/p99/최대 구간과 예산 초과 주문 출력 (관찰이 없으면 생략)"""
+        with self.lock:
+            self.next_report = time.monotonic() + self.interval
+            parts = []
+            offenders = []
+            for name, _, _ in STAGES:
+                histogram = self.histograms[name]
+                counts = [a - b for a, b in zip(histogram.counts, self.reported[name])]
+                self.reported[name] = list(histogram.counts)
+                observed = sum(counts)
+                if not observed:
+                    continue
+                p50 = metrics.bucket_quantile(histogram.buckets, counts, 0.50)
+                p99 = metrics.bucket_quantile(histogram.buckets, counts, 0.99)
+                top = metrics.bucket_quantile(histogram.buckets, counts, 1.0)
+                parts.append(f"{name} p50<={_ms(p50)} p99<={_ms(p99)} max<={_ms(top)}")
+                heap, self.slowest[name] = self.slowest[name], []
+                for seconds, _, ident in sorted(heap, reverse=True):
+                    offenders.append(f"{name} {seconds * 1000:,.1f} ms > {self.budgets[name] * 1000:,.0f} ms ({ident})")
+        if not parts:
+            return
+        self.log("INFO", f"Order latency (ms): {', '.join(parts)}")
+        for offender in offenders:
+            self.log("WARNING", f"Latency budget exceeded: {offender}")
@@ -0,0 +1,169 @@
+"""
+작성의도: scapy 패킷 객체를 만들지 않고 원시 프레임에서 바로 TCP 페이로드를 꺼내는 캡처 백엔드입니다.
+기능 원리: 링크/IPv4/IPv6/TCP 헤더를 미리 컴파일한 struct.Struct 오프셋으로 해석하고,
+          페이로드는 복사 없이 memoryview 로 넘깁니다.
+"""
+import socket
+import struct
+
+# pcap 링크 타입 (DLT_*)
+DLT_NULL = 0
+DLT_EN10MB = 1
+DLT_RAW_ALT1 = 12
+DLT_RAW_ALT2 = 14
+DLT_RAW = 101
+DLT_LOOP = 108
+DLT_LINUX_SLL = 113
+DLT_LINUX_SLL2 = 276
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+IPPROTO_TCP = 6
+
+# TCP 플래그
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+# 헤더 레이아웃 (네트워크 바이트 오더)
+_U16 = struct.Struct('!H')
+# version/ihl, total length, flags/fragment offset, protocol, src, dst
+_IPV4 = struct.Struct('!BxH2xHxB2x4s4s')
+# payload length, next header, src, dst
+_IPV6 = struct.Struct('!4xHBx16s16s')
+# src port, dst port, seq, ack, data offset, flags
+_TCP = struct.Struct('!HHIIBB')
+# IPv6 확장 헤더: next header, length(8바이트 단위, 첫 8바이트 제외)
+_IPV6_EXT = struct.Struct('!BB')
+_IPV6_EXT_HEADERS = frozenset((0, 43, 60))
+# Linux PF_PACKET 커널 통계 (struct tpacket_stats: 받은 수, 드롭 수)
+_SOL_PACKET = 263
+_PACKET_STATISTICS = 6
+_PACKET_STATS = struct.Struct('II')
+
+# 링크 타입별 L3 시작 오프셋 (이더넷은 EtherType 을 따로 확인)
+_LINK_OFFSETS = {
+    DLT_NULL: 4,
+    DLT_LOOP: 4,
+    DLT_RAW: 0,
+    DLT_RAW_ALT1: 0,
+    DLT_RAW_ALT2: 0,
+    DLT_LINUX_SLL: 16,
+    DLT_LINUX_SLL2: 20,
+}
+
+# 주소 문자열 캐시: 매장 내 호스트 수는 적으므로 inet_ntop 를 패킷마다 호출하지 않음
+_addr_cache = {}
+
+
+def _addr(raw):
+    text = _addr_cache.get(raw)
+    if text is None:
+        family = socket.AF_INET if len(raw) == 4 else socket.AF_INET6
+        text = socket.inet_ntop(family, raw)
+        _addr_cache[raw] = text
+    return text
+
+
+def decode_frame(frame, linktype, port):
+    """
+    원시 프레임에서 TCP 세그먼트를 추출합니다.
+    반환값: (src_ip, sport, dst_ip, dport, seq, flags, payload_memoryview)
+    IP/TCP 가 아니거나 양쪽 포트 모두 `port` 가 아니면 None.
+    """
+    mv = frame if isinstance(frame, memoryview) else memoryview(frame)
+    size = len(mv)
+
+    if linktype == DLT_EN10MB:
+        if size < 14: return None
+        off = 14
+        etype = _U16.unpack_from(mv, 12)[0]
+        if etype == ETH_P_8021Q:
+            if size < 18: return None
+            etype = _U16.unpack_from(mv, 16)[0]
+            off = 18
+        if etype == ETH_P_IP: version = 4
+        elif etype == ETH_P_IPV6: version = 6
+        else: return None
+    else:
+        off = _LINK_OFFSETS.get(linktype)
+        if off is None or size <= off: return None
+        version = mv[off] >> 4
+
+    if version == 4:
+        if size < off + 20: return None
+        ver_ihl, total_len, frag, proto, src, dst = _IPV4.unpack_from(mv, off)
+        # 조각난 IP 패킷은 MySQL 트래픽에서 사실상 발생하지 않으므로 건너뜀
+        if proto != IPPROTO_TCP or frag & 0x3FFF: return None
+        tcp_off = off + (ver_ihl & 0x0F) * 4
+        # TSO 캡처에서는 total length 가 0 으로 기록되기도 함
+        end = off + total_len if total_len else size
+    elif version == 6:
+        if size < off + 40: return None
+        payload_len, nxt, src, dst = _IPV6.unpack_from(mv, off)
+        tcp_off = off + 40
+        end = tcp_off + payload_len if payload_len else size
+        while nxt in _IPV6_EXT_HEADERS:
+            if size < tcp_off + 2: return None
+            nxt, ext_len = _IPV6_EXT.unpack_from(mv, tcp_off)
+            tcp_off += (ext_len + 1) * 8
+        if nxt != IPPROTO_TCP: return None
+    else:
+        return None
+
+    if end > size: end = size
+    if end < tcp_off + 20: return None
+    sport, dport, seq, _ack, data_off, flags = _TCP.unpack_from(mv, tcp_off)
+    if sport != port and dport != port: return None
+
+    return (_addr(src), sport, _addr(dst), dport, seq, flags,
+            mv[tcp_off + (data_off >> 4) * 4 : end])
+
+
+class LiveSource:
+    """
+    scapy 의 L2 리슨 소켓(Npcap/libpcap 또는 Linux PF_PACKET)에서 recv_raw() 로 원시 바이트만 읽는 소스.
+    소켓만 빌려 쓰고 패킷 디섹션은 하지 않습니다.
+    """
+    def __init__(self, iface, bpf_filter):
+        from scapy.all import conf
+        try:
+            self.sock = conf.L2listen(iface=iface, filter=bpf_filter)
+        except Exception as e:
+            # libpcap 없이 필터를 컴파일할 수 없는 환경: 포트 필터링은 decode_frame 이 대신 수행
+            print(f"[WARNING] BPF filter unavailable ({e}), filtering in userspace")
+            self.sock = conf.L2listen(iface=iface)
+        pcap_fd = getattr(self.sock, 'pcap_fd', None)
+        if pcap_fd is not None:
+            self.linktype = pcap_fd.datalink()
+        else:
+            self.linktype = conf.l2types.layer2num.get(self.sock.LL, DLT_EN10MB)
+        self.kernel_packets = 0
+        self.drops = 0
+
+    def __iter__(self):
+        """(timestamp, frame_bytes) 를 무한히 생성. 타임아웃 시에는 건너뜀"""
+        recv_raw = self.sock.recv_raw
+        while True:
+            _, frame, ts = recv_raw()
+            if frame:
+                yield ts, frame
+
+    def stats(self):
+        """커널 드롭 누적값. Linux PF_PACKET 소켓만 PACKET_STATISTICS 로 읽고 (읽으면 0 으로 초기화됨), 그 외 소켓은 0"""
+        ins = getattr(self.sock, 'ins', None)
+        if hasattr(ins, 'getsockopt'):
+            try:
+                packets, drops = _PACKET_STATS.unpack(ins.getsockopt(_SOL_PACKET, _PACKET_STATISTICS, _PACKET_STATS.size))
+                self.kernel_packets += packets
+                self.drops += drops
+            except OSError:
+                pass
+        return {"packets": self.kernel_packets, "drops": self.drops}
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
@@ -0,0 +1,191 @@
+"""
+작성의도: 녹화된 pcap/pcapng 캡처를 실시간 캡처와 같은 파이프라인으로 재생해 장애 재현과 릴리스 간 처리량 비교를 가능하게 합니다.
+기능 원리: 파일을 고정 크기 창(chunk) 단위로 메모리 매핑하고 레코드 헤더만 struct 로 해석해
+          (timestamp, linktype, frame memoryview) 를 복사 없이 순서대로 내보냅니다.
+"""
+import mmap
+import os
+import struct
+import time
+
+# [설정] 한 번에 매핑할 창 크기. 수 GB 캡처도 주소 공간을 통째로 잡지 않고 순차적으로 훑습니다.
+CHUNK_SIZE = 64 * 1024 * 1024
+
+_PCAP_MAGIC_US = 0xA1B2C3D4
+_PCAP_MAGIC_NS = 0xA1B23C4D
+_PCAPNG_SHB = 0x0A0D0D0A
+_PCAPNG_BOM = 0x1A2B3C4D
+
+# pcapng 블록 타입
+_BLOCK_IDB = 0x00000001
+_BLOCK_OPB = 0x00000002
+_BLOCK_SPB = 0x00000003
+_BLOCK_EPB = 0x00000006
+_OPT_IF_TSRESOL = 9
+_OPT_IF_TSOFFSET = 14
+
+
+class MappedFile:
+    """파일을 CHUNK_SIZE 창으로 매핑하고, 요청한 구간이 창을 벗어나면 다음 창으로 옮겨 매핑"""
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self._fh = open(path, "rb")
+        self.size = os.fstat(self._fh.fileno()).st_size
+        self.chunk_size = chunk_size
+        self._mv = None
+        self._base = 0
+        self._end = 0
+
+    def view(self, offset, length):
+        """[offset, offset+length) 구간의 memoryview. 파일 끝을 넘으면 None"""
+        if offset + length > self.size:
+            return None
+        if offset < self._base or offset + length > self._end:
+            self._remap(offset, length)
+        start = offset - self._base
+        return self._mv[start:start + length]
+
+    def _remap(self, offset, length):
+        base = offset - offset % mmap.ALLOCATIONGRANULARITY
+        size = min(max(self.chunk_size, offset + length - base), self.size - base)
+        # 이전 창은 바깥에 남은 memoryview 가 모두 해제되면 GC 가 정리
+        mapped = mmap.mmap(self._fh.fileno(), size, access=mmap.ACCESS_READ, offset=base)
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        self._mv = memoryview(mapped)
+        self._base = base
+        self._end = base + size
+
+    def close(self):
+        self._mv = None
+        self._fh.close()
+
+
+def _iter_pcap(mf, endian, ts_div):
+    header = struct.Struct(endian + "IIII")
+    linktype = struct.unpack_from(endian + "I", mf.view(20, 4))[0] & 0xFFFF
+    off = 24
+    while True:
+        hdr = mf.view(off, 16)
+        if hdr is None: return
+        ts_sec, ts_frac, incl_len, _orig_len = header.unpack_from(hdr)
+        frame = mf.view(off + 16, incl_len)
+        if frame is None: return
+        yield ts_sec + ts_frac / ts_div, linktype, frame
+        off += 16 + incl_len
+
+
+def _parse_idb(body, endian):
+    """IDB 본문에서 (linktype, 초당 tick 수, 시각 오프셋) 추출"""
+    linktype = struct.unpack_from(endian + "H", body, 0)[0]
+    resol, ts_offset = 1000000, 0
+    off = 8
+    opt = struct.Struct(endian + "HH")
+    while off + 4 <= len(body):
+        code, length = opt.unpack_from(body, off)
+        if code == 0: break
+        value = body[off + 4 : off + 4 + length]
+        if code == _OPT_IF_TSRESOL and length >= 1:
+            v = value[0]
+            resol = 2 ** (v & 0x7F) if v & 0x80 else 10 ** v
+        elif code == _OPT_IF_TSOFFSET and length >= 8:
+            ts_offset = struct.unpack_from(endian + "q", value)[0]
+        off += 4 + ((length + 3) & ~3)
+    return linktype, resol, ts_offset
+
+
+def _iter_pcapng(mf):
+    endian = "<"
+    interfaces = []
+    off = 0
+    while True:
+        head = mf.view(off, 12)
+        if head is None: return
+        block_type = struct.unpack_from("<I", head)[0]
+        if block_type == _PCAPNG_SHB:
+            # 섹션마다 바이트 오더와 인터페이스 목록이 새로 정해짐
+            bom = struct.unpack_from("<I", head, 8)[0]
+            endian = "<" if bom == _PCAPNG_BOM else ">"
+            interfaces = []
+        block_type, block_len = struct.unpack_from(endian + "II", head)
+        if block_len < 12: return
+        body = mf.view(off + 8, block_len - 12)
+        if body is None: return
+
+        if block_type == _BLOCK_EPB:
+            if_id, ts_hi, ts_lo, cap_len, _ = struct.unpack_from(endian + "IIIII", body)
+            linktype, resol, ts_offset = interfaces[if_id]
+            yield ts_offset + ((ts_hi << 32) | ts_lo) / resol, linktype, body[20:20 + cap_len]
+        elif block_type == _BLOCK_SPB:
+            orig_len = struct.unpack_from(endian + "I", body)[0]
+            linktype = interfaces[0][0]
+            yield 0.0, linktype, body[4:4 + min(orig_len, len(body) - 4)]
+        elif block_type == _BLOCK_OPB:
+            if_id, _, ts_hi, ts_lo, cap_len, _ = struct.unpack_from(endian + "HHIIII", body)
+            linktype, resol, ts_offset = interfaces[if_id]
+            yield ts_offset + ((ts_hi << 32) | ts_lo) / resol, linktype, body[20:20 + cap_len]
+        elif block_type == _BLOCK_IDB:
+            interfaces.append(_parse_idb(body, endian))
+        off += block_len
+
+
+def iter_packets(path, chunk_size=CHUNK_SIZE):
+    """pcap/pcapng 파일에서 (timestamp, linktype, frame_memoryview) 를 순서대로 생성"""
+    mf = MappedFile(path, chunk_size)
+    try:
+        head = mf.view(0, 4)
+        if head is None: return
+        magic_le = struct.unpack_from("<I", head)[0]
+        magic_be = struct.unpack_from(">I", head)[0]
+        if magic_le == _PCAPNG_SHB:
+            yield from _iter_pcapng(mf)
+        elif magic_le in (_PCAP_MAGIC_US, _PCAP_MAGIC_NS):
+            yield from _iter_pcap(mf, "<", 1e9 if magic_le == _PCAP_MAGIC_NS else 1e6)
+        elif magic_be in (_PCAP_MAGIC_US, _PCAP_MAGIC_NS):
+            yield from _iter_pcap(mf, ">", 1e9 if magic_be == _PCAP_MAGIC_NS else 1e6)
+        else:
+            raise ValueError(f"Unsupported capture format: {path}")
+    finally:
+        mf.close()
+
+
+def iter_files(paths, chunk_size=CHUNK_SIZE):
+    for path in paths:
+        yield from iter_packets(path, chunk_size)
+
+
+class Pacer:
+    """캡처 시각 간격을 speed 배속으로 재현 (speed=1.0 이면 원래 속도)"""
+    def __init__(self, speed):
+        self.speed = speed
+        self.origin = None
+
+    def wait(self, ts):
+        now = time.perf_counter()
+        if self.origin is None:
+            self.origin = (ts, now)
+            return
+        delay = (ts - self.origin[0]) / self.speed - (now - self.origin[1])
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ReplayReport:
+    """재생 처리량 집계: 패킷/프레임/주문 수와 단계별 누적 시간"""
+    def __init__(self, stages):
+        self.stages = dict.fromkeys(stages, 0.0)
+        self.packets = 0
+        self.bytes = 0
+        self.frames = 0
+        self.orders = 0
+        self.started = time.perf_counter()
+
+    def print_summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print("[*] Replay finished")
+        print(f"    elapsed        : {elapsed:.3f} s")
+        print(f"    packets        : {self.packets:,} ({self.packets / elapsed:,.0f} pkt/s, {self.bytes / elapsed / 1e6:,.1f} MB/s)")
+        print(f"    mysql frames   : {self.frames:,} ({self.frames / elapsed:,.0f} frames/s)")
+        print(f"    orders found   : {self.orders:,}")
+        for name, spent in self.stages.items():
+            per_pkt = spent * 1e6 / self.packets if self.packets else 0.0
+            print(f"    stage {name:<9}: {spent:.3f} s ({spent / elapsed * 100:5.1f}%, {per_pkt:.2f} us/pkt)")
@@ -4,11 +4,28 @@ import time
 import struct
 import queue
 import os
-import re
 import json
-import uuid
+import argparse
+import codecs
 from datetime import datetime
 
+# 임베디드 파이썬(python313._pth)은 스크립트 폴더를 sys.path 에 넣지 않으므로 직접 추가
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import rawcap
+from tcp_reassembly import StreamReassembler, TCP_FIN, TCP_RST
+from session_registry import SessionRegistry
+from sql_fingerprint import fingerprint
+from sql_literals import parse_literals
+from order_record import build_order
+from order_rules import RuleFile
+from order_assembly import OrderAssembler
+from order_dedup import DedupWindow, order_key
+from jsonl_writer import JsonlWriter
+from console_writer import ConsoleWriter, parse_levels
+from event_time import format_timestamp, next_tx_id
+import metrics
+from order_trace import OrderTracer
+
 # Diagnostic Print
 print(f"[*] Python Version: {sys.version}")
 print(f"[*] Python Path: {sys.path}")
@@ -35,17 +52,50 @@ except ImportError as e:
 
 # MySQL Packet Header: 3 bytes Length, 1 byte Sequence ID
 # MySQL Commands
+COM_QUIT = 0x01
 COM_QUERY = 0x03
 COM_STMT_PREPARE = 0x16
 COM_STMT_EXECUTE = 0x17
 COM_STMT_CLOSE   = 0x19
+COM_STMT_RESET   = 0x1a
+
+# Capability flags (핸드셰이크에서 협상)
+CLIENT_COMPRESS = 0x00000020
+CLIENT_PROTOCOL_41 = 0x00000200
+CLIENT_SSL = 0x00000800
+CLIENT_MULTI_RESULTS = 0x00020000
+CLIENT_DEPRECATE_EOF = 0x01000000
+CLIENT_OPTIONAL_RESULTSET_METADATA = 0x02000000
+CLIENT_ZSTD_COMPRESSION_ALGORITHM = 0x04000000
+SERVER_STATUS_IN_TRANS = 0x0001
+SERVER_MORE_RESULTS_EXISTS = 0x0008
+
+# 헤더를 한 번에 읽기 위한 사전 컴파일 Struct: 길이(하위 16비트, 상위 8비트) + Sequence ID
+MYSQL_HEADER = struct.Struct('<HBB')
+# 값 디코더용 사전 컴파일 Struct: memoryview 에 unpack_from 으로 직접 적용 (슬라이스 복사 없음)
+_S_U16 = struct.Struct('<H')
+_S_U24 = struct.Struct('<HB')
+_S_U32 = struct.Struct('<I')
+_S_U64 = struct.Struct('<Q')
+_utf8_decode = codecs.utf_8_decode
 
 # [설정]
 MYSQL_PORT = 3306
+# 캡처 엔진: "raw" (헤더 직접 해석, 기본값) / "tpacket" (Linux PACKET_MMAP 링) / "scapy" (sniff() 디섹션, 호환용)
+CAPTURE_ENGINES = ("raw", "tpacket", "scapy")
+# [샤딩 모드] 워커 → 싱크 이벤트 큐 상한 (싱크가 밀리면 워커가 잠시 대기)
+SINK_QUEUE_SIZE = 100000
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log")
-SQL_LOG_FILE = os.path.join(LOG_DIR, "sql_history.jsonl")      # Raw SQL commands
-DATA_LOG_FILE = os.path.join(LOG_DIR, "data_results.jsonl")    # ResultSet rows
-ORDER_LOG_FILE = os.path.join(LOG_DIR, "order_tracking.jsonl") # Analyzed orders
+# 이벤트 종류별 JSONL 스트림: log/<YYYY-MM-DD>/<stream>-<NNNN>.jsonl (jsonl_writer.py 참고)
+LOG_STREAMS = {
+    "SQL": "sql_history",       # Raw SQL commands
+    "DATA": "data_results",     # ResultSet rows
+    "ORDER": "order_tracking",  # Analyzed orders
+}
+# [설정] 로깅 워커가 한 번에 꺼내 쓰는 최대 이벤트 수
+LOG_BATCH = 1000
+# [설정] 이벤트 종류별 터미널 출력 수준 (show: 한 줄씩, summary: 초당 개수만, off), --console DATA=show 로 변경
+CONSOLE_LEVELS = {"SQL": "show", "DATA": "summary", "ORDER": "show"}
 
 # 로그 디렉토리 생성 보장
 if not os.path.exists(LOG_DIR):
@@ -53,17 +103,30 @@ if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
     except Exception:
         LOG_DIR = "."
-        SQL_LOG_FILE = "sql_history.jsonl"
-        DATA_LOG_FILE = "data_results.jsonl"
-        ORDER_LOG_FILE = "order_tracking.jsonl"
 
 # State Management
-# stmt_map: {stmt_id: {"query": query_string, "num_params": int, "col_types": []}}
-stmt_map = {}
-# session_map: {(client_ip, client_port): MySQLSession}
-session_map = {}
-# pending_prepares: { (client_ip, client_port): query_string }
-pending_prepares = {}
+# reassembler: 방향별 TCP 스트림 재조립 → parse_mysql_payload 에는 완성된 MySQL 프레임만 전달
+reassembler = StreamReassembler()
+# [설정] 주문 규칙 파일 (테이블/지문 → 이벤트 type, 필드 매핑). 실행 중 수정하면 자동으로 다시 읽음 (--rules 로 변경)
+ORDER_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "order_rules.json")
+# 기본 결과셋 구독 대상인 주문 테이블
+ORDER_TABLES = ("tb_order", "tb_suborder")
+orders_found = 0
+# [설정] 결과셋 구독: 대상 테이블이 여기에 포함된 결과셋만 행을 디코딩/출력/기록 ("*" 이면 전부, --results 로 변경)
+#        메뉴/재고/설정 폴링 결과셋은 프레임 길이로만 건너뛰고 지문별 건너뛴 행/바이트 수만 집계합니다.
+result_tables = set(ORDER_TABLES)
+# [설정] SQL 로그를 남기지 않는 문장 종류 (커넥션 풀이 체크아웃마다 보내는 세션 설정/조회)
+QUIET_SQL_KINDS = ("set", "show")
+# 판단 기준(result_tables, 주문 규칙)이 바뀌면 증가 → 지문에 붙은 QueryPolicy 를 다시 계산
+policy_generation = 0
+# skipped_results: {digest: [결과셋 수, 행 수, 바이트 수, 정규화된 쿼리]}
+skipped_results = {}
+
+# 연결 단계: 핸드셰이크를 보지 못하고 중간에 합류한 연결은 바로 COMMAND
+PHASE_HANDSHAKE = "HANDSHAKE"   # 서버 greeting 수신, 클라이언트 응답 대기
+PHASE_AUTH = "AUTH"             # 인증 교환 중 (클라이언트 패킷은 명령이 아님)
+PHASE_COMMAND = "COMMAND"
+PHASE_OPAQUE = "OPAQUE"         # TLS/압축 협상: 해석할 수 없으므로 프레임 수만 셈
 
 class MySQLSession:
     def __init__(self):
@@ -75,7 +138,20 @@ class MySQLSession:
         self.cols_received = 0
         self.col_types = []
         self.rows_count = 0
+        self.rows_bytes = 0
         self.query = ""
+        self.skip_rows = False       # 구독하지 않는 결과셋: 행을 디코딩하지 않고 세기만 함
+        self.fp = None               # 현재 명령의 쿼리 지문
+        self.pending_order = None    # 응답(OK)을 기다리는 주문 INSERT: (role, type, 레코드 목록, meta)
+        # 핸드셰이크에서 얻은 연결 속성 (reset 에서 초기화하지 않음)
+        self.phase = PHASE_COMMAND
+        self.protocol_version = None
+        self.server_version = None
+        self.server_caps = 0
+        self.caps = None             # 협상된 capability (None: 핸드셰이크를 보지 못함)
+        self.charset = None
+        # None 이면 첫 결과셋에서 컬럼 정의 뒤 EOF 유무로 한 번 학습
+        self.deprecate_eof = None
 
     def reset(self, new_tx=True):
         self.state = "IDLE"
@@ -84,48 +160,162 @@ class MySQLSession:
         self.cols_received = 0
         self.col_types = []
         self.rows_count = 0
+        self.rows_bytes = 0
+        self.skip_rows = False
+        self.fp = None
+        self.pending_order = None
         if new_tx:
-            self.tx_id = str(uuid.uuid4())[:8]
+            self.tx_id = next_tx_id()
+
+    def has_cap(self, flag):
+        return self.caps is not None and bool(self.caps & flag)
+
+def release_connection(conn):
+    """연결이 정리되면 양방향 재조립 흐름과 조립 중인 주문도 함께 정리"""
+    (c_ip, c_port), (s_ip, s_port) = conn.key, conn.server
+    reassembler.close_flow((c_ip, c_port, s_ip, s_port))
+    reassembler.close_flow((s_ip, s_port, c_ip, c_port))
+    assembler.close(conn.key)
+
+def emit_order(order, meta, reason):
+    """조립이 끝난 주문 하나(헤더 + 상세)를 ORDER 이벤트로 기록"""
+    global orders_found
+    orders_found += 1
+    src_str, dst_str, tx_id, (captured, framed) = meta
+    key = order_key(order["type"], order["order"], order_rules.current.key_fields(order["type"]),
+                    f"{src_str}-{dst_str}", order["items"], order["sequence"])
+    header = order["order"] or {}
+    # 단계 시각 (order_trace.py 참고): capture/frame 은 주문 첫 레코드의 것, enqueue 는 emit_event 에서 (샤딩 모드는 싱크 도착 시각)
+    trace = {"capture": captured} if captured is not None else {}
+    trace["frame"] = framed
+    trace["parse"] = time.time()
+    log_event("ORDER", src_str, dst_str,
+              f"Order Detected: {order['type']} seat={header.get('seat_no')} total={header.get('total_price')} items={len(order['items'])}",
+              tx_id=tx_id, extra={"type": order["type"], "order": order["order"], "items": order["items"], "commit": reason,
+                                  "order_key": key, "trace": trace})
+
+# assembler: 연결별로 주문 INSERT 를 모아 COMMIT(또는 autocommit 주문 완료) 시 주문 하나당 ORDER 이벤트 하나 (order_assembly.py 참고)
+assembler = OrderAssembler(emit_order)
+
+# dedup: 재전송/POS 재시도로 두 번 잡힌 주문을 출력/기록 전에 버림 (emit_event 에서 확인 → 샤딩 모드에서는 싱크 한 곳, order_dedup.py 참고)
+dedup = DedupWindow()
 
-# 비동기 로깅을 위한 큐와 워커 설정
+# registry: {(client_ip, client_port): Connection(session, statements, pending_prepare)}
+# Statement ID 는 연결마다 따로 매겨지므로 연결 단위로 보관 (LRU 상한 + 유휴 만료, session_registry.py 참고)
+registry = SessionRegistry(MySQLSession, on_close=release_connection)
+
+# 비동기 로깅을 위한 큐와 워커 설정: 항목은 (msg_type, data), ("FLUSH", Event) 는 flush 후 알림, ("EXIT", "") 는 종료
 log_queue = queue.Queue()
+log_writer = JsonlWriter(LOG_DIR)
+# 터미널 출력은 전용 스레드가 담당: 캡처 경로는 대기열에 넣기만 하고 파이프가 밀려도 멈추지 않음 (console_writer.py 참고)
+console = ConsoleWriter(levels=CONSOLE_LEVELS, units={"SQL": "statements", "DATA": "rows", "ORDER": "orders"})
+# [샤딩 모드] 파서 워커 프로세스에서는 이벤트를 싱크 프로세스 큐로 넘김 (None: 이 프로세스에서 직접 출력/기록)
+event_sink = None
+
+# [메트릭] 캡처 경로 카운터는 .value += n 한 번으로 갱신 (metrics.py 참고). 다른 곳에 이미 있는 값은 조회 때 콜백으로 읽음
+packets_seen = metrics.registry.counter("sniffer_packets_total", "Frames received from the capture source")
+bytes_seen = metrics.registry.counter("sniffer_bytes_total", "Bytes of frames received from the capture source")
+mysql_frames = metrics.registry.counter("sniffer_mysql_frames_total", "Reassembled MySQL frames parsed")
+parse_errors = metrics.registry.counter("sniffer_parse_errors_total", "Packets dropped by a decode/parse exception")
+event_counts = {msg_type: metrics.registry.counter("sniffer_events_total", "Events emitted by type", {"type": msg_type})
+                for msg_type in LOG_STREAMS}
+log_batches = metrics.registry.histogram("sniffer_log_batch_events", "Events written per logging worker batch",
+                                         buckets=(1, 10, 100, 500, LOG_BATCH))
+metrics.registry.gauge("sniffer_log_queue_depth", "Events waiting for the JSONL logging worker", fn=log_queue.qsize)
+metrics.registry.gauge("sniffer_console_backlog", "Lines waiting for the console writer", fn=lambda: len(console.lines))
+metrics.registry.counter("sniffer_console_dropped_total", "Console lines dropped because output fell behind",
+                         fn=lambda: console.dropped)
+metrics.registry.counter("sniffer_orders_deduplicated_total", "Duplicate orders dropped by the dedup window",
+                         fn=lambda: dedup.hits)
+metrics.registry.gauge("sniffer_sessions", "Tracked MySQL connections", fn=lambda: len(registry.connections))
+
+def console_log(level, message, kind="LOG"):
+    """캡처 경로에서 나오는 요약/경고는 print 대신 터미널 출력 스레드로 넘김 (파이프가 밀려도 파싱이 멈추지 않음)"""
+    console.write(kind, f"[*] {message}" if level == "INFO" else f"[{level}] {message}")
+
+def trace_log(level, message):
+    console_log(level, message, "LATENCY")
+
+# 주문 단계별 지연(캡처 → 프레임 → 파싱 → 로그 큐) 집계와 예산 초과 주문 출력 (order_trace.py 참고)
+tracer = OrderTracer(log=trace_log)
 
 def logging_worker():
-    """JSONL 형식을 지원하는 비동기 로깅 워커"""
+    """
+    JSONL 형식을 지원하는 비동기 로깅 워커.
+    큐에 쌓인 이벤트를 최대 LOG_BATCH 개씩 꺼내 스트림별 writelines 한 번으로 쓰고, 크기/시간 기준으로 flush 합니다.
+    """
     print("[*] Logging worker thread started.")
-    while True:
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    running = True
+    while running:
         try:
-            msg_type, data = log_queue.get()
-            if msg_type == "EXIT":
+            # 버퍼에 쓴 것이 있으면 FLUSH_INTERVAL 안에 깨어나 flush
+            batch = [log_queue.get(timeout=log_writer.flush_interval if log_writer.dirty else None)]
+        except queue.Empty:
+            log_writer.flush()
+            continue
+        while len(batch) < LOG_BATCH:
+            try:
+                batch.append(log_queue.get_nowait())
+            except queue.Empty:
                 break
-            
-            # 파일 경로 결정
-            if msg_type == "SQL": filename = SQL_LOG_FILE
-            elif msg_type == "DATA": filename = DATA_LOG_FILE
-            elif msg_type == "ORDER": filename = ORDER_LOG_FILE
-            else: filename = os.path.join(LOG_DIR, "error.jsonl")
-
-            # JSONL 기록
-            with open(filename, "a", encoding="utf-8") as f:
-                f.write(json.dumps(data, ensure_ascii=False) + "\n")
-            
-            log_queue.task_done()
+        log_batches.observe(len(batch))
+        lines = {}
+        waiters = []
+        for msg_type, data in batch:
+            if msg_type == "FLUSH":
+                waiters.append(data)
+            elif msg_type == "EXIT":
+                running = False
+            else:
+                try:
+                    lines.setdefault(LOG_STREAMS.get(msg_type, "error"), []).append(encode(data) + "\n")
+                except Exception as e:
+                    print(f"[LOG ERROR] {e}")
+        try:
+            for stream, stream_lines in lines.items():
+                log_writer.write(stream, stream_lines)
+            if waiters or not running:
+                log_writer.flush()
+            else:
+                log_writer.maybe_flush()
         except Exception as e:
             print(f"[LOG ERROR] {e}")
+        for waiter in waiters:
+            waiter.set()
+        for _ in batch:
+            log_queue.task_done()
+    log_writer.close()
+
+def flush_logs():
+    """지금까지 큐에 넣은 로그가 파일에 기록(flush)될 때까지 대기"""
+    done = threading.Event()
+    log_queue.put(("FLUSH", done))
+    done.wait()
+
+def close_logs():
+    """남은 로그를 기록하고 파일을 닫은 뒤 로깅 스레드 종료를 기다림 (닫힌 조각 압축 포함)"""
+    log_queue.put(("EXIT", ""))
+    log_thread.join()
 
 # 로깅 스레드 시작
-threading.Thread(target=logging_worker, daemon=True).start()
+log_thread = threading.Thread(target=logging_worker, daemon=True)
+log_thread.start()
 
-def get_micro_timestamp():
-    """마이크로초 단위 타임스탬프 반환"""
-    return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+# 지금 처리 중인 패킷의 캡처 시각(epoch 초). 캡처 루프가 패킷마다 갱신하며 이벤트 ts 는 파싱한 시각이 아닌 이 값
+# (재생과 유휴 만료/주문 조립 타임아웃의 시계로도 사용)
+capture_now = [0.0]
+# 재조립으로 완성된 프레임이 파서에 도착한 시각(epoch 초) / 캡처 시각이 벽시계 기준인지 (라이브 캡처만, 재생 파일 시각은 지연 계산에서 제외)
+frame_now = [0.0]
+capture_live = False
+
+def trace_stamps():
+    """지금 레코드의 (캡처 시각 또는 None, 프레임 도착 시각). 조립기 meta 에 실어 주문 trace 를 첫 레코드 기준으로 만듦"""
+    return (capture_now[0] if capture_live else None, frame_now[0])
 
-def normalize_query(query):
-    """SQL 쿼리 정규화: 특수문자([], `) 제거 및 공백 정규화, 소문자화"""
-    if not query: return ""
-    query = re.sub(r'[\[\]`]', '', query)
-    query = re.sub(r'\s+', ' ', query).strip()
-    return query.lower()
+def get_micro_timestamp():
+    """현재 패킷의 캡처 시각을 마이크로초 단위 문자열로 (캡처 전이면 현재 시각)"""
+    return format_timestamp(capture_now[0] or time.time())
 
 def read_lenenc_int(data, offset):
     if offset >= len(data): return 0, 0
@@ -134,103 +324,297 @@ def read_lenenc_int(data, offset):
         return first, 1
     elif first == 252:
         if offset + 3 > len(data): return 0, 0
-        return struct.unpack('<H', data[offset+1:offset+3])[0], 3
+        return _S_U16.unpack_from(data, offset+1)[0], 3
     elif first == 253:
         if offset + 4 > len(data): return 0, 0
-        return struct.unpack('<I', data[offset+1:offset+4] + b'\x00')[0], 4
+        lo, hi = _S_U24.unpack_from(data, offset+1)
+        return lo | (hi << 16), 4
     elif first == 254:
         if offset + 9 > len(data): return 0, 0
-        return struct.unpack('<Q', data[offset+1:offset+9])[0], 9
+        return _S_U64.unpack_from(data, offset+1)[0], 9
     return 0, 1
 
 def read_lenenc_str(data, offset):
+    """length-encoded 문자열: memoryview 에서 바로 디코딩하여 중간 bytes 를 만들지 않음"""
     length, size = read_lenenc_int(data, offset)
     if size == 0: return None, 0
     offset += size
-    if offset + length > len(data):
-        return data[offset:].decode('utf-8', 'ignore'), size + (len(data) - offset)
-    val = data[offset : offset + length].decode('utf-8', 'ignore')
-    return val, size + length
+    end = offset + length
+    if end > len(data): end = len(data)
+    return _utf8_decode(data[offset:end], 'ignore')[0], size + (end - offset)
+
+def skip_lenenc_str(data, offset):
+    """출력하지 않는 필드(컬럼 정의 등)는 디코딩 없이 길이만 건너뜀"""
+    length, size = read_lenenc_int(data, offset)
+    if size == 0: return 0
+    return size + min(length, len(data) - offset - size)
 
 def parse_text_resultset_row(data, offset, col_count):
     values = []
+    append = values.append
+    data_len = len(data)
     for _ in range(col_count):
-        if offset >= len(data): break
-        if data[offset] == 0xFB: # NULL
-            values.append(None)
+        if offset >= data_len: break
+        first = data[offset]
+        if first == 0xFB: # NULL
+            append(None)
             offset += 1
+        elif first < 251:
+            # 대부분의 컬럼 값은 1바이트 길이: read_lenenc_str 호출 없이 바로 디코딩
+            end = offset + 1 + first
+            append(_utf8_decode(data[offset+1:end], 'ignore')[0])
+            offset = end if end < data_len else data_len
         else:
             val, size = read_lenenc_str(data, offset)
-            values.append(val)
+            append(val)
             offset += size
     return values, offset
 
+# [바이너리 프로토콜 타입] 파라미터/컬럼 타입 코드 = 타입 바이트 | (unsigned 이면 0x8000)
+UNSIGNED_CODE = 0x8000
+UNSIGNED_FLAG = 0x20   # 컬럼 정의의 flags 비트
+_S_DATE = struct.Struct('<HBB')
+_S_HMS = struct.Struct('<BBB')
+_S_TIME = struct.Struct('<BIBBB')
+
+def _fixed_reader(st):
+    unpack_from = st.unpack_from
+    size = st.size
+    def read(data, offset):
+        return unpack_from(data, offset)[0], offset + size
+    return read
+
+def _read_null(data, offset):
+    return None, offset
+
+def _read_string(data, offset):
+    val, size = read_lenenc_str(data, offset)
+    return val, offset + size
+
+def _read_lenenc_bytes(data, offset):
+    length, size = read_lenenc_int(data, offset)
+    start = offset + size
+    return data[start:start + length], start + length
+
+def _read_bit(data, offset):
+    raw, offset = _read_lenenc_bytes(data, offset)
+    return int.from_bytes(raw, 'big'), offset
+
+def _read_hex(data, offset):
+    raw, offset = _read_lenenc_bytes(data, offset)
+    return raw.hex(), offset
+
+def _read_date(data, offset):
+    """DATE: 길이(0/4/7/11) + year u16, month, day (시각 부분은 무시)"""
+    length = data[offset]
+    if length == 0:
+        return "0000-00-00", offset + 1
+    year, month, day = _S_DATE.unpack_from(data, offset + 1)
+    return f"{year:04d}-{month:02d}-{day:02d}", offset + 1 + length
+
+def _read_datetime(data, offset):
+    """DATETIME/TIMESTAMP: 길이(0/4/7/11) + year u16, month, day [+ hour, minute, second [+ microsecond u32]]"""
+    length = data[offset]
+    if length == 0:
+        return "0000-00-00 00:00:00", offset + 1
+    year, month, day = _S_DATE.unpack_from(data, offset + 1)
+    hour = minute = second = 0
+    if length >= 7:
+        hour, minute, second = _S_HMS.unpack_from(data, offset + 5)
+    text = f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+    if length >= 11:
+        text += f".{_S_U32.unpack_from(data, offset + 8)[0]:06d}"
+    return text, offset + 1 + length
+
+def _read_time(data, offset):
+    """TIME: 길이(0/8/12) + is_negative, days u32, hour, minute, second [+ microsecond u32] → '[-]HHH:MM:SS[.ffffff]'"""
+    length = data[offset]
+    if length == 0:
+        return "00:00:00", offset + 1
+    negative, days, hour, minute, second = _S_TIME.unpack_from(data, offset + 1)
+    text = f"{'-' if negative else ''}{days * 24 + hour:02d}:{minute:02d}:{second:02d}"
+    if length >= 12:
+        text += f".{_S_U32.unpack_from(data, offset + 9)[0]:06d}"
+    return text, offset + 1 + length
+
+def _read_unknown(data, offset):
+    val, size = read_lenenc_str(data, offset)
+    if val is None:
+        return f"Hex:{data[offset:offset+4].hex()}", offset + 4
+    return val, offset + size
+
+# 타입 바이트 → (이름, 고정 길이 struct 포맷 또는 None, 가변 길이 reader)
+# DECIMAL/NEWDECIMAL 은 서버가 보낸 10진 문자열 그대로 (가격의 정밀도 보존, JSONL 로 그대로 기록 가능)
+_TYPE_SPECS = {
+    0x00: ("DECIMAL", None, _read_string),
+    0x01: ("TINY", 'b', None),
+    0x02: ("SHORT", 'h', None),
+    0x03: ("LONG", 'i', None),
+    0x04: ("FLOAT", 'f', None),
+    0x05: ("DOUBLE", 'd', None),
+    0x06: ("NULL", None, _read_null),
+    0x07: ("TIMESTAMP", None, _read_datetime),
+    0x08: ("LONGLONG", 'q', None),
+    0x09: ("INT24", 'i', None),
+    0x0a: ("DATE", None, _read_date),
+    0x0b: ("TIME", None, _read_time),
+    0x0c: ("DATETIME", None, _read_datetime),
+    0x0d: ("YEAR", 'H', None),
+    0x0e: ("NEWDATE", None, _read_date),
+    0x0f: ("VARCHAR", None, _read_string),
+    0x10: ("BIT", None, _read_bit),
+    0x11: ("TIMESTAMP2", None, _read_datetime),
+    0x12: ("DATETIME2", None, _read_datetime),
+    0x13: ("TIME2", None, _read_time),
+    0xf2: ("VECTOR", None, _read_hex),
+    0xf4: ("BOOL", 'b', None),
+    0xf5: ("JSON", None, _read_string),
+    0xf6: ("NEWDECIMAL", None, _read_string),
+    0xf7: ("ENUM", None, _read_string),
+    0xf8: ("SET", None, _read_string),
+    0xf9: ("TINY_BLOB", None, _read_string),
+    0xfa: ("MEDIUM_BLOB", None, _read_string),
+    0xfb: ("LONG_BLOB", None, _read_string),
+    0xfc: ("BLOB", None, _read_string),
+    0xfd: ("VAR_STRING", None, _read_string),
+    0xfe: ("STRING", None, _read_string),
+    0xff: ("GEOMETRY", None, _read_hex),
+}
+
+# BINARY_DECODERS: 타입 코드(unsigned 포함) → (이름, 고정 길이 포맷 문자, reader). 모듈 로드 시 한 번 생성하므로 디스패치는 dict 조회 한 번
+BINARY_DECODERS = {}
+for _type, (_name, _fmt, _reader) in _TYPE_SPECS.items():
+    for _unsigned in (False, True):
+        _f = _fmt.upper() if _unsigned and _fmt in ('b', 'h', 'i', 'q') else _fmt
+        BINARY_DECODERS[_type | (UNSIGNED_CODE if _unsigned else 0)] = (
+            ("UNSIGNED " if _unsigned and _f != _fmt else "") + _name,
+            _f,
+            _reader if _f is None else _fixed_reader(struct.Struct('<' + _f)))
+del _type, _name, _fmt, _reader, _unsigned, _f
+_UNKNOWN_DECODER = (None, None, _read_unknown)
+
 def get_mysql_type_name(t):
-    types = {0x00: "DECIMAL", 0x01: "TINY", 0x02: "SHORT", 0x03: "LONG", 0x04: "FLOAT", 0x05: "DOUBLE", 0x08: "LONGLONG", 0x0c: "DATETIME", 0x0f: "VARCHAR", 0xfc: "BLOB", 0xfd: "VAR_STRING", 0xfe: "STRING"}
-    return types.get(t, f"0x{t:02x}")
+    entry = BINARY_DECODERS.get(t)
+    return entry[0] if entry else f"0x{t:02x}"
 
-def parse_binary_values(data, offset, num_params, param_types):
+def decode_binary_fields(data, offset, codes, bitmap_off, bit_shift):
+    """
+    타입 코드 목록대로 값을 읽음. NULL 비트맵(bitmap_off 부터, bit_shift 비트 오프셋)에 표시된 값은 None (값 영역에 데이터 없음).
+    잘린 값은 '<Error>' 후 중단
+    """
     values = []
-    if offset >= len(data): return values
-    
+    append = values.append
+    get = BINARY_DECODERS.get
     try:
-        # Null bitmap: (num_params + 7 + 2) // 8? EXECUTE: (num_params + 7) // 8
-        null_bitmap_len = (num_params + 7) // 8
-        if offset + null_bitmap_len > len(data): return values
-        null_bitmap = data[offset : offset + null_bitmap_len]
-        offset += null_bitmap_len
-        
-        # New parameters bound flag
-        if offset >= len(data): return values
-        new_params_bound = data[offset]
-        offset += 1
-        
-        if new_params_bound:
-            # Re-parse parameter types if flag is set
-            param_types = []
-            for _ in range(num_params):
-                if offset + 2 > len(data): break
-                p_type = struct.unpack('<H', data[offset:offset+2])[0]
-                param_types.append(p_type & 0xFF)
-                offset += 2
-
-        for i in range(num_params):
-            if i < len(param_types):
-                p_type = param_types[i]
-                byte_idx = i // 8
-                bit_idx = i % 8
-                if byte_idx < len(null_bitmap) and (null_bitmap[byte_idx] & (1 << bit_idx)):
-                    values.append(None)
-                    continue
+        for i, code in enumerate(codes, bit_shift):
+            if data[bitmap_off + (i >> 3)] & (1 << (i & 7)):
+                append(None)
+            else:
+                val, offset = get(code, _UNKNOWN_DECODER)[2](data, offset)
+                append(val)
+    except (struct.error, IndexError, ValueError):
+        append("<Error>")
+    return values
 
-                try:
-                    if p_type in [0x01]: # TINY
-                        val = struct.unpack('<b', data[offset:offset+1])[0]; values.append(val); offset += 1
-                    elif p_type in [0x02]: # SHORT
-                        val = struct.unpack('<h', data[offset:offset+2])[0]; values.append(val); offset += 2
-                    elif p_type in [0x03]: # LONG
-                        val = struct.unpack('<i', data[offset:offset+4])[0]; values.append(val); offset += 4
-                    elif p_type in [0x08]: # LONGLONG
-                        val = struct.unpack('<q', data[offset:offset+8])[0]; values.append(val); offset += 8
-                    elif p_type in [0x04]: # FLOAT
-                        val = struct.unpack('<f', data[offset:offset+4])[0]; values.append(val); offset += 4
-                    elif p_type in [0x05]: # DOUBLE
-                        val = struct.unpack('<d', data[offset:offset+8])[0]; values.append(val); offset += 8
-                    elif p_type in [0x0f, 0xfc, 0xfd, 0xfe]: # STRING/VAR_STRING/BLOB
-                        val, size = read_lenenc_str(data, offset)
-                        values.append(val)
-                        offset += size
-                    else:
-                        val, size = read_lenenc_str(data, offset)
-                        values.append(val if val is not None else f"Hex:{data[offset:offset+4].hex()}")
-                        offset += size if size > 0 else 4
-                except Exception:
-                    values.append("<Error>")
-    except Exception as e:
-        print(f"[PARSE ERROR] {e}")
-        
+def parse_binary_values(data, offset, num_params, param_types):
+    """
+    COM_STMT_EXECUTE 파라미터 (NULL 비트맵 + new_params_bound [+ 타입 목록] + 값).
+    param_types: 패킷에 타입이 없을 때 사용할 타입 코드 목록
+    """
+    if offset >= len(data): return []
+    null_bitmap_len = (num_params + 7) // 8
+    if offset + null_bitmap_len >= len(data): return []
+    null_bitmap_off = offset
+    offset += null_bitmap_len
+    new_params_bound = data[offset]
+    offset += 1
+    if new_params_bound:
+        param_types = [_S_U16.unpack_from(data, offset + 2 * i)[0] & 0x80FF
+                       for i in range(num_params) if offset + 2 * i + 2 <= len(data)]
+        offset += 2 * num_params
+    return decode_binary_fields(data, offset, param_types[:num_params], null_bitmap_off, 0)
+
+def parse_binary_row(data, col_count, col_types):
+    """바이너리 결과셋 행: 0x00 헤더 + NULL 비트맵(2비트 오프셋) + 값"""
+    bitmap_len = (col_count + 9) // 8
+    if 1 + bitmap_len > len(data): return []
+    return decode_binary_fields(data, 1 + bitmap_len, col_types[:col_count], 1, 2)
+
+# Statement 당 보관할 플랜 수 (NULL 비트맵 조합마다 하나)
+MAX_PLANS_PER_STMT = 16
+
+def build_param_plan(signature, null_bitmap, num_params):
+    """
+    (타입 시그니처, NULL 비트맵) 에 대한 디코더 플랜: (Struct, None) 또는 (None, reader) 단계의 튜플.
+    NULL 이 아닌 고정 길이 파라미터가 연속되면 하나의 Struct 로 합쳐 unpack_from 한 번에 읽습니다.
+    """
+    steps = []
+    fmt = ""
+    for i in range(num_params):
+        if null_bitmap[i >> 3] & (1 << (i & 7)):
+            reader = _read_null
+        else:
+            code = (signature[2 * i] | (signature[2 * i + 1] << 8)) & 0x80FF
+            _name, code_fmt, reader = BINARY_DECODERS.get(code, _UNKNOWN_DECODER)
+            if code_fmt is not None:
+                fmt += code_fmt
+                continue
+        if fmt:
+            steps.append((struct.Struct('<' + fmt), None))
+            fmt = ""
+        steps.append((None, reader))
+    if fmt:
+        steps.append((struct.Struct('<' + fmt), None))
+    return tuple(steps)
+
+def run_param_plan(plan, data, offset):
+    values = []
+    extend = values.extend
+    append = values.append
+    try:
+        for fixed, reader in plan:
+            if fixed is not None:
+                extend(fixed.unpack_from(data, offset))
+                offset += fixed.size
+            else:
+                val, offset = reader(data, offset)
+                append(val)
+    except (struct.error, IndexError, ValueError):
+        # 잘린 패킷: 읽은 값까지만 반환
+        append("<Error>")
     return values
 
+def parse_execute_params(mysql_data, stmt_info):
+    """
+    COM_STMT_EXECUTE 파라미터를 Statement 에 캐시된 디코더 플랜으로 해석.
+    new_params_bound 로 타입이 바뀐 경우에만 플랜을 버리고, 타입을 보내지 않는 EXECUTE 는 직전 타입을 재사용합니다.
+    """
+    num_params = stmt_info['num_params']
+    if not num_params: return []
+    offset = 10
+    bitmap_len = (num_params + 7) // 8
+    if offset + bitmap_len >= len(mysql_data): return []
+    null_bitmap = bytes(mysql_data[offset:offset + bitmap_len])
+    offset += bitmap_len
+    new_params_bound = mysql_data[offset]
+    offset += 1
+    if new_params_bound:
+        signature = bytes(mysql_data[offset:offset + 2 * num_params])
+        offset += 2 * num_params
+        if signature != stmt_info.get('param_types'):
+            stmt_info['param_types'] = signature
+            stmt_info['plans'] = {}
+    signature = stmt_info.get('param_types')
+    if not signature or len(signature) < 2 * num_params: return []
+
+    plans = stmt_info['plans']
+    plan = plans.get(null_bitmap)
+    if plan is None:
+        if len(plans) >= MAX_PLANS_PER_STMT:
+            plans.clear()
+        plan = plans[null_bitmap] = build_param_plan(signature, null_bitmap, num_params)
+    return run_param_plan(plan, mysql_data, offset)
+
 def log_event(msg_type, src, dst, summary, tx_id=None, extra=None):
     """구조화된 로그 생성 및 큐 전송"""
     ts = get_micro_timestamp()
@@ -243,14 +627,28 @@ def log_event(msg_type, src, dst, summary, tx_id=None, extra=None):
     }
     if extra:
         log_data.update(extra)
-    
-    # 터미널 출력 (가독성용)
-    display_msg = f"[{ts}] [{src}] [Tx:{tx_id}] {summary}"
+
+    if event_sink is not None:
+        # [샤딩 워커] 출력/기록은 싱크 프로세스 한 곳에서 수행
+        event_sink.put((msg_type, log_data))
+        return
+    emit_event(msg_type, log_data)
+
+def emit_event(msg_type, log_data):
+    """터미널 출력 및 JSONL 로깅 큐 전송"""
     if msg_type == "ORDER":
-        print(f"\033[92m{display_msg}\033[0m", flush=True)
+        if dedup.seen(log_data["order_key"]):
+            return
+        trace = log_data["trace"]
+        trace["enqueue"] = time.time()
+        tracer.record(trace, f"tx_id={log_data['tx_id']}")
+    event_counts[msg_type].value += 1
+    # 터미널 출력 (가독성용): 출력 수준이 show 인 종류만 줄을 만들고 나머지는 개수만
+    if console.shows(msg_type):
+        display_msg = f"[{log_data['ts']}] [{log_data['src']}] [Tx:{log_data['tx_id']}] {log_data['summary']}"
+        console.write(msg_type, f"\033[92m{display_msg}\033[0m" if msg_type == "ORDER" else display_msg)
     else:
-        print(display_msg, flush=(msg_type == "DATA"))
-        
+        console.suppress(msg_type)
     log_queue.put((msg_type, log_data))
 
 def find_loopback_adapter():
@@ -260,69 +658,340 @@ def find_loopback_adapter():
         name = iface.get('name', '')
         if "Npcap Loopback Adapter" in desc or "Loopback" in name:
             return iface['name']
+    if sys.platform.startswith("linux"):
+        # Linux 테스트/엣지 환경의 루프백
+        return "lo"
     return None
 
+def _null_terminated(data, offset):
+    end = offset
+    size = len(data)
+    while end < size and data[end]:
+        end += 1
+    return str(data[offset:end], 'utf-8', 'ignore'), end + 1
+
+def handle_server_greeting(session, data):
+    """Initial Handshake (서버 → 클라이언트, seq 0): 프로토콜 버전, 서버 버전, 서버 capability"""
+    session.reset(new_tx=True)
+    session.phase = PHASE_HANDSHAKE
+    session.protocol_version = data[0]
+    session.server_version, off = _null_terminated(data, 1)
+    off += 4 + 8 + 1   # connection id, auth-plugin-data-part-1, filler
+    caps = _S_U16.unpack_from(data, off)[0] if off + 2 <= len(data) else 0
+    if off + 7 <= len(data):
+        session.charset = data[off + 2]
+        caps |= _S_U16.unpack_from(data, off + 5)[0] << 16
+    session.server_caps = caps
+    session.caps = None
+    session.deprecate_eof = None
+
+def handle_handshake_response(session, data):
+    """
+    Handshake Response (클라이언트 → 서버, seq 1): 협상된 capability, 문자셋, 사용자.
+    SSLRequest 이거나 압축을 협상하면 이후 스트림은 해석하지 않습니다. 사용자 이름을 반환.
+    """
+    if len(data) < 4:
+        session.caps = 0
+        session.phase = PHASE_AUTH
+        return None
+    caps = _S_U32.unpack_from(data, 0)[0] if _S_U16.unpack_from(data, 0)[0] & CLIENT_PROTOCOL_41 else _S_U16.unpack_from(data, 0)[0]
+    if session.server_caps:
+        caps &= session.server_caps
+    session.caps = caps
+    session.deprecate_eof = bool(caps & CLIENT_DEPRECATE_EOF)
+    if len(data) >= 9:
+        session.charset = data[8]
+    if caps & CLIENT_SSL and len(data) <= 32:
+        session.phase = PHASE_OPAQUE
+        return None
+    session.phase = PHASE_AUTH
+    user, _ = _null_terminated(data, 32) if len(data) > 32 else (None, 0)
+    return user
+
+def result_status(data, deprecate_eof):
+    """결과셋/명령 종료 패킷(EOF 또는 OK)의 status 플래그"""
+    if data[0] == 0xfe and not deprecate_eof and len(data) >= 5:
+        return _S_U16.unpack_from(data, 3)[0]
+    off = 1
+    off += read_lenenc_int(data, off)[1]   # affected_rows
+    off += read_lenenc_int(data, off)[1]   # last_insert_id
+    return _S_U16.unpack_from(data, off)[0] if off + 2 <= len(data) else 0
+
+def finish_columns(conn, session):
+    """컬럼 정의가 끝남: DEPRECATE_EOF 면 바로 행, 아니면(또는 모르면) EOF 대기"""
+    if session.cmd == COM_STMT_EXECUTE and session.col_types:
+        # OPTIONAL_RESULTSET_METADATA 로 메타데이터가 생략될 때 재사용
+        stmt_info = conn.statements.get(session.stmt_id)
+        if stmt_info is not None:
+            stmt_info['col_types'] = session.col_types
+    session.state = "READING_ROWS" if session.deprecate_eof else "COLUMNS_EOF"
+
+class QueryPolicy:
+    """지문 하나에 대한 스니퍼의 판단: 결과셋 구독, 주문 규칙, SQL 로그 여부"""
+    __slots__ = ("generation", "interested", "order_rule", "log_sql")
+
+    def __init__(self, fp):
+        self.generation = policy_generation
+        self.interested = "*" in result_tables or any(t in result_tables for t in fp.tables)
+        self.order_rule = order_rules.current.match(fp)
+        self.log_sql = fp.kind not in QUIET_SQL_KINDS
+
+def classify_query(query, fp=None):
+    """쿼리 텍스트 → (지문, 정책). 같은 텍스트는 지문 캐시의 dict 조회 한 번, 같은 지문은 정책 재사용 (fp: 이미 구한 지문)"""
+    if fp is None:
+        fp = fingerprint(query)
+    policy = fp.policy
+    if policy is None or policy.generation != policy_generation:
+        policy = fp.policy = QueryPolicy(fp)
+    return fp, policy
+
+def statement_order_plan(stmt_info, rule):
+    """
+    Statement 의 주문 필드 플랜. PREPARE 때 한 번 컴파일해 Statement 에 보관 (규칙이 다시 로드된 경우만 다시 컴파일)
+    필수 필드를 매핑할 수 없으면 None: 빈 값뿐인 주문을 내보내지 않고 경고는 컴파일 때 한 번만 출력
+    """
+    cached = stmt_info['order_plan']
+    if cached is not None and cached[0] is rule:
+        return cached[1]
+    plan, missing = rule.compile(stmt_info['query'])
+    if missing:
+        console_log("WARNING", f"{rule.type} statement skipped, no column for {', '.join(missing)}: {stmt_info['query'][:80]}")
+        plan = None
+    stmt_info['order_plan'] = (rule, plan)
+    return plan
+
+def literal_order_plan(rule, literals):
+    """
+    리터럴 INSERT/UPDATE 의 주문 필드 플랜. 지문 레코드의 literal_plan 자리에 (규칙, 플랜)으로 보관하고 규칙이 바뀐 경우만 다시 컴파일
+    필수 필드를 컬럼 이름이나 규칙의 param 위치로 찾을 수 없으면(컬럼 목록 없는 INSERT 등) None 이며, 경고는 지문마다 한 번
+    """
+    fp = literals.fp
+    cached = fp.literal_plan
+    if cached is not None and cached[0] is rule:
+        return cached[1]
+    plan, missing = rule.compile_columns(literals.columns)
+    if missing:
+        console_log("WARNING", f"{rule.type} statement skipped, no column for {', '.join(missing)}: {fp.normalized[:80]}")
+        plan = None
+    fp.literal_plan = (rule, plan)
+    return plan
+
+def invalidate_policies(*_):
+    """이미 계산된 정책은 다음 조회 때 다시 계산"""
+    global policy_generation
+    policy_generation += 1
+
+def set_subscriptions(tables):
+    """결과셋 구독 테이블 변경"""
+    result_tables.clear()
+    result_tables.update(t.lower() for t in tables)
+    invalidate_policies()
+
+# order_rules.current 는 감시 스레드가 통째로 교체하므로 파싱 경로는 항상 완전한 규칙 집합 하나를 봄
+order_rules = RuleFile(ORDER_RULES_FILE, on_reload=invalidate_policies)
+
+def load_order_rules(path=None, watch=False):
+    """주문 규칙 파일 로드. watch 면 파일이 바뀔 때마다 캡처를 멈추지 않고 다시 읽음"""
+    if path:
+        order_rules.path = path
+    order_rules.check()
+    if watch:
+        order_rules.watch()
+
+def end_result(conn, session, data):
+    """EOF/OK 종료: 다음 결과셋이 이어지면(SERVER_MORE_RESULTS_EXISTS) 같은 명령의 결과로 계속 대기"""
+    try:
+        status = result_status(data, session.deprecate_eof)
+    except (struct.error, IndexError):
+        status = None
+    more = status & SERVER_MORE_RESULTS_EXISTS if status is not None else 0
+    if session.skip_rows and session.col_count:
+        fp = session.fp
+        counters = skipped_results.get(fp.digest)
+        if counters is None:
+            counters = skipped_results[fp.digest] = [0, 0, 0, fp.normalized]
+        counters[0] += 1
+        counters[1] += session.rows_count
+        counters[2] += session.rows_bytes
+    if more:
+        session.state = "AWAITING_RESULTSET"
+        session.col_count = session.cols_received = 0
+        session.col_types = []
+        session.rows_count = session.rows_bytes = 0
+    else:
+        finish_statement(conn, session, status)
+        session.reset(new_tx=False)
+
+def finish_statement(conn, session, status):
+    """
+    명령이 성공으로 끝남: 주문 INSERT 면 레코드를 조립기에 넘기고,
+    status 에 SERVER_STATUS_IN_TRANS 가 꺼져 있으면 열려 있던 트랜잭션이 끝난 것 (ROLLBACK 문이면 롤백, 나머지는 커밋/암묵적 커밋)
+    """
+    in_tx = bool(status & SERVER_STATUS_IN_TRANS) if status is not None else False
+    if session.pending_order is not None:
+        role, rule_type, records, meta = session.pending_order
+        for record in records:
+            assembler.add(conn.key, role, rule_type, record, in_tx, meta)
+    if status is None or in_tx or conn.key not in assembler.pending:
+        return
+    if session.fp is not None and session.fp.kind == "rollback":
+        assembler.rollback(conn.key)
+    else:
+        assembler.commit(conn.key)
+
+def print_result_stats(limit=10):
+    """지문 캐시 통계와 구독하지 않아 건너뛴 결과셋 통계 (바이트 순)"""
+    stats = fingerprint.stats()
+    print(f"[*] Fingerprints: texts={stats['texts']:,}, digests={stats['digests']:,}, cache hits={stats['hits']:,}, misses={stats['misses']:,}")
+    stats = parse_literals.stats()
+    if stats['fast'] or stats['slow']:
+        print(f"[*] Literal DML: statements={stats['fast'] + stats['slow']:,} (single pass={stats['fast']:,}), rows={stats['rows']:,}")
+    if not skipped_results: return
+    print(f"[*] Skipped result sets (subscribed: {', '.join(sorted(result_tables))}):")
+    for digest, (sets, rows, size, text) in sorted(skipped_results.items(), key=lambda kv: -kv[1][2])[:limit]:
+        print(f"    {digest} result sets={sets:,} rows={rows:,} bytes={size:,}  {text[:60]}")
+
 def parse_mysql_payload(payload, src_info, dst_info, is_to_server):
+    """완성된 MySQL 프레임들을 해석하고 처리한 프레임 수를 반환"""
     src_str = f"{src_info[0]}:{src_info[1]}"
     dst_str = f"{dst_info[0]}:{dst_info[1]}"
     client_key = src_info if is_to_server else dst_info
-    
-    if client_key not in session_map:
-        session_map[client_key] = MySQLSession()
-    session = session_map[client_key]
+    conn = registry.get(client_key, dst_info if is_to_server else src_info)
+    session = conn.session
 
+    # 프레임 본문은 모두 하나의 memoryview 위의 슬라이스 (출력하는 필드만 str/int 로 만들어짐)
+    payload = memoryview(payload)
+    payload_len = len(payload)
     offset = 0
-    while offset + 4 <= len(payload):
-        pkt_len = struct.unpack('<I', payload[offset:offset+3] + b'\x00')[0]
-        seq_id = payload[offset+3]
+    frames = 0
+    while offset + 4 <= payload_len:
+        len_lo, len_hi, seq_id = MYSQL_HEADER.unpack_from(payload, offset)
+        pkt_len = len_lo | (len_hi << 16)
         mysql_data = payload[offset+4 : offset+4+pkt_len]
         offset += 4 + pkt_len
+        frames += 1
 
         if not mysql_data: continue
 
+        phase = session.phase
+        if phase != PHASE_COMMAND:
+            # 핸드셰이크/인증 단계의 패킷은 명령이나 결과셋이 아님
+            if phase == PHASE_HANDSHAKE and is_to_server:
+                user = handle_handshake_response(session, mysql_data)
+                summary = f"Connect: user={user} server={session.server_version} caps=0x{session.caps:08x} charset={session.charset}"
+                if session.phase == PHASE_OPAQUE:
+                    summary += " (TLS: not decodable)"
+                log_event("SQL", src_str, dst_str, summary, tx_id=session.tx_id,
+                          extra={"cmd": "CONNECT", "user": user, "caps": session.caps, "charset": session.charset})
+            elif phase == PHASE_AUTH and not is_to_server and mysql_data[0] in (0x00, 0xFF):
+                session.phase = PHASE_COMMAND
+                if session.has_cap(CLIENT_COMPRESS) or session.has_cap(CLIENT_ZSTD_COMPRESSION_ALGORITHM):
+                    session.phase = PHASE_OPAQUE
+                    console_log("WARNING", f"{src_str} -> {dst_str}: compressed protocol negotiated, connection not decodable")
+            continue
+
         if is_to_server:
             cmd = mysql_data[0]
             session.reset(new_tx=True)
             session.cmd = cmd
             
             if cmd == COM_QUERY:
-                query_raw = mysql_data[1:].decode('utf-8', 'ignore').strip()
+                query_raw = str(mysql_data[1:], 'utf-8', 'ignore').strip()
+                # INSERT/REPLACE ... VALUES 는 리터럴을 읽으면서 지문도 구함 (다중 행 텍스트 전체를 다시 정규화하지 않음)
+                literals = parse_literals(query_raw)
+                fp, policy = classify_query(query_raw, literals.fp if literals is not None else None)
+                fp.count += 1
                 session.query = query_raw
                 session.state = "AWAITING_RESULTSET"
-                log_event("SQL", src_str, dst_str, f"Query: {query_raw[:100]}", tx_id=session.tx_id, extra={"full_query": query_raw, "cmd": "QUERY"})
+                session.fp = fp
+                session.skip_rows = not policy.interested
+                if policy.log_sql:
+                    log_event("SQL", src_str, dst_str, f"Query: {query_raw[:100]}", tx_id=session.tx_id, extra={"full_query": query_raw, "cmd": "QUERY", "digest": fp.digest})
+                rule = policy.order_rule
+                if rule is not None and literals is not None and literals.rows:
+                    plan = literal_order_plan(rule, literals)
+                    if plan is not None:
+                        session.pending_order = (rule.role, rule.type, [build_order(plan, row) for row in literals.rows],
+                                                 (src_str, dst_str, session.tx_id, trace_stamps()))
                 
             elif cmd == COM_STMT_PREPARE:
-                query_raw = mysql_data[1:].decode('utf-8', 'ignore').strip()
-                pending_prepares[src_info] = query_raw
-                log_event("SQL", src_str, dst_str, f"Prepare: {query_raw[:100]}", tx_id=session.tx_id, extra={"full_query": query_raw, "cmd": "PREPARE"})
+                query_raw = str(mysql_data[1:], 'utf-8', 'ignore').strip()
+                conn.pending_prepare = query_raw
+                fp, policy = classify_query(query_raw)
+                if policy.log_sql:
+                    log_event("SQL", src_str, dst_str, f"Prepare: {query_raw[:100]}", tx_id=session.tx_id, extra={"full_query": query_raw, "cmd": "PREPARE", "digest": fp.digest})
 
             elif cmd == COM_STMT_EXECUTE:
                 if len(mysql_data) >= 5:
-                    stmt_id = struct.unpack('<I', mysql_data[1:5])[0]
+                    stmt_id = _S_U32.unpack_from(mysql_data, 1)[0]
                     session.stmt_id = stmt_id
-                    stmt_info = stmt_map.get(stmt_id)
+                    stmt_info = registry.get_statement(conn, stmt_id)
                     if stmt_info:
+                        fp = stmt_info['fp']
+                        policy = fp.policy
+                        if policy is None or policy.generation != policy_generation:
+                            _, policy = classify_query(stmt_info['query'])
+                        fp.count += 1
                         session.query = stmt_info['query']
                         session.state = "AWAITING_RESULTSET"
-                        params = parse_binary_values(mysql_data, 10, stmt_info['num_params'], [])
-                        log_event("SQL", src_str, dst_str, f"Execute ID:{stmt_id}", tx_id=session.tx_id, extra={"query": session.query, "params": params, "cmd": "EXECUTE"})
+                        session.fp = fp
+                        session.skip_rows = not policy.interested
+                        params = parse_execute_params(mysql_data, stmt_info)
+                        if policy.log_sql:
+                            log_event("SQL", src_str, dst_str, f"Execute ID:{stmt_id}", tx_id=session.tx_id, extra={"query": session.query, "params": params, "cmd": "EXECUTE", "digest": fp.digest})
+                        rule = policy.order_rule
+                        plan = statement_order_plan(stmt_info, rule) if rule is not None else None
+                        if plan is not None:
+                            # OK 응답을 받아야 성공한 INSERT (실패하면 ERR) → 응답의 트랜잭션 상태와 함께 조립기로
+                            session.pending_order = (rule.role, rule.type, [build_order(plan, params)],
+                                                     (src_str, dst_str, session.tx_id, trace_stamps()))
                     else:
                         log_event("SQL", src_str, dst_str, f"Unknown Execute ID: {stmt_id}", tx_id=session.tx_id)
             
             elif cmd == COM_STMT_CLOSE:
                 if len(mysql_data) >= 5:
-                    stmt_id = struct.unpack('<I', mysql_data[1:5])[0]
-                    stmt_map.pop(stmt_id, None)
+                    stmt_id = _S_U32.unpack_from(mysql_data, 1)[0]
+                    registry.close_statement(conn, stmt_id)
                     log_event("SQL", src_str, dst_str, f"Close ID: {stmt_id}", tx_id=session.tx_id)
 
+            elif cmd == COM_STMT_RESET:
+                # 서버 쪽 long data 버퍼만 비우는 명령: Statement 는 그대로 유지
+                if len(mysql_data) >= 5:
+                    stmt_id = _S_U32.unpack_from(mysql_data, 1)[0]
+                    log_event("SQL", src_str, dst_str, f"Reset ID: {stmt_id}", tx_id=session.tx_id)
+
+            elif cmd == COM_QUIT:
+                registry.close(client_key)
+                log_event("SQL", src_str, dst_str, "Quit", tx_id=session.tx_id)
+
         else:
             # Server to Client Response
             first_byte = mysql_data[0]
-            
-            if session.state == "AWAITING_RESULTSET":
+            state = session.state
+
+            if seq_id == 0 and first_byte in (0x09, 0x0a) and state == "IDLE":
+                # 서버 greeting: 새 연결의 핸드셰이크 시작
+                handle_server_greeting(session, mysql_data)
+                continue
+
+            if state == "COLUMNS_EOF":
+                # EOF 패킷은 정확히 5바이트, DEPRECATE_EOF 의 0xFE 헤더 OK 는 7바이트 이상
+                if first_byte == 0xfe and pkt_len == 5:
+                    if session.deprecate_eof is None:
+                        session.deprecate_eof = False
+                    session.state = "READING_ROWS"
+                    continue
+                # 컬럼 정의 뒤 EOF 가 없으면 DEPRECATE_EOF 연결 (핸드셰이크를 보지 못한 경우 여기서 한 번만 학습)
+                if session.deprecate_eof is None:
+                    session.deprecate_eof = True
+                state = session.state = "READING_ROWS"
+
+            if state == "AWAITING_RESULTSET":
                 if first_byte == 0x00: # OK Packet
-                    session.reset(new_tx=False)
+                    end_result(conn, session, mysql_data)
                 elif first_byte == 0xFF: # Error Packet
+                    if session.pending_order is not None:
+                        assembler.failed += 1
                     session.reset(new_tx=False)
                 else:
                     count, size = read_lenenc_int(mysql_data, 0)
@@ -330,73 +999,450 @@ def parse_mysql_payload(payload, src_info, dst_info, is_to_server):
                     session.state = "READING_COLUMNS"
                     session.cols_received = 0
                     session.col_types = []
+                    if session.has_cap(CLIENT_OPTIONAL_RESULTSET_METADATA) and size < len(mysql_data) and mysql_data[size] == 0:
+                        # RESULTSET_METADATA_NONE: 컬럼 정의 없이 행이 옴 → 직전에 받은 컬럼 타입 사용
+                        stmt_info = conn.statements.get(session.stmt_id) if session.cmd == COM_STMT_EXECUTE else None
+                        session.col_types = stmt_info['col_types'] if stmt_info else []
+                        finish_columns(conn, session)
 
-            elif session.state == "READING_COLUMNS":
-                if first_byte == 0xfe and pkt_len < 9:
-                    session.state = "READING_ROWS"
-                else:
-                    off = 0
-                    for _ in range(6):
-                        _, s = read_lenenc_str(mysql_data, off)
-                        off += s
-                    off += 1 + 2 + 4
-                    if off < len(mysql_data):
-                        col_type = mysql_data[off]
-                        session.col_types.append(col_type)
+            elif state == "READING_COLUMNS":
+                if session.skip_rows:
+                    # 구독하지 않는 결과셋: 컬럼 정의는 개수만 셈
+                    session.rows_bytes += pkt_len
                     session.cols_received += 1
+                    if session.cols_received >= session.col_count:
+                        finish_columns(conn, session)
+                    continue
+                # catalog, schema, table, org_table, name, org_name 은 출력하지 않으므로 길이만 건너뜀
+                off = 0
+                for _ in range(6):
+                    off += skip_lenenc_str(mysql_data, off)
+                # 고정 길이 필드: 0x0c, charset u16, column_length u32, type u8, flags u16, decimals u8
+                off += 1 + 2 + 4
+                if off + 3 <= len(mysql_data):
+                    col_type = mysql_data[off]
+                    if _S_U16.unpack_from(mysql_data, off + 1)[0] & UNSIGNED_FLAG:
+                        col_type |= UNSIGNED_CODE
+                    session.col_types.append(col_type)
+                session.cols_received += 1
+                if session.cols_received >= session.col_count:
+                    finish_columns(conn, session)
 
-            elif session.state == "READING_ROWS":
-                if first_byte == 0xfe and pkt_len < 9:
+            elif state == "READING_ROWS":
+                # 종료 패킷: EOF(5바이트) 또는 DEPRECATE_EOF 의 0xFE 헤더 OK. 0xFE 로 시작하는 행은 16MB 이상이어야 하므로 구분 가능
+                if first_byte == 0xfe and (pkt_len < 9 or (session.deprecate_eof and pkt_len < 0xFFFFFF)):
+                    end_result(conn, session, mysql_data)
+                    continue
+                if first_byte == 0xFF:
                     session.reset(new_tx=False)
-                elif first_byte == 0x00 and session.cmd == COM_STMT_EXECUTE:
-                    rows = parse_binary_values(mysql_data, 1, session.col_count, session.col_types)
+                    continue
+                session.rows_count += 1
+                session.rows_bytes += pkt_len
+                if session.skip_rows:
+                    continue
+                if first_byte == 0x00 and session.cmd == COM_STMT_EXECUTE:
+                    rows = parse_binary_row(mysql_data, session.col_count, session.col_types)
                     log_event("DATA", src_str, dst_str, f"Row: {rows}", tx_id=session.tx_id, extra={"rows": rows})
                 else:
                     row_data, _ = parse_text_resultset_row(mysql_data, 0, session.col_count)
                     log_event("DATA", src_str, dst_str, f"Row: {row_data}", tx_id=session.tx_id, extra={"rows": row_data})
 
             # Special case for COM_STMT_PREPARE response
-            if src_info in pending_prepares:
+            if conn.pending_prepare is not None:
                 if first_byte == 0x00 and len(mysql_data) >= 9:
-                    stmt_id = struct.unpack('<I', mysql_data[1:5])[0]
-                    num_params = struct.unpack('<H', mysql_data[7:9])[0]
-                    query = pending_prepares.pop(src_info)
-                    stmt_map[stmt_id] = {"query": query, "num_params": num_params, "col_types": []}
+                    stmt_id = _S_U32.unpack_from(mysql_data, 1)[0]
+                    num_params = _S_U16.unpack_from(mysql_data, 7)[0]
+                    query = conn.pending_prepare
+                    conn.pending_prepare = None
+                    fp, policy = classify_query(query)
+                    stmt_info = {"query": query, "num_params": num_params, "col_types": [], "param_types": None, "plans": {},
+                                 "fp": fp, "order_plan": None}
+                    if policy.order_rule is not None:
+                        statement_order_plan(stmt_info, policy.order_rule)
+                    registry.add_statement(conn, stmt_id, stmt_info)
                     log_event("SQL", src_str, dst_str, f"Prepare OK: ID {stmt_id}", tx_id=session.tx_id)
+    return frames
+
+def handle_segment(src_ip, sport, dst_ip, dport, seq, flags, payload):
+    """캡처 엔진 공통 진입점: 스트림을 재조립한 뒤 완성된 프레임만 방향에 맞춰 MySQL 파서로 전달하고 처리한 프레임 수를 반환"""
+    if dport == MYSQL_PORT: is_to_server = True
+    elif sport == MYSQL_PORT: is_to_server = False
+    else: return 0
+    frames = reassembler.feed((src_ip, sport, dst_ip, dport), seq, flags, payload)
+    if frames:
+        frame_now[0] = time.time()
+    count = parse_mysql_payload(frames, (src_ip, sport), (dst_ip, dport), is_to_server) if frames else 0
+    mysql_frames.value += count
+    if flags & (TCP_FIN | TCP_RST):
+        close_connection(src_ip, sport, dst_ip, dport, is_to_server)
+    if assembler.pending:
+        assembler.flush_expired()
+    return count
+
+def close_connection(src_ip, sport, dst_ip, dport, is_to_server):
+    """FIN/RST: 어느 방향이든 연결 종료로 보고 세션/Statement 상태를 제거"""
+    registry.close((src_ip, sport) if is_to_server else (dst_ip, dport))
+
+def print_session_stats():
+    stats = registry.stats()
+    print(f"[*] Sessions: live={stats['connections']:,}, statements={stats['statements']:,}, "
+          f"opened={stats['opened']:,}, closed={stats['closed']:,}, expired={stats['expired']:,}, "
+          f"evicted={stats['evicted_connections']:,}/{stats['evicted_statements']:,} (conn/stmt)")
+    stats = assembler.stats()
+    print(f"[*] Orders: assembled={stats['orders']:,} from {stats['records']:,} records, rolled back={stats['rolled_back']:,}, "
+          f"discarded={stats['discarded']:,}, failed inserts={stats['failed']:,}")
+    print_dedup_stats()
+
+def print_dedup_stats():
+    stats = dedup.stats()
+    print(f"[*] Order dedup: duplicates dropped={stats['hits']:,}, unique={stats['misses']:,}, "
+          f"keys={stats['keys']:,}, rotations={stats['rotations']:,}")
 
 def packet_callback(pkt):
+    """[scapy 엔진] sniff() 가 디섹션한 Packet 을 처리"""
+    packets_seen.value += 1
+    # len(pkt) 는 패킷을 다시 조립하므로 수신한 원본 바이트 길이를 사용
+    bytes_seen.value += len(pkt.original or b'')
     try:
         if pkt.haslayer(TCP) and pkt.haslayer(IP):
+            capture_now[0] = float(pkt.time)
             ip_layer = pkt[IP]
             tcp_layer = pkt[TCP]
             payload = bytes(tcp_layer.payload)
-            if not payload: return
-
-            if tcp_layer.dport == MYSQL_PORT:
-                parse_mysql_payload(payload, (ip_layer.src, tcp_layer.sport), (ip_layer.dst, tcp_layer.dport), True)
-            elif tcp_layer.sport == MYSQL_PORT:
-                parse_mysql_payload(payload, (ip_layer.src, tcp_layer.sport), (ip_layer.dst, tcp_layer.dport), False)
+            handle_segment(ip_layer.src, tcp_layer.sport, ip_layer.dst, tcp_layer.dport,
+                           tcp_layer.seq, int(tcp_layer.flags), payload)
     except Exception:
-        pass
+        parse_errors.value += 1
+
+def open_live_source(engine, adapter):
+    """raw/tpacket 엔진의 캡처 소스 (linktype, (ts, frame) 이터레이터, close 를 제공)"""
+    if engine == "tpacket":
+        import tpacket
+        return tpacket.TpacketSource(adapter, MYSQL_PORT)
+    return rawcap.LiveSource(adapter, f"tcp port {MYSQL_PORT}")
+
+def sniff_raw(source, workers=0):
+    """[raw/tpacket 엔진] 원시 프레임의 헤더만 직접 해석하고 페이로드는 memoryview 로 전달"""
+    print(f"[*] {type(source).__name__} capture engine (linktype={source.linktype})")
+    decode_frame = rawcap.decode_frame
+    linktype = source.linktype
+    if hasattr(source, "stats"):
+        metrics.registry.counter("sniffer_kernel_drops_total", "Frames the kernel dropped before the capture source read them",
+                                 fn=lambda: source.stats()["drops"])
+    try:
+        if workers:
+            run_sharded(((ts, linktype, frame) for ts, frame in source), workers, live=True)
+            return
+        assembler.start_flusher()
+        for ts, frame in source:
+            capture_now[0] = ts or time.time()
+            packets_seen.value += 1
+            bytes_seen.value += len(frame)
+            try:
+                seg = decode_frame(frame, linktype, MYSQL_PORT)
+                if seg is not None:
+                    handle_segment(*seg)
+            except Exception:
+                parse_errors.value += 1
+    finally:
+        source.close()
+
+def publish_metrics(metrics_queue, source):
+    """[샤딩 자식 프로세스] METRICS_INTERVAL 마다 메트릭 스냅샷을 캡처 프로세스로 보냄. 돌려준 함수로 종료 직전 마지막 값을 한 번 더 보냄"""
+    def send(registry=metrics.registry):
+        metrics_queue.put((source, registry.snapshot()))
+    metrics.start_publisher(metrics.registry, send)
+    return send
+
+def parse_worker(index, ring_name, wakeup, events, subscribed=None, rules_path=None, live=False, metrics_queue=None):
+    """[샤딩 워커] 링에서 원시 프레임을 받아 decode → 재조립 → 파싱. 담당 연결의 세션/Statement 상태는 이 워커에만 존재"""
+    global event_sink, capture_live
+    import signal
+    import shm_ring
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 종료는 캡처 프로세스가 링을 닫는 것으로 전달
+    event_sink = events
+    if subscribed is not None:
+        # spawn 으로 시작한 워커는 모듈을 새로 import 하므로 --results 설정을 넘겨받음
+        set_subscriptions(subscribed)
+    # 라이브 캡처면 워커마다 규칙 파일을 감시 (Statement/지문 상태가 워커별이므로 교체도 워커별)
+    load_order_rules(rules_path, watch=live)
+    if live:
+        assembler.start_flusher()
+    else:
+        # 재생: 유휴 만료와 주문 조립 타임아웃을 캡처 시각 기준으로
+        registry.clock = assembler.clock = lambda: capture_now[0]
+    ring = shm_ring.ShmRing.attach(ring_name, wakeup)
+    decode_frame = rawcap.decode_frame
+    stats = {"frames": 0}
+    send_metrics = publish_metrics(metrics_queue, f"parser-{index}") if metrics_queue is not None else None
+    capture_live = live
+
+    def handle(ts, linktype, frame):
+        capture_now[0] = ts
+        try:
+            seg = decode_frame(frame, linktype, MYSQL_PORT)
+            if seg is not None:
+                stats["frames"] += handle_segment(*seg)
+        except Exception:
+            parse_errors.value += 1
+
+    try:
+        ring.consume(handle)
+    finally:
+        ring.close()
+        assembler.flush_all()
+        if send_metrics is not None:
+            send_metrics()
+        events.put(("WORKER_DONE", {"worker": index, "frames": stats["frames"], "orders": orders_found, "sessions": registry.stats(),
+                                     "skipped": skipped_results}))
+
+def sink_main(events, workers, console_levels=None, metrics_queue=None):
+    """[샤딩 싱크] 모든 워커의 이벤트를 받아 터미널 출력과 JSONL 기록을 한 프로세스에서 수행"""
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if console_levels is not None:
+        # spawn 으로 시작한 싱크는 모듈을 새로 import 하므로 --console 설정을 넘겨받음
+        console.set_levels(console_levels)
+    send_metrics = publish_metrics(metrics_queue, "sink") if metrics_queue is not None else None
+    done = 0
+    frames = orders = 0
+    sessions = {}
+    while done < workers:
+        msg_type, log_data = events.get()
+        if msg_type == "WORKER_DONE":
+            done += 1
+            frames += log_data["frames"]
+            orders += log_data["orders"]
+            for name, value in log_data["sessions"].items():
+                sessions[name] = sessions.get(name, 0) + value
+            for digest, values in log_data["skipped"].items():
+                counters = skipped_results.setdefault(digest, [0, 0, 0, values[3]])
+                for i in range(3):
+                    counters[i] += values[i]
+            continue
+        emit_event(msg_type, log_data)
+    flush_logs()
+    tracer.report()
+    console.flush()
+    if send_metrics is not None:
+        send_metrics()
+    print(f"[*] Sink finished (workers: {workers}, mysql frames: {frames:,}, orders: {orders:,})", flush=True)
+    print(f"[*] Sessions (all workers): {sessions}", flush=True)
+    print_dedup_stats()
+    print_result_stats()
 
-def start_sniffing():
-    adapter = find_loopback_adapter()
+def run_sharded(packets, workers, live=False):
+    """
+    [샤딩 모드] 캡처 프로세스 1개 + 파서 워커 N개 + 싱크 프로세스 1개.
+    클라이언트 (ip, port) 해시로 워커를 골라 공유 메모리 링에 원시 프레임을 넣으므로
+    한 연결의 MySQLSession 과 Statement 상태는 항상 같은 워커에만 존재합니다.
+    packets: (timestamp, linktype, frame) 이터러블. 처리한(링에 넣은) 패킷 수를 반환.
+    """
+    import multiprocessing
+    import shm_ring
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue(maxsize=SINK_QUEUE_SIZE)
+    # 워커/싱크의 메트릭 스냅샷 → 이 프로세스의 레지스트리에 합산 (메트릭 엔드포인트는 캡처 프로세스 하나)
+    metrics_queue = ctx.Queue()
+    rings = []
+    procs = []
+    for i in range(workers):
+        wakeup = ctx.Event()
+        ring = shm_ring.ShmRing.create(wakeup)
+        rings.append(ring)
+        procs.append(ctx.Process(target=parse_worker, args=(i, ring.name, wakeup, events, sorted(result_tables), order_rules.path, live, metrics_queue), name=f"sniffer-parser-{i}", daemon=True))
+    sink = ctx.Process(target=sink_main, args=(events, workers, console.levels, metrics_queue), name="sniffer-sink", daemon=True)
+    sink.start()
+    for proc in procs:
+        proc.start()
+    print(f"[*] Sharded pipeline started (parser workers: {workers})")
+
+    def merge_metrics():
+        for source, snapshot in iter(metrics_queue.get, None):
+            metrics.registry.merge(source, snapshot)
+    merger = threading.Thread(target=merge_metrics, name="metrics-merge", daemon=True)
+    merger.start()
+    metrics.registry.counter("sniffer_ring_drops_total", "Frames dropped because a parser worker ring was full",
+                             fn=lambda: sum(r.dropped for r in rings))
+    metrics.registry.gauge("sniffer_sink_queue_depth", "Events waiting for the sink process", fn=events.qsize)
+
+    decode_frame = rawcap.decode_frame
+    pushed = 0
+    try:
+        for ts, linktype, frame in packets:
+            packets_seen.value += 1
+            bytes_seen.value += len(frame)
+            seg = decode_frame(frame, linktype, MYSQL_PORT)
+            if seg is None: continue
+            client = (seg[0], seg[1]) if seg[3] == MYSQL_PORT else (seg[2], seg[3])
+            if rings[hash(client) % workers].push(ts or 0.0, linktype, frame):
+                pushed += 1
+    except KeyboardInterrupt:
+        print("\n[*] Stopping...")
+    finally:
+        for ring in rings:
+            ring.close_writer()
+        for proc in procs:
+            proc.join()
+        sink.join()
+        metrics_queue.put(None)
+        merger.join()
+        print(f"[*] Sharded pipeline stopped (frames handed off: {pushed:,}, ring drops: {sum(r.dropped for r in rings):,})")
+        for ring in rings:
+            ring.close()
+    return pushed
+
+def replay_captures(paths, speed=0.0, workers=0):
+    """[오프라인] pcap/pcapng 파일을 실시간 캡처와 같은 경로(decode → 재조립 → 파싱)로 재생하고 처리량을 출력"""
+    import replay
+    report = replay.ReplayReport(("read", "decode", "reassembly", "parse", "log flush"))
+    stages = report.stages
+    pacer = replay.Pacer(speed) if speed > 0 else None
+    clock = time.perf_counter
+    decode_frame = rawcap.decode_frame
+    feed = reassembler.feed
+    # 유휴 만료는 벽시계가 아닌 캡처 시각 기준 (최대 속도 재생에서도 하루치 연결 수명이 그대로 재현됨)
+    registry.clock = assembler.clock = lambda: capture_now[0]
+    print(f"[*] Replaying {len(paths)} capture file(s) (speed: {'max' if pacer is None else f'x{speed}'})")
+
+    if workers:
+        def paced():
+            for ts, linktype, frame in replay.iter_files(paths):
+                if pacer: pacer.wait(ts)
+                yield ts, linktype, frame
+        started = clock()
+        pushed = run_sharded(paced(), workers)
+        elapsed = clock() - started
+        print(f"[*] Replay finished: {pushed:,} packets in {elapsed:.3f} s ({pushed / max(elapsed, 1e-9):,.0f} pkt/s)")
+        return
+
+    t_end = clock()
+    for ts, linktype, frame in replay.iter_files(paths):
+        if pacer: pacer.wait(ts)
+        capture_now[0] = ts
+        t0 = clock()
+        stages["read"] += t0 - t_end
+        report.packets += 1
+        report.bytes += len(frame)
+        packets_seen.value += 1
+        bytes_seen.value += len(frame)
+        seg = decode_frame(frame, linktype, MYSQL_PORT)
+        t1 = clock()
+        stages["decode"] += t1 - t0
+        t_end = t1
+        if seg is None: continue
+
+        # handle_segment 와 같은 경로를 단계별로 계측
+        src_ip, sport, dst_ip, dport, seq, flags, payload = seg
+        frames = feed((src_ip, sport, dst_ip, dport), seq, flags, payload)
+        t2 = clock()
+        stages["reassembly"] += t2 - t1
+        t_end = t2
+        if frames:
+            frame_now[0] = time.time()
+            try:
+                count = parse_mysql_payload(frames, (src_ip, sport), (dst_ip, dport), dport == MYSQL_PORT)
+                report.frames += count
+                mysql_frames.value += count
+            except Exception as e:
+                parse_errors.value += 1
+                console_log("PARSE ERROR", str(e))
+        if flags & (TCP_FIN | TCP_RST):
+            close_connection(src_ip, sport, dst_ip, dport, dport == MYSQL_PORT)
+        if assembler.pending:
+            assembler.flush_expired()
+        t_end = clock()
+        stages["parse"] += t_end - t2
+
+    assembler.flush_all()
+    flush_logs()
+    tracer.report()
+    console.flush()
+    stages["log flush"] += clock() - t_end
+    report.orders = orders_found
+    report.print_summary()
+    print_session_stats()
+    print_result_stats()
+
+def start_sniffing(engine="raw", adapter=None, workers=0):
+    global capture_live
+    adapter = adapter or find_loopback_adapter()
     if not adapter:
         print("[ERROR] Npcap Loopback Adapter를 찾을 수 없습니다.")
         return
 
-    print(f"[*] Sniffing on {adapter} (MySQL: {MYSQL_PORT})")
+    print(f"[*] Sniffing on {adapter} (MySQL: {MYSQL_PORT}, Engine: {engine})")
     print(f"[*] Logs will be saved to: {LOG_DIR}")
     conf.sniff_promisc = True
+    capture_live = True
     
     try:
+        if engine != "scapy":
+            try:
+                source = open_live_source(engine, adapter)
+            except Exception as e:
+                # 원시 소켓/링을 열 수 없는 환경이면 기존 scapy 경로로 전환
+                print(f"[WARNING] {engine} engine unavailable ({e}), falling back to scapy sniff()")
+            else:
+                sniff_raw(source, workers)
+                return
+        if workers:
+            # scapy sniff() 경로는 샤딩하지 않음: 단일 프로세스로 처리 (종료 시 통계도 이 프로세스에서 출력)
+            print(f"[WARNING] --workers {workers} ignored: the scapy engine runs single-process")
+            workers = 0
         # L3RawSocket is often better for Windows loopback
+        assembler.start_flusher()
         sniff(iface=adapter, filter=f"tcp port {MYSQL_PORT}", prn=packet_callback, store=0)
     except KeyboardInterrupt:
+        console.flush()
         print("\n[*] Stopping...")
-        log_queue.put(("EXIT", ""))
+        if not workers:
+            assembler.flush_all()
+            tracer.report()
+            console.flush()
+            print_session_stats()
+            print_result_stats()
+        close_logs()
     except Exception as e:
         print(f"[CRITICAL ERROR] {e}")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scapy MySQL Sniffer")
+    parser.add_argument("iface", nargs="?", default=None, help="캡처 인터페이스 (기본: Npcap Loopback 자동 탐색)")
+    parser.add_argument("--engine", choices=CAPTURE_ENGINES, default="raw", help="캡처 엔진 선택 (기본: raw)")
+    parser.add_argument("--replay", nargs="+", metavar="PCAP", help="라이브 캡처 대신 pcap/pcapng 파일 재생")
+    parser.add_argument("--speed", type=float, default=0.0, help="재생 배속 (0: 최대 속도, 1: 원래 속도)")
+    parser.add_argument("--results", nargs="+", metavar="TABLE", help="행을 디코딩/기록할 결과셋의 테이블 (기본: 주문 테이블, '*': 전부)")
+    parser.add_argument("--console", nargs="+", metavar="TYPE=LEVEL", help="종류별 터미널 출력 수준 (예: DATA=show SQL=summary, 수준: show/summary/off)")
+    parser.add_argument("--workers", type=int, default=0, help="파서 워커 프로세스 수 (0: 단일 프로세스, raw/tpacket 엔진·재생 전용)")
+    parser.add_argument("--rules", metavar="JSON", help=f"주문 규칙 파일 (기본: {os.path.basename(ORDER_RULES_FILE)}, 수정 시 자동 반영)")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT, help=f"Prometheus 메트릭 포트 (127.0.0.1, 0: 끔, 기본: {metrics.METRICS_PORT})")
+    args = parser.parse_args(argv)
+    if args.workers and args.engine == "scapy" and not args.replay:
+        parser.error("--workers requires the raw or tpacket engine (the scapy engine is single-process)")
+    return args
+
+def start_metrics_server(port):
+    """127.0.0.1:port/metrics 제공. 포트를 열 수 없어도 캡처는 계속"""
+    if not port:
+        return None
+    try:
+        server = metrics.MetricsServer(metrics.registry, port).start()
+    except OSError as e:
+        print(f"[WARNING] Metrics endpoint unavailable on port {port}: {e}")
+        return None
+    print(f"[*] Metrics: http://127.0.0.1:{server.port}/metrics")
+    return server
+
 if __name__ == "__main__":
-    start_sniffing()
+    args = parse_args()
+    console.set_levels(parse_levels(args.console))
+    if args.results:
+        set_subscriptions(args.results)
+    # 재생은 결과가 재현되도록 시작 시점의 규칙으로 고정, 라이브 캡처는 규칙 파일 변경을 감시
+    load_order_rules(args.rules, watch=not args.replay)
+    start_metrics_server(args.metrics_port)
+    if args.replay:
+        replay_captures(args.replay, speed=args.speed, workers=args.workers)
+    else:
+        start_sniffing(engine=args.engine, adapter=args.iface, workers=args.workers)
@@ -0,0 +1,176 @@
+"""
+작성의도: Prepared Statement ID 는 연결마다 1부터 다시 매겨지므로 연결(클라이언트 ip, port) 단위로 세션/Statement 상태를 보관하고,
+          커넥션 풀이 하루 종일 연결을 만들고 버려도 메모리가 늘어나지 않도록 수명을 관리합니다.
+기능 원리: 연결과 연결별 Statement 를 각각 LRU(OrderedDict) 상한으로 묶고,
+          COM_STMT_CLOSE / COM_QUIT / FIN / RST 로 즉시 정리하며, 조용히 사라진 연결은 타이머 휠로 유휴 만료시킵니다.
+"""
+import time
+from collections import OrderedDict
+
+# [설정] 연결 수 상한 (POS 단말 + 커넥션 풀), 연결당 Statement 상한
+MAX_CONNECTIONS = 4096
+MAX_STATEMENTS = 256
+# [설정] 유휴 만료: MySQL wait_timeout 기본값(8시간)보다 오래 조용한 연결은 서버도 이미 끊은 상태
+IDLE_TIMEOUT = 8 * 60 * 60
+# [설정] 타이머 휠: 60초 tick x 512 슬롯 (한 바퀴 약 8.5시간)
+WHEEL_TICK = 60
+WHEEL_SLOTS = 512
+
+
+class TimerWheel:
+    """
+    키를 만료 tick 의 슬롯에 넣어두고 시간이 지나간 슬롯만 꺼내는 해시 타이머 휠.
+    슬롯에서 나온 키가 실제로 만료됐는지는 호출자가 확인합니다 (한 바퀴 이상 남은 키, 그 사이 활동한 키는 다시 예약).
+    """
+    def __init__(self, tick=WHEEL_TICK, slots=WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.current = None   # 마지막으로 처리한 tick
+
+    def schedule(self, key, deadline):
+        """deadline 이 속한 tick 의 슬롯에 키를 넣고 슬롯 번호를 반환"""
+        t = int(deadline // self.tick)
+        if self.current is not None and t <= self.current:
+            t = self.current + 1
+        index = t % len(self.slots)
+        self.slots[index].add(key)
+        return index
+
+    def cancel(self, key, index):
+        self.slots[index].discard(key)
+
+    def advance(self, now):
+        """now 까지 지나간 슬롯의 키 목록 (슬롯은 비움)"""
+        t = int(now // self.tick)
+        if self.current is None:
+            self.current = t
+            return []
+        if t <= self.current:
+            return []
+        fired = []
+        # 한 바퀴 이상 건너뛰었으면 모든 슬롯을 한 번씩만 비움
+        for step in range(self.current + 1, min(t, self.current + len(self.slots)) + 1):
+            slot = self.slots[step % len(self.slots)]
+            if slot:
+                fired.extend(slot)
+                slot.clear()
+        self.current = t
+        return fired
+
+
+class Connection:
+    __slots__ = ("key", "server", "session", "statements", "pending_prepare", "last_seen", "slot")
+
+    def __init__(self, key, server, session, now):
+        self.key = key
+        self.server = server            # (server_ip, server_port): 재조립 흐름 정리에 사용
+        self.session = session
+        self.statements = OrderedDict() # {stmt_id: {"query", "num_params", "col_types"}} (LRU 순서)
+        self.pending_prepare = None     # 응답을 기다리는 COM_STMT_PREPARE 쿼리
+        self.last_seen = now
+        self.slot = None
+
+
+class SessionRegistry:
+    """
+    (client_ip, client_port) → Connection. 연결/Statement 수는 LRU 상한을 넘지 않으며,
+    get() 이 호출될 때 tick 이 바뀌었으면 타이머 휠을 돌려 유휴 연결을 정리합니다.
+    on_close(connection) 는 연결이 어떤 이유로든 제거될 때 호출됩니다.
+    """
+    def __init__(self, session_factory, max_connections=MAX_CONNECTIONS, max_statements=MAX_STATEMENTS,
+                 idle_timeout=IDLE_TIMEOUT, wheel=None, clock=time.monotonic, on_close=None):
+        self.session_factory = session_factory
+        self.max_connections = max_connections
+        self.max_statements = max_statements
+        self.idle_timeout = idle_timeout
+        self.wheel = wheel or TimerWheel()
+        self.clock = clock
+        self.on_close = on_close
+        self.connections = OrderedDict()
+        self._next_tick = 0.0
+        # 통계
+        self.opened = 0
+        self.closed = 0
+        self.expired = 0
+        self.evicted_connections = 0
+        self.evicted_statements = 0
+
+    def get(self, key, server):
+        """연결 상태를 반환 (없으면 생성). 호출할 때마다 활동 시각과 LRU 순서를 갱신"""
+        now = self.clock()
+        if now >= self._next_tick:
+            self._expire(now)
+        conn = self.connections.get(key)
+        if conn is None:
+            conn = Connection(key, server, self.session_factory(), now)
+            self.connections[key] = conn
+            self.opened += 1
+            conn.slot = self.wheel.schedule(key, now + self.idle_timeout)
+            if len(self.connections) > self.max_connections:
+                _, oldest = self.connections.popitem(last=False)
+                self.evicted_connections += 1
+                self._release(oldest)
+        else:
+            conn.last_seen = now
+            self.connections.move_to_end(key)
+        return conn
+
+    def close(self, key):
+        """COM_QUIT / FIN / RST: 연결 상태 즉시 제거"""
+        conn = self.connections.pop(key, None)
+        if conn is not None:
+            self.closed += 1
+            self._release(conn)
+
+    # --- Statement ---
+    def add_statement(self, conn, stmt_id, info):
+        statements = conn.statements
+        statements[stmt_id] = info
+        statements.move_to_end(stmt_id)
+        if len(statements) > self.max_statements:
+            statements.popitem(last=False)
+            self.evicted_statements += 1
+
+    def get_statement(self, conn, stmt_id):
+        info = conn.statements.get(stmt_id)
+        if info is not None:
+            conn.statements.move_to_end(stmt_id)
+        return info
+
+    def close_statement(self, conn, stmt_id):
+        conn.statements.pop(stmt_id, None)
+
+    def stats(self):
+        return {
+            "connections": len(self.connections),
+            "statements": sum(len(c.statements) for c in self.connections.values()),
+            "pending_prepares": sum(1 for c in self.connections.values() if c.pending_prepare is not None),
+            "opened": self.opened,
+            "closed": self.closed,
+            "expired": self.expired,
+            "evicted_connections": self.evicted_connections,
+            "evicted_statements": self.evicted_statements,
+        }
+
+    def _expire(self, now):
+        self._next_tick = (int(now // self.wheel.tick) + 1) * self.wheel.tick
+        for key in self.wheel.advance(now):
+            conn = self.connections.get(key)
+            if conn is None:
+                continue
+            deadline = conn.last_seen + self.idle_timeout
+            if deadline <= now:
+                del self.connections[key]
+                self.expired += 1
+                conn.slot = None
+                self._release(conn)
+            else:
+                conn.slot = self.wheel.schedule(key, deadline)
+
+    def _release(self, conn):
+        if conn.slot is not None:
+            self.wheel.cancel(conn.key, conn.slot)
+            conn.slot = None
+        conn.statements.clear()
+        if self.on_close is not None:
+            self.on_close(conn)
@@ -0,0 +1,138 @@
+"""
+작성의도: 캡처 프로세스가 파서 워커 프로세스에 원시 프레임을 넘길 때 피클링/파이프 복사 없이 공유 메모리로 전달합니다.
+기능 원리: 단일 생산자/단일 소비자(SPSC) 링 버퍼. head/tail 은 계속 증가하는 바이트 카운터이고,
+          레코드는 [길이 u32][linktype u16][pad][ts f64][frame] 을 8바이트 정렬로 기록합니다.
+          링 끝에 레코드가 들어가지 않으면 WRAP 표식을 남기고 처음부터 씁니다.
+          링 크기는 생성 시 헤더에 기록하고 attach 는 그 값을 읽습니다. SharedMemory.size 는 Windows(페이지 단위 올림),
+          macOS(st_size) 에서 생성한 크기와 다를 수 있어 양쪽이 다른 위치에서 wrap 하게 되므로 쓰지 않습니다.
+          메모리 순서: 락 없이 생산자는 레코드를 쓴 뒤 head 를, 소비자는 레코드를 다 읽은 뒤 tail 을 갱신합니다.
+          CPython 에는 메모리 배리어가 없으므로 이 순서는 CPU 에 기대며, 레코드 기록과 head 기록은 별개의 C 호출(memcpy/pack_into)이라
+          컴파일러가 순서를 바꾸지 않습니다. x86/x64 (TSO) 는 store 끼리, load 끼리, load 뒤의 store 순서를 바꾸지 않으므로
+          소비자가 새 head 를 읽으면 그 앞의 레코드도 보이고, 생산자가 새 tail 을 읽으면 소비자는 그 구간을 다 읽은 뒤입니다.
+          head/tail 은 8바이트 정렬 위치의 8바이트 store 라 찢어져 읽히지 않습니다.
+          ARM 등 약한 메모리 모델 CPU 에서는 이 보장이 없으므로 배포 대상(Windows x64)에서만 사용합니다.
+"""
+import struct
+from multiprocessing import shared_memory
+
+# [설정] 워커당 링 크기: 루프백 MTU(64KB) 프레임도 여러 개 담을 수 있도록 넉넉하게
+DEFAULT_CAPACITY = 16 * 1024 * 1024
+
+_HEADER_SIZE = 64
+_OFF_HEAD = 0
+_OFF_TAIL = 8
+_OFF_WAITING = 16
+_OFF_CLOSED = 24
+_OFF_CAPACITY = 32
+_U64 = struct.Struct('<Q')
+_RECORD = struct.Struct('<IHxxd')   # length, linktype, timestamp
+_WRAP = 0xFFFFFFFF
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class ShmRing:
+    def __init__(self, shm, wakeup, owner, capacity):
+        self.shm = shm
+        self.wakeup = wakeup      # 소비자가 잠들어 있을 때만 생산자가 set
+        self.owner = owner
+        self.buf = shm.buf
+        self.capacity = capacity
+        self.dropped = 0
+
+    @classmethod
+    def create(cls, wakeup, capacity=DEFAULT_CAPACITY):
+        capacity = _align(capacity)
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + capacity)
+        shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+        _U64.pack_into(shm.buf, _OFF_CAPACITY, capacity)
+        return cls(shm, wakeup, owner=True, capacity=capacity)
+
+    @classmethod
+    def attach(cls, name, wakeup):
+        """생성한 쪽이 헤더에 기록한 크기를 사용 (attach 한 SharedMemory.size 는 페이지 단위로 올림될 수 있음)"""
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, wakeup, owner=False, capacity=_U64.unpack_from(shm.buf, _OFF_CAPACITY)[0])
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # --- 생산자 (캡처 프로세스) ---
+    def push(self, ts, linktype, frame):
+        """프레임 하나를 기록. 링이 가득 차면 캡처를 멈추지 않고 버린 뒤 False"""
+        buf = self.buf
+        cap = self.capacity
+        head = _U64.unpack_from(buf, _OFF_HEAD)[0]
+        tail = _U64.unpack_from(buf, _OFF_TAIL)[0]
+        size = _align(_RECORD.size + len(frame))
+        pos = head % cap
+        skip = cap - pos if cap - pos < size else 0
+        if cap - (head - tail) < skip + size:
+            self.dropped += 1
+            return False
+        if skip:
+            if skip >= 4:
+                struct.pack_into('<I', buf, _HEADER_SIZE + pos, _WRAP)
+            head += skip
+            pos = 0
+        base = _HEADER_SIZE + pos
+        _RECORD.pack_into(buf, base, len(frame), linktype, ts)
+        buf[base + _RECORD.size : base + _RECORD.size + len(frame)] = frame
+        _U64.pack_into(buf, _OFF_HEAD, head + size)
+        if buf[_OFF_WAITING]:
+            buf[_OFF_WAITING] = 0
+            self.wakeup.set()
+        return True
+
+    def close_writer(self):
+        self.buf[_OFF_CLOSED] = 1
+        self.wakeup.set()
+
+    # --- 소비자 (파서 워커) ---
+    def consume(self, handler, idle_wait=0.05):
+        """
+        레코드를 handler(ts, linktype, frame_memoryview) 로 넘깁니다.
+        handler 가 반환한 뒤에 tail 을 옮기므로 frame 은 handler 안에서만 유효합니다 (보관하려면 복사).
+        생산자가 닫고 링이 비면 반환합니다.
+        """
+        buf = self.buf
+        cap = self.capacity
+        tail = _U64.unpack_from(buf, _OFF_TAIL)[0]
+        while True:
+            head = _U64.unpack_from(buf, _OFF_HEAD)[0]
+            if tail == head:
+                if buf[_OFF_CLOSED]:
+                    return
+                # 잠들기 전에 플래그를 세우고 다시 확인해 깨우기 누락을 막음
+                buf[_OFF_WAITING] = 1
+                if _U64.unpack_from(buf, _OFF_HEAD)[0] == tail and not buf[_OFF_CLOSED]:
+                    self.wakeup.wait(idle_wait)
+                    self.wakeup.clear()
+                buf[_OFF_WAITING] = 0
+                continue
+            while tail < head:
+                pos = tail % cap
+                if cap - pos < 4 or struct.unpack_from('<I', buf, _HEADER_SIZE + pos)[0] == _WRAP:
+                    tail += cap - pos
+                    continue
+                length, linktype, ts = _RECORD.unpack_from(buf, _HEADER_SIZE + pos)
+                start = _HEADER_SIZE + pos + _RECORD.size
+                frame = buf[start : start + length]
+                try:
+                    handler(ts, linktype, frame)
+                finally:
+                    frame.release()
+                tail += _align(_RECORD.size + length)
+                _U64.pack_into(buf, _OFF_TAIL, tail)
+
+    def close(self):
+        self.buf = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
@@ -0,0 +1,144 @@
+"""
+작성의도: 같은 모양의 SQL 을 리터럴과 무관하게 하나로 묶어, 주문 감지·결과셋 구독·로그 수준·통계를 쿼리마다 다시 판단하지 않고
+          지문(fingerprint) 레코드 하나로 결정합니다.
+기능 원리: 주석 제거 → 문자열/숫자 리터럴을 ? 로 치환 → 식별자 따옴표 제거 → 소문자화/공백 정리 → IN 목록·VALUES 튜플 반복 축약 후
+          blake2b 다이제스트를 만듭니다. 원문 텍스트 → 레코드는 크기가 제한된 LRU 캐시로 보관해
+          같은 COM_QUERY/PREPARE 텍스트가 다시 오면 정규식 작업 없이 dict 조회 한 번으로 끝납니다.
+          리터럴 INSERT 는 sql_literals.py 가 값을 스캔하며 만든 정규화 텍스트로 record() 를 호출해 전체 정규화를 건너뜁니다.
+"""
+import hashlib
+import re
+from collections import OrderedDict
+
+# [설정] 원문 텍스트 캐시 / 다이제스트 레코드 상한
+TEXT_CACHE_SIZE = 8192
+DIGEST_CACHE_SIZE = 4096
+# [설정] 이보다 긴 원문(다중 행 INSERT 등)은 텍스트 캐시에 넣지 않음 (같은 텍스트가 다시 올 일이 드물고 메모리만 차지)
+MAX_CACHED_TEXT = 4096
+
+_LITERALS = re.compile(r"""
+     (?P<comment>/\*.*?\*/|--[^\n]*|\#[^\n]*)
+    |(?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    |(?P<ident>`[^`]*`|\[[^\]]*\])
+    |(?P<number>\b0x[0-9a-f]+\b|(?<![\w.$])\d+(?:\.\d+)?(?:e[-+]?\d+)?\b)
+""", re.IGNORECASE | re.DOTALL | re.VERBOSE)
+_SPACES = re.compile(r'\s+')
+_PUNCT = re.compile(r' ?([,=(]) ?| (?=\))')
+_REPEATED_TUPLE = re.compile(r'(\((?:[^()]|\([^()]*\))*\))(?:,\1)+')
+_PLACEHOLDER_LIST = re.compile(r'\(\?(?:,\?)+\)')
+_TABLES = re.compile(r'(?:^|[^\w])(?:from|join|into)\s+([\w.$]+)')
+_UPDATE_TABLE = re.compile(r'^update\s+(?:low_priority\s+|ignore\s+)*([\w.$]+)')
+_INSERT_COLUMNS = re.compile(r'\binto\s+[\w.$]+\s*\(([^()]*)\)')
+_UPDATE_COLUMNS = re.compile(r'\bset\s+(.*?)(?:\swhere\s|$)')
+_SELECT_COLUMNS = re.compile(r'^select\s+(?:distinct\s+)?(.*?)\sfrom\s')
+_IDENT = re.compile(r'^[\w.$*]+$')
+
+
+def _replace_literal(m):
+    kind = m.lastgroup
+    if kind == "comment":
+        return " "
+    if kind == "ident":
+        return m.group()[1:-1]
+    return "?"
+
+
+def normalize(query):
+    """리터럴을 ? 로 바꾸고 공백/대소문자/IN 목록/반복 VALUES 튜플을 정규화한 텍스트"""
+    text = _LITERALS.sub(_replace_literal, query)
+    text = _SPACES.sub(' ', text).strip().lower()
+    return collapse(_PUNCT.sub(r'\1', text))
+
+
+def collapse(text):
+    """정규화된 텍스트의 (?,?,...) 목록과 연속으로 반복되는 VALUES 튜플 축약"""
+    text = _PLACEHOLDER_LIST.sub('(?+)', text)
+    return _REPEATED_TUPLE.sub(r'\1', text)
+
+
+def _split_names(text, assignments=False):
+    names = []
+    for item in text.split(','):
+        item = item.split('=', 1)[0] if assignments else item
+        item = item.strip()
+        if item and _IDENT.match(item):
+            names.append(item.rsplit('.', 1)[-1])
+    return tuple(names)
+
+
+class Fingerprint:
+    """
+    정규화된 SQL 한 모양의 레코드. digest/kind/tables/columns 는 불변이며,
+    policy 는 사용하는 쪽(스니퍼)이 이 지문에 대한 판단을, literal_plan 은 리터럴 INSERT 의 값 추출 플랜을 한 번 계산해 붙여두는 자리입니다.
+    """
+    __slots__ = ("digest", "normalized", "kind", "tables", "columns", "policy", "literal_plan", "count")
+
+    def __init__(self, normalized, digest=None):
+        self.normalized = normalized
+        self.digest = digest or hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+        self.kind = normalized.split(' ', 1)[0].split('(', 1)[0] if normalized else ""
+        tables = _TABLES.findall(normalized)
+        if self.kind == "update":
+            m = _UPDATE_TABLE.match(normalized)
+            if m: tables.insert(0, m.group(1))
+        self.tables = tuple(dict.fromkeys(t.rsplit('.', 1)[-1] for t in tables))
+        self.columns = ()
+        if self.kind in ("insert", "replace"):
+            m = _INSERT_COLUMNS.search(normalized)
+            if m: self.columns = _split_names(m.group(1))
+        elif self.kind == "update":
+            m = _UPDATE_COLUMNS.search(normalized)
+            if m: self.columns = _split_names(m.group(1), assignments=True)
+        elif self.kind == "select":
+            m = _SELECT_COLUMNS.search(normalized)
+            if m: self.columns = _split_names(m.group(1))
+        self.policy = None
+        self.literal_plan = None
+        self.count = 0
+
+    def __repr__(self):
+        return f"Fingerprint({self.digest}, {self.kind}, tables={self.tables})"
+
+
+class Fingerprinter:
+    """원문 텍스트 → Fingerprint LRU 캐시. 리터럴만 다른 텍스트는 같은 다이제스트의 레코드를 공유합니다."""
+    def __init__(self, text_cache_size=TEXT_CACHE_SIZE, digest_cache_size=DIGEST_CACHE_SIZE):
+        self.text_cache_size = text_cache_size
+        self.digest_cache_size = digest_cache_size
+        self.by_text = OrderedDict()
+        self.by_digest = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, query):
+        record = self.by_text.get(query)
+        if record is not None:
+            self.hits += 1
+            self.by_text.move_to_end(query)
+            return record
+        self.misses += 1
+        record = self.record(normalize(query))
+        if len(query) <= MAX_CACHED_TEXT:
+            self.by_text[query] = record
+            if len(self.by_text) > self.text_cache_size:
+                self.by_text.popitem(last=False)
+        return record
+
+    def record(self, normalized):
+        """이미 정규화된 텍스트 → 다이제스트별 공유 레코드"""
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+        record = self.by_digest.get(digest)
+        if record is None:
+            record = self.by_digest[digest] = Fingerprint(normalized, digest)
+            if len(self.by_digest) > self.digest_cache_size:
+                self.by_digest.popitem(last=False)
+        else:
+            self.by_digest.move_to_end(digest)
+        return record
+
+    def stats(self):
+        return {"texts": len(self.by_text), "digests": len(self.by_digest), "hits": self.hits, "misses": self.misses}
+
+
+# 모듈 공용 인스턴스
+fingerprint = Fingerprinter()
@@ -0,0 +1,246 @@
+"""
+작성의도: prepared statement 를 쓰지 않는 POS 빌드가 COM_QUERY 로 보내는 INSERT INTO tb_order VALUES (...), (...) 텍스트에서도
+          주문 레코드를 만들 수 있도록 컬럼 목록과 행별 리터럴 값을 꺼냅니다.
+기능 원리: 다중 행 VALUES 는 "항목 하나(문자열/숫자/NULL/단순 식) + 구분자" 정규식의 findall 한 번으로 훑고,
+          파이썬 루프는 항목당 한 번 값 변환과 튜플 템플릿 기록만 합니다. 지문은 전체 텍스트를 다시 정규화하지 않고
+          캐시한 머리(INSERT INTO t (...) VALUES) 정규화 + 튜플 템플릿으로 sql_fingerprint 레코드를 찾습니다 (전체 정규화와 같은 다이제스트).
+          중첩 함수·주석·ON DUPLICATE KEY UPDATE 가 섞인 VALUES 와 UPDATE 는 토큰 단위 스캔으로 처리합니다.
+"""
+import re
+
+from sql_fingerprint import collapse, fingerprint, normalize
+
+# [설정] 정규화한 INSERT 머리 / 단순 식 항목 캐시 상한 (넘으면 비우고 다시 채움)
+SHAPE_CACHE_SIZE = 1024
+
+_VALUES_HEAD = re.compile(r"\s*(?:insert|replace)\b[^'\"]*?\bvalues?\s*\(", re.IGNORECASE)
+_UPDATE_HEAD = re.compile(r"\s*update\b", re.IGNORECASE)
+
+# 빠른 경로: VALUES 항목 하나와 그 뒤 구분자 (같은 행 / 다음 행 / 문장 끝)
+_ITEM = re.compile(r"""
+    (\s*(?:
+        ('[^'\\]*(?:(?:\\.|'')[^'\\]*)*'|"[^"\\]*(?:(?:\\.|"")[^"\\]*)*")        # 2 문자열
+       |([-+]?)(\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?![\w.])   # 3 부호, 4 숫자
+       |([Nn][Uu][Ll][Ll])(?!\w)                           # 5 NULL
+       |([^'",()\s][^'",()]*?(?:\([^'"()]*\))?)           # 6 단순 식 (NOW(), DEFAULT, qty+1)
+    )\s*(,|\)\s*,\s*\(|\)\s*$))                            # 7 구분자
+""", re.VERBOSE | re.DOTALL)
+
+# 느린 경로: 토큰 (문자열, 부호, 숫자, 주석, 구두점, 그 밖의 단어/연산자)
+_TOKEN = re.compile(r"""
+    \s*(?:
+        ('[^'\\]*(?:(?:\\.|'')[^'\\]*)*'|"[^"\\]*(?:(?:\\.|"")[^"\\]*)*")
+       |([-+]?)(\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?![\w.])
+       |(/\*.*?\*/|--[^\n]*|\#[^\n]*)
+       |([(),;=])
+       |([^'"(),;=\s]+)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+_ESCAPE = {"'": re.compile(r"\\(.)|''", re.DOTALL), '"': re.compile(r'\\(.)|""', re.DOTALL)}
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a', '%': '\\%', '_': '\\_'}
+
+
+def _unescape(m):
+    ch = m.group(1)
+    if ch is None:
+        return m.group()[0]
+    return _ESCAPES.get(ch, ch)
+
+
+def _string(token):
+    """따옴표 포함 문자열 리터럴 → str (MySQL 백슬래시 이스케이프와 따옴표 두 번 처리)"""
+    quote = token[0]
+    inner = token[1:-1]
+    if '\\' in inner or quote + quote in inner:
+        return _ESCAPE[quote].sub(_unescape, inner)
+    return inner
+
+
+def _number(sign, digits):
+    """정수는 int, 소수/지수는 DECIMAL 바이너리 값처럼 문자열 그대로 (order_record 의 number 변환이 처리)"""
+    value = int(digits) if digits.isdigit() else digits
+    if sign == '-':
+        return -value if type(value) is int else '-' + value
+    return value
+
+
+def _name(word):
+    return word.strip('`').rsplit('.', 1)[-1].strip('`').lower()
+
+
+class LiteralRows:
+    """리터럴 DML 한 문장: 지문, 컬럼 목록(없으면 빈 튜플), 행 목록 (행은 항목마다 값 하나, NULL/식은 None)"""
+    __slots__ = ("fp", "columns", "rows")
+
+    def __init__(self, fp, columns, rows):
+        self.fp = fp
+        self.columns = columns
+        self.rows = rows
+
+
+class LiteralParser:
+    """
+    INSERT/REPLACE ... VALUES 와 UPDATE ... SET 텍스트 → LiteralRows (그 밖의 문장은 None).
+    fast 는 findall 한 번으로 끝난 문장 수, slow 는 전체 정규화 + 토큰 스캔으로 처리한 문장 수입니다.
+    """
+    def __init__(self, cache_size=SHAPE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.heads = {}
+        self.items = {}
+        self.fast = 0
+        self.slow = 0
+        self.rows = 0
+
+    def __call__(self, query):
+        m = _VALUES_HEAD.match(query)
+        if m is not None:
+            start = m.end()
+            scanned = self._scan_values(query, start)
+            if scanned is not None:
+                rows, templates = scanned
+                fp = fingerprint.record(collapse(self._normalized_head(query[:start - 1]) + ','.join(templates)))
+                self.fast += 1
+            else:
+                fp = fingerprint(query)
+                rows = _scan_values_slow(query, start - 1)
+                self.slow += 1
+            self.rows += len(rows)
+            return LiteralRows(fp, fp.columns, rows)
+        if _UPDATE_HEAD.match(query):
+            columns, row = _scan_update(query)
+            self.slow += 1
+            self.rows += 1
+            return LiteralRows(fingerprint(query), columns, [row])
+        return None
+
+    def stats(self):
+        return {"fast": self.fast, "slow": self.slow, "rows": self.rows}
+
+    def _normalized_head(self, head):
+        normalized = self.heads.get(head)
+        if normalized is None:
+            if len(self.heads) >= self.cache_size:
+                self.heads.clear()
+            normalized = self.heads[head] = normalize(head)
+        return normalized
+
+    def _normalized_item(self, text):
+        normalized = self.items.get(text)
+        if normalized is None:
+            if len(self.items) >= self.cache_size:
+                self.items.clear()
+            normalized = self.items[text] = normalize(text)
+        return normalized
+
+    def _scan_values(self, query, start):
+        """빠른 경로: (행 목록, 연속 중복을 합친 튜플 템플릿 목록). 항목 정규식으로 끝까지 이어서 읽지 못하면 None"""
+        rows = []
+        templates = []
+        row = []
+        shape = []
+        add = row.append
+        kind = shape.append
+        consumed = 0
+        for whole, string, sign, digits, null, expr, sep in _ITEM.findall(query, start):
+            consumed += len(whole)
+            if string:
+                value = string[1:-1]
+                if '\\' in value or string[0] * 2 in value:
+                    value = _string(string)
+                add(value)
+                kind('?')
+            elif digits:
+                add(int(digits) if not sign and digits.isdigit() else _number(sign, digits))
+                kind(sign + '?')
+            else:
+                add(None)
+                kind('null' if null else self._normalized_item(expr))
+            if sep != ',':
+                rows.append(row)
+                template = '(' + ','.join(shape) + ')'
+                if not templates or templates[-1] != template:
+                    templates.append(template)
+                row = []
+                shape = []
+                add = row.append
+                kind = shape.append
+        if consumed != len(query) - start or row or not rows:
+            return None
+        return rows, templates
+
+
+def _item_value(tokens):
+    """토큰 목록 하나가 리터럴 하나면 그 값, 아니면(NULL, 식) None"""
+    if len(tokens) == 1:
+        string, sign, digits, _, _, _ = tokens[0]
+        if string:
+            return _string(string)
+        if digits:
+            return _number(sign, digits)
+    return None
+
+
+def _scan_values_slow(query, start):
+    """느린 경로: VALUES 튜플을 토큰 단위로 읽음 (중첩 괄호, 주석, VALUES 뒤 ON DUPLICATE KEY UPDATE 허용)"""
+    rows = []
+    row = None
+    item = []
+    depth = 0
+    for token in _TOKEN.findall(query, start):
+        string, sign, digits, comment, punct, word = token
+        if comment:
+            continue
+        if row is None:
+            if punct == '(':
+                row = []
+                item = []
+                depth = 0
+            elif punct != ',':
+                break
+            continue
+        if punct == '(':
+            depth += 1
+        elif punct in (',', ')') and depth == 0:
+            row.append(_item_value(item))
+            item = []
+            if punct == ')':
+                rows.append(row)
+                row = None
+            continue
+        elif punct == ')':
+            depth -= 1
+        item.append(token)
+    return rows
+
+
+def _scan_update(query):
+    """UPDATE: SET 의 컬럼 = 값 과 WHERE 의 컬럼 = 리터럴 (AND 로 이어진 것만) → (컬럼 목록, 값 목록)"""
+    columns = []
+    values = []
+    tokens = [t for t in _TOKEN.findall(query) if not t[3]]
+    clause = None
+    depth = 0
+    part = []
+    for token in tokens + [('', '', '', '', ';', '')]:
+        punct, word = token[4], token[5].lower()
+        if depth == 0 and (punct in (',', ';') or word in ('set', 'where', 'and', 'order', 'limit')):
+            if len(part) >= 3 and part[0][5] and part[1][4] == '=':
+                name = _name(part[0][5])
+                if clause == 'set' or (clause == 'where' and len(part) == 3 and name not in columns):
+                    columns.append(name)
+                    values.append(_item_value(part[2:]))
+            part = []
+            if word in ('set', 'where', 'order', 'limit'):
+                clause = word
+            continue
+        if punct == '(':
+            depth += 1
+        elif punct == ')':
+            depth -= 1
+        part.append(token)
+    return tuple(columns), values
+
+
+# 모듈 공용 인스턴스
+parse_literals = LiteralParser()
@@ -0,0 +1,163 @@
+"""
+작성의도: TCP 세그먼트 경계와 MySQL 패킷 경계가 다를 때(대용량 tb_suborder 배치, 큰 결과셋) 데이터가 잘리지 않도록
+          방향별·연결별 스트림을 재조립합니다.
+기능 원리: 4-tuple 로 흐름을 구분하고 시퀀스 번호 순서로 이어 붙인 뒤, 완성된 MySQL 프레임만 내보내고
+          아직 끝나지 않은 마지막 프레임의 꼬리만 버퍼에 남깁니다. 재전송은 버리고 흐름당 메모리 상한을 둡니다.
+"""
+import struct
+
+_MYSQL_HEADER = struct.Struct('<HBB')
+_SEQ_MOD = 0x100000000
+_SEQ_HALF = 0x80000000
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+# [설정] 흐름당 버퍼 상한(꼬리 + 순서 어긋난 세그먼트). MySQL 한 패킷의 최대 크기(16MB)보다 작게 잡고,
+#        상한을 넘는 단일 프레임은 길이만큼 건너뛰어 프레임 정렬을 유지합니다.
+DEFAULT_FLOW_CAP = 4 * 1024 * 1024
+
+
+def complete_frames_end(buf):
+    """버퍼 앞에서부터 완성된 MySQL 프레임이 끝나는 위치를 반환"""
+    off = 0
+    size = len(buf)
+    unpack_from = _MYSQL_HEADER.unpack_from
+    while off + 4 <= size:
+        lo, hi, _ = unpack_from(buf, off)
+        end = off + 4 + (lo | (hi << 16))
+        if end > size: break
+        off = end
+    return off
+
+
+class _Flow:
+    __slots__ = ("next_seq", "tail", "ooo", "ooo_bytes", "skip")
+
+    def __init__(self, next_seq):
+        self.next_seq = next_seq
+        self.tail = b""       # 완성되지 않은 마지막 프레임 조각
+        self.ooo = {}         # {seq: bytes} 아직 이어 붙일 수 없는 세그먼트
+        self.ooo_bytes = 0
+        self.skip = 0         # 상한을 넘는 프레임의 남은 바이트 (버리는 중)
+
+
+class StreamReassembler:
+    """
+    feed() 에 세그먼트를 넣으면 완성된 MySQL 프레임들만 이어 붙인 버퍼(또는 None)를 돌려줍니다.
+    흐름 키: (src_ip, sport, dst_ip, dport) — 방향별로 따로 관리됩니다.
+    """
+    def __init__(self, flow_cap=DEFAULT_FLOW_CAP):
+        self.flow_cap = flow_cap
+        self.flows = {}
+        # 통계
+        self.retransmissions = 0
+        self.out_of_order = 0
+        self.overflows = 0
+        self.skipped_bytes = 0
+
+    def stats(self):
+        return {
+            "flows": len(self.flows),
+            "retransmissions": self.retransmissions,
+            "out_of_order": self.out_of_order,
+            "overflows": self.overflows,
+            "skipped_bytes": self.skipped_bytes,
+        }
+
+    def close_flow(self, key):
+        self.flows.pop(key, None)
+
+    def feed(self, key, seq, flags, payload):
+        if flags & TCP_SYN:
+            self.flows[key] = _Flow((seq + 1) % _SEQ_MOD)
+            return None
+        if flags & TCP_RST:
+            self.flows.pop(key, None)
+            return None
+
+        flow = self.flows.get(key)
+        size = len(payload)
+        if flow is None:
+            if not size: return None
+            # 캡처 도중 합류한 흐름: 첫 세그먼트가 프레임 경계에서 시작한다고 가정
+            flow = self.flows[key] = _Flow(seq)
+
+        out = None
+        if size:
+            delta = (seq - flow.next_seq) % _SEQ_MOD
+            if delta >= _SEQ_HALF:
+                # 이미 받은 구간과 겹침: 완전히 과거면 재전송, 일부만 새로우면 앞부분을 잘라냄
+                overlap = _SEQ_MOD - delta
+                if overlap >= size:
+                    self.retransmissions += 1
+                    payload = None
+                else:
+                    payload = payload[overlap:]
+                    delta = 0
+            if payload is not None:
+                if delta == 0:
+                    out = self._append(flow, payload)
+                else:
+                    self._stash(key, flow, seq, payload)
+
+        if flags & TCP_FIN:
+            self.flows.pop(key, None)
+        return out
+
+    def _stash(self, key, flow, seq, payload):
+        self.out_of_order += 1
+        if seq in flow.ooo: return
+        flow.ooo[seq] = bytes(payload)
+        flow.ooo_bytes += len(payload)
+        if flow.ooo_bytes + len(flow.tail) > self.flow_cap:
+            # 빠진 세그먼트가 오지 않음(캡처 드롭): 버퍼를 비우고 다음 세그먼트부터 다시 정렬
+            self.overflows += 1
+            del self.flows[key]
+
+    def _append(self, flow, payload):
+        flow.next_seq = (flow.next_seq + len(payload)) % _SEQ_MOD
+        if flow.ooo:
+            # 기다리던 세그먼트가 도착하면 뒤따르는 세그먼트를 순서대로 이어 붙임
+            parts = [payload]
+            while flow.next_seq in flow.ooo:
+                chunk = flow.ooo.pop(flow.next_seq)
+                flow.ooo_bytes -= len(chunk)
+                parts.append(chunk)
+                flow.next_seq = (flow.next_seq + len(chunk)) % _SEQ_MOD
+            if len(parts) > 1:
+                payload = b"".join(parts)
+
+        if flow.skip:
+            n = min(flow.skip, len(payload))
+            flow.skip -= n
+            self.skipped_bytes += n
+            payload = payload[n:]
+            if not payload: return None
+
+        if flow.tail:
+            buf = flow.tail + payload
+        else:
+            buf = payload
+        end = complete_frames_end(buf)
+
+        if end < len(buf):
+            rest = buf[end:]
+            if len(rest) >= 4:
+                lo, hi, _ = _MYSQL_HEADER.unpack_from(rest, 0)
+                frame_size = 4 + (lo | (hi << 16))
+                if frame_size > self.flow_cap:
+                    # 상한을 넘는 단일 프레임: 보관하지 않고 길이만큼 건너뜀
+                    self.overflows += 1
+                    self.skipped_bytes += len(rest)
+                    flow.skip = frame_size - len(rest)
+                    rest = b""
+            # 완성되지 않은 꼬리만 복사해서 보관
+            flow.tail = bytes(rest)
+        else:
+            flow.tail = b""
+
+        if not end: return None
+        if end == len(buf): return buf
+        return memoryview(buf)[:end]
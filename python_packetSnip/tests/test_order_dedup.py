@@ -0,0 +1,53 @@
+"""
+작성의도: 주문 키(key_fields)가 없는 주문의 중복 제거가 같은 단말의 실제 연속 주문을 버리지 않는지 확인합니다.
+기능 원리: OrderAssembler 로 같은 연결에서 같은 내용의 주문을 트랜잭션 두 개로 조립하고, order_key + DedupWindow 를 통과시킵니다.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_assembly import ROLE_HEADER, ROLE_ITEM, OrderAssembler
+from order_dedup import DedupWindow, order_key
+
+CONNECTION = ("10.0.0.1", 5000)
+HEADER = {"seat_no": "T1", "total_price": 12000}
+ITEM = {"menu_cd": "M1", "qty": 2, "price": 6000}
+
+
+class FallbackKeyTest(unittest.TestCase):
+    def assemble(self, transactions):
+        """같은 연결에서 transactions 개의 같은 내용 주문을 각각 BEGIN ... COMMIT 으로 조립"""
+        orders = []
+        assembler = OrderAssembler(lambda order, meta, reason: orders.append(order))
+        for _ in range(transactions):
+            assembler.add(CONNECTION, ROLE_HEADER, "tb_order", dict(HEADER), True)
+            assembler.add(CONNECTION, ROLE_ITEM, "tb_order", dict(ITEM), True)
+            assembler.commit(CONNECTION)
+        return orders
+
+    def keys(self, orders):
+        return [order_key(o["type"], o["order"], ("order_no",), "10.0.0.1:5000", o["items"], o["sequence"])
+                for o in orders]
+
+    def test_identical_orders_in_separate_transactions_are_kept(self):
+        orders = self.assemble(2)
+        self.assertEqual(len(orders), 2)
+        dedup = DedupWindow()
+        self.assertEqual([dedup.seen(key) for key in self.keys(orders)], [False, False])
+
+    def test_same_transaction_is_one_key(self):
+        first, second = self.assemble(1), self.assemble(1)
+        # 같은 트랜잭션 위치의 같은 내용(재전송)은 같은 키
+        self.assertEqual(self.keys(first), self.keys(second))
+
+    def test_key_fields_ignore_transaction(self):
+        orders = self.assemble(2)
+        keys = {order_key(o["type"], dict(o["order"], order_no="A1"), ("order_no",), "c", o["items"], o["sequence"])
+                for o in orders}
+        self.assertEqual(len(keys), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()